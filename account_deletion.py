@@ -0,0 +1,220 @@
+"""Background deletion of user accounts.
+
+`DELETE /users/delete-user` deactivates the user and stores an
+`AccountDeletion` row in one transaction, then returns. The deletion worker
+started with the app claims the row and removes the user's books in chunks
+of `ACCOUNT_DELETION_CHUNK_SIZE`. Each chunk commits together with the
+progress counter, so locks stay short and an interrupted job resumes where
+it stopped once its lease expires. The user row goes last.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+from config import Config
+from database import AsyncSessionLocal
+from models import AccountDeletion, Book, utcnow
+import queries
+from response_cache import response_cache
+
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+
+async def request_deletion(db, user_id: int):
+    """Deactivate the user and queue their deletion; reuses a deletion in progress.
+
+    Returns None when the user does not exist (e.g. was already deleted).
+    """
+    deletion = await db.scalar(queries.latest_account_deletion(user_id))
+    if deletion is not None and deletion.status in ACTIVE_STATUSES:
+        return deletion
+
+    if await db.scalar(queries.deactivate_user(user_id)) is None:
+        await db.rollback()
+        return None
+    deletion = AccountDeletion(
+        user_id=user_id,
+        status=STATUS_PENDING,
+        books_total=await db.scalar(queries.count_books_owned_by(user_id)),
+    )
+    db.add(deletion)
+    await db.commit()
+    return deletion
+
+
+def progress(deletion: AccountDeletion) -> dict:
+    return {
+        "deletion_id": deletion.id,
+        "status": deletion.status,
+        "books_total": deletion.books_total,
+        "books_deleted": deletion.books_deleted,
+        "last_error": deletion.last_error,
+        "created_at": deletion.created_at.isoformat(),
+        "finished_at": deletion.finished_at.isoformat() if deletion.finished_at else None,
+    }
+
+
+async def claim_next_deletion(db):
+    """Lease the next due deletion.
+
+    Running deletions whose lease expired are due again, unless that was
+    their last attempt: those are marked failed.
+    """
+    now = utcnow()
+    await db.execute(
+        update(AccountDeletion)
+        .filter(AccountDeletion.status == STATUS_RUNNING)
+        .filter(AccountDeletion.next_attempt_at <= now)
+        .filter(AccountDeletion.attempts >= Config.ACCOUNT_DELETION_MAX_ATTEMPTS)
+        .values(status=STATUS_FAILED, last_error="Lease expired on the last attempt.")
+    )
+    due = (
+        await db.scalars(
+            select(AccountDeletion.id)
+            .filter(AccountDeletion.status.in_(ACTIVE_STATUSES))
+            .filter(AccountDeletion.next_attempt_at <= now)
+            .order_by(AccountDeletion.next_attempt_at)
+            .limit(10)
+        )
+    ).all()
+    await db.commit()
+
+    for deletion_id in due:
+        claimed = await db.execute(
+            update(AccountDeletion)
+            .filter(AccountDeletion.id == deletion_id)
+            .filter(AccountDeletion.status.in_(ACTIVE_STATUSES))
+            .filter(AccountDeletion.next_attempt_at <= now)
+            .values(
+                status=STATUS_RUNNING,
+                attempts=AccountDeletion.attempts + 1,
+                next_attempt_at=now
+                + timedelta(seconds=Config.ACCOUNT_DELETION_LEASE_SECONDS),
+            )
+        )
+        await db.commit()
+        if claimed.rowcount:
+            return await db.get(AccountDeletion, deletion_id, populate_existing=True)
+    return None
+
+
+async def process_deletion(
+    db, deletion: AccountDeletion, chunk_size: int = Config.ACCOUNT_DELETION_CHUNK_SIZE
+):
+    user_id, attempts = deletion.user_id, deletion.attempts
+    conditions = [Book.owner_id == user_id]
+    try:
+        while True:
+            book_ids = (
+                await db.scalars(queries.book_ids_page(conditions, 0, chunk_size))
+            ).all()
+            if not book_ids:
+                break
+            result = await db.execute(queries.delete_books_by_id(book_ids, conditions))
+            deletion.books_deleted += result.rowcount
+            # Keep the lease alive while there is work left.
+            deletion.next_attempt_at = utcnow() + timedelta(
+                seconds=Config.ACCOUNT_DELETION_LEASE_SECONDS
+            )
+            await db.commit()
+
+        # A token issued before the deactivation still works until it
+        # expires, so books may have been added after the last chunk.
+        result = await db.execute(queries.delete_books_owned_by(user_id))
+        deletion.books_deleted += result.rowcount
+        await db.execute(queries.delete_user(user_id))
+        deletion.status = STATUS_DONE
+        deletion.last_error = None
+        deletion.finished_at = utcnow()
+        await db.commit()
+        await response_cache.invalidate(user_id)
+    except SQLAlchemyError as exc:
+        logger.exception("Deleting account %s failed", user_id)
+        await db.rollback()
+        deletion.last_error = str(exc)
+        if attempts >= Config.ACCOUNT_DELETION_MAX_ATTEMPTS:
+            deletion.status = STATUS_FAILED
+        else:
+            deletion.status = STATUS_PENDING
+            deletion.next_attempt_at = utcnow() + timedelta(
+                seconds=Config.ACCOUNT_DELETION_POLL_INTERVAL * attempts
+            )
+        await db.commit()
+
+
+async def run_once(session_factory=AsyncSessionLocal, chunk_size=None) -> bool:
+    """Claim and process a single deletion. Returns False when nothing was due."""
+    async with session_factory() as db:
+        deletion = await claim_next_deletion(db)
+        if deletion is None:
+            return False
+        await process_deletion(
+            db, deletion, chunk_size or Config.ACCOUNT_DELETION_CHUNK_SIZE
+        )
+        return True
+
+
+async def drain(session_factory=AsyncSessionLocal, chunk_size=None) -> int:
+    processed = 0
+    while await run_once(session_factory, chunk_size):
+        processed += 1
+    return processed
+
+
+class AccountDeletionWorker:
+    """One asyncio task working through queued account deletions."""
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        poll_interval: float = Config.ACCOUNT_DELETION_POLL_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self._task = None
+        self._wakeup = asyncio.Event()
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run(), name="account-deletion-worker")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await run_once(self.session_factory)
+            except Exception:  # pylint: disable=broad-exception-caught
+                # Anything but a database error is a bug; log it and keep the
+                # worker alive, the deletion's lease brings it back later.
+                logger.exception("Account deletion worker failed")
+                processed = False
+
+            if processed:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+deletion_worker = AccountDeletionWorker()
@@ -0,0 +1,32 @@
+"""Add indexes for hot filters
+
+Revision ID: 5f2a8c3d1b64
+Revises: 9d3c5e1f7a42
+Create Date: 2026-10-18 14:21:08.113402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f2a8c3d1b64'
+down_revision: Union[str, Sequence[str], None] = '9d3c5e1f7a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_books_owner_id_id', 'books', ['owner_id', 'id'], unique=False)
+    op.create_index('ix_books_category', 'books', ['category'], unique=False)
+    op.create_index('ix_enrichment_jobs_book_id', 'enrichment_jobs', ['book_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_enrichment_jobs_book_id', table_name='enrichment_jobs')
+    op.drop_index('ix_books_category', table_name='books')
+    op.drop_index('ix_books_owner_id_id', table_name='books')
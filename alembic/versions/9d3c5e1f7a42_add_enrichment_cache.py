@@ -0,0 +1,36 @@
+"""Add enrichment_cache
+
+Revision ID: 9d3c5e1f7a42
+Revises: 4b1e9c7a2f10
+Create Date: 2026-10-18 10:03:17.540981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3c5e1f7a42'
+down_revision: Union[str, Sequence[str], None] = '4b1e9c7a2f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('enrichment_cache',
+    sa.Column('cache_key', sa.String(length=64), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('author', sa.String(), nullable=False),
+    sa.Column('summary', sa.String(), nullable=True),
+    sa.Column('category', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('cache_key')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('enrichment_cache')
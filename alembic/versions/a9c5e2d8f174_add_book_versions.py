@@ -0,0 +1,49 @@
+"""Add book versions
+
+Revision ID: a9c5e2d8f174
+Revises: e1f8b3c6d295
+Create Date: 2026-10-18 21:05:33.916458
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+import library_stats
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c5e2d8f174'
+down_revision: Union[str, Sequence[str], None] = 'e1f8b3c6d295'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.create_table('book_collections',
+    sa.Column('owner_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('owner_id')
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        ddl = library_stats.POSTGRES_COLLECTION_DDL
+    else:
+        ddl = library_stats.SQLITE_COLLECTION_DDL
+    for statement in ddl:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP TRIGGER books_collection_aiud ON books")
+        op.execute("DROP FUNCTION books_collection_version()")
+    else:
+        op.execute("DROP TRIGGER books_collection_au")
+        op.execute("DROP TRIGGER books_collection_ad")
+        op.execute("DROP TRIGGER books_collection_ai")
+    op.drop_table('book_collections')
+    op.drop_column('books', 'version')
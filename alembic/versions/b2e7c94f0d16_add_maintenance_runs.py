@@ -0,0 +1,32 @@
+"""Add maintenance runs
+
+Revision ID: b2e7c94f0d16
+Revises: f6a1d4c8e293
+Create Date: 2026-10-19 16:40:12.883014
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2e7c94f0d16'
+down_revision: Union[str, Sequence[str], None] = 'f6a1d4c8e293'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('maintenance_runs',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('last_run_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('maintenance_runs')
@@ -0,0 +1,72 @@
+"""Add books full-text search
+
+Revision ID: b7e41d09c3a5
+Revises: 5f2a8c3d1b64
+Create Date: 2026-10-18 15:02:44.730215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e41d09c3a5'
+down_revision: Union[str, Sequence[str], None] = '5f2a8c3d1b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # The generated column is computed for existing rows by the ALTER itself.
+        op.execute(
+            "ALTER TABLE books ADD COLUMN search_vector tsvector "
+            "GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(author, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(summary, '')), 'C')"
+            ") STORED"
+        )
+        op.execute("CREATE INDEX ix_books_search_vector ON books USING GIN (search_vector)")
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE books_fts USING fts5("
+        "title, author, summary, content='books', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute(
+        "CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN "
+        "INSERT INTO books_fts(rowid, title, author, summary) "
+        "VALUES (new.id, new.title, new.author, new.summary); END"
+    )
+    op.execute(
+        "CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author, summary) "
+        "VALUES ('delete', old.id, old.title, old.author, old.summary); END"
+    )
+    op.execute(
+        "CREATE TRIGGER books_fts_au AFTER UPDATE OF title, author, summary ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author, summary) "
+        "VALUES ('delete', old.id, old.title, old.author, old.summary); "
+        "INSERT INTO books_fts(rowid, title, author, summary) "
+        "VALUES (new.id, new.title, new.author, new.summary); END"
+    )
+    # Index the existing rows.
+    op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_books_search_vector', table_name='books')
+        op.drop_column('books', 'search_vector')
+        return
+
+    op.execute("DROP TRIGGER books_fts_au")
+    op.execute("DROP TRIGGER books_fts_ad")
+    op.execute("DROP TRIGGER books_fts_ai")
+    op.execute("DROP TABLE books_fts")
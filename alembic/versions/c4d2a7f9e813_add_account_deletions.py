@@ -0,0 +1,47 @@
+"""Add account_deletions
+
+Revision ID: c4d2a7f9e813
+Revises: b7e41d09c3a5
+Create Date: 2026-10-18 17:21:09.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d2a7f9e813'
+down_revision: Union[str, Sequence[str], None] = 'b7e41d09c3a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('account_deletions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('books_total', sa.Integer(), nullable=False),
+    sa.Column('books_deleted', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_account_deletions_id'), 'account_deletions', ['id'], unique=False)
+    op.create_index('ix_account_deletions_status_next_attempt_at', 'account_deletions', ['status', 'next_attempt_at'], unique=False)
+    op.create_index('ix_account_deletions_user_id', 'account_deletions', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_account_deletions_user_id', table_name='account_deletions')
+    op.drop_index('ix_account_deletions_status_next_attempt_at', table_name='account_deletions')
+    op.drop_index(op.f('ix_account_deletions_id'), table_name='account_deletions')
+    op.drop_table('account_deletions')
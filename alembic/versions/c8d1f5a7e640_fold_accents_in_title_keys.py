@@ -0,0 +1,126 @@
+"""Fold accents in title keys
+
+Revision ID: c8d1f5a7e640
+Revises: b2e7c94f0d16
+Create Date: 2026-10-20 09:48:19.306552
+
+"""
+import hashlib
+import re
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+import book_keys
+import library_stats
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8d1f5a7e640'
+down_revision: Union[str, Sequence[str], None] = 'b2e7c94f0d16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TITLE_STATS = {'title_stats': library_stats.Rollup(('title_key',), labels=('title', 'author'))}
+
+books = sa.table(
+    'books',
+    sa.column('id', sa.Integer),
+    sa.column('title', sa.String),
+    sa.column('author', sa.String),
+    sa.column('title_key', sa.String),
+)
+enrichment_cache = sa.table(
+    'enrichment_cache',
+    sa.column('cache_key', sa.String),
+    sa.column('title', sa.String),
+    sa.column('author', sa.String),
+)
+
+
+def previous_cache_key(title: str, author: str) -> str:
+    """book_keys.cache_key before this revision: accents were kept."""
+    def normalize(text):
+        text = unicodedata.normalize('NFKC', text).casefold()
+        text = re.sub(r'[\W_]+', ' ', text)
+        return ' '.join(text.split())
+
+    normalized = f"{normalize(title)}\x1f{normalize(author)}"
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def rekey_books(key, batch_size: int = 1000) -> None:
+    # Only rows whose key changes are written; the stats triggers move their
+    # counts, and title_stats is rebuilt afterwards for its labels.
+    bind = op.get_bind()
+    after_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(books.c.id, books.c.title, books.c.author, books.c.title_key)
+            .where(books.c.id > after_id)
+            .order_by(books.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        changed = [
+            {'book_id': row.id, 'key': key(row.title, row.author)}
+            for row in rows
+            if row.title_key != key(row.title, row.author)
+        ]
+        if changed:
+            bind.execute(
+                books.update()
+                .where(books.c.id == sa.bindparam('book_id'))
+                .values(title_key=sa.bindparam('key')),
+                changed,
+            )
+        after_id = rows[-1].id
+
+
+def rekey_enrichment_cache(key) -> None:
+    # Entries whose titles now share a key collapse into the first one.
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(
+            enrichment_cache.c.cache_key,
+            enrichment_cache.c.title,
+            enrichment_cache.c.author,
+        )
+    ).all()
+    kept = {row.cache_key for row in rows}
+    for row in rows:
+        new_key = key(row.title, row.author)
+        if new_key == row.cache_key:
+            continue
+        kept.discard(row.cache_key)
+        if new_key in kept:
+            bind.execute(
+                enrichment_cache.delete()
+                .where(enrichment_cache.c.cache_key == row.cache_key)
+            )
+        else:
+            bind.execute(
+                enrichment_cache.update()
+                .where(enrichment_cache.c.cache_key == row.cache_key)
+                .values(cache_key=new_key)
+            )
+            kept.add(new_key)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    rekey_books(book_keys.cache_key)
+    rekey_enrichment_cache(book_keys.cache_key)
+    for statement in library_stats.rebuild_statements(TITLE_STATS):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    rekey_books(previous_cache_key)
+    rekey_enrichment_cache(previous_cache_key)
+    for statement in library_stats.rebuild_statements(TITLE_STATS):
+        op.execute(statement)
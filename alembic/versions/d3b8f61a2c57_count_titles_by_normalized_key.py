@@ -0,0 +1,127 @@
+"""Count titles by normalized key
+
+Revision ID: d3b8f61a2c57
+Revises: a9c5e2d8f174
+Create Date: 2026-10-19 10:12:41.208317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+import book_keys
+import library_stats
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3b8f61a2c57'
+down_revision: Union[str, Sequence[str], None] = 'a9c5e2d8f174'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The rollups before this revision, for the downgrade.
+PREVIOUS_ROLLUPS = {
+    'user_stats': library_stats.Rollup(('owner_id',)),
+    'user_category_stats': library_stats.Rollup(('owner_id', 'category')),
+    'user_author_stats': library_stats.Rollup(('owner_id', 'author')),
+    'category_stats': library_stats.Rollup(('category',)),
+    'title_stats': library_stats.Rollup(('title', 'author')),
+}
+PREVIOUS_COUNTED_COLUMNS = ('owner_id', 'category', 'title', 'author')
+
+books = sa.table(
+    'books',
+    sa.column('id', sa.Integer),
+    sa.column('title', sa.String),
+    sa.column('author', sa.String),
+    sa.column('title_key', sa.String),
+)
+
+
+def drop_stats_triggers(postgres: bool) -> None:
+    if postgres:
+        op.execute("DROP TRIGGER books_stats_au ON books")
+        op.execute("DROP TRIGGER books_stats_aid ON books")
+        op.execute("DROP FUNCTION books_stats()")
+    else:
+        op.execute("DROP TRIGGER books_stats_au")
+        op.execute("DROP TRIGGER books_stats_ad")
+        op.execute("DROP TRIGGER books_stats_ai")
+
+
+def fill_title_keys(batch_size: int = 1000) -> None:
+    bind = op.get_bind()
+    after_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(books.c.id, books.c.title, books.c.author)
+            .where(books.c.id > after_id)
+            .order_by(books.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        bind.execute(
+            books.update()
+            .where(books.c.id == sa.bindparam('book_id'))
+            .values(title_key=sa.bindparam('key')),
+            [
+                {'book_id': row.id, 'key': book_keys.cache_key(row.title, row.author)}
+                for row in rows
+            ],
+        )
+        after_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    drop_stats_triggers(postgres)
+
+    op.add_column('books', sa.Column('title_key', sa.String(length=64), nullable=True))
+    fill_title_keys()
+
+    op.drop_index('ix_title_stats_top', table_name='title_stats')
+    op.drop_table('title_stats')
+    op.create_table('title_stats',
+    sa.Column('title_key', sa.String(length=64), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('author', sa.String(), nullable=False),
+    sa.Column('book_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('title_key')
+    )
+    op.create_index('ix_title_stats_top', 'title_stats', ['book_count', 'title_key', 'title', 'author'], unique=False)
+
+    # New triggers; the rebuild also drops the uncategorized category_stats row.
+    ddl = library_stats.POSTGRES_STATS_DDL if postgres else library_stats.SQLITE_STATS_DDL
+    for statement in ddl:
+        op.execute(statement)
+    for statement in library_stats.rebuild_statements():
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    drop_stats_triggers(postgres)
+
+    op.drop_index('ix_title_stats_top', table_name='title_stats')
+    op.drop_table('title_stats')
+    op.create_table('title_stats',
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('author', sa.String(), nullable=False),
+    sa.Column('book_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('title', 'author')
+    )
+    op.create_index('ix_title_stats_top', 'title_stats', ['book_count', 'title', 'author'], unique=False)
+
+    if postgres:
+        ddl = library_stats.postgres_stats_ddl(PREVIOUS_ROLLUPS, PREVIOUS_COUNTED_COLUMNS)
+    else:
+        ddl = library_stats.sqlite_stats_ddl(PREVIOUS_ROLLUPS, PREVIOUS_COUNTED_COLUMNS)
+    for statement in ddl:
+        op.execute(statement)
+    for statement in library_stats.rebuild_statements(PREVIOUS_ROLLUPS):
+        op.execute(statement)
+    op.drop_column('books', 'title_key')
@@ -0,0 +1,97 @@
+"""Add library stats rollups
+
+Revision ID: e1f8b3c6d295
+Revises: c4d2a7f9e813
+Create Date: 2026-10-18 19:40:17.553804
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+import library_stats
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f8b3c6d295'
+down_revision: Union[str, Sequence[str], None] = 'c4d2a7f9e813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The rollups as of this revision (later revisions change them).
+ROLLUPS = {
+    'user_stats': library_stats.Rollup(('owner_id',)),
+    'user_category_stats': library_stats.Rollup(('owner_id', 'category')),
+    'user_author_stats': library_stats.Rollup(('owner_id', 'author')),
+    'category_stats': library_stats.Rollup(('category',)),
+    'title_stats': library_stats.Rollup(('title', 'author')),
+}
+COUNTED_COLUMNS = ('owner_id', 'category', 'title', 'author')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_stats',
+    sa.Column('owner_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('book_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('owner_id')
+    )
+    op.create_table('user_category_stats',
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('book_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('owner_id', 'category')
+    )
+    op.create_index('ix_user_category_stats_top', 'user_category_stats', ['owner_id', 'book_count', 'category'], unique=False)
+    op.create_table('user_author_stats',
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('author', sa.String(), nullable=False),
+    sa.Column('book_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('owner_id', 'author')
+    )
+    op.create_index('ix_user_author_stats_top', 'user_author_stats', ['owner_id', 'book_count', 'author'], unique=False)
+    op.create_table('category_stats',
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('book_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('category')
+    )
+    op.create_index('ix_category_stats_top', 'category_stats', ['book_count', 'category'], unique=False)
+    op.create_table('title_stats',
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('author', sa.String(), nullable=False),
+    sa.Column('book_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('title', 'author')
+    )
+    op.create_index('ix_title_stats_top', 'title_stats', ['book_count', 'title', 'author'], unique=False)
+
+    # Triggers keep the rollups current; fill them from the existing books.
+    if op.get_bind().dialect.name == 'postgresql':
+        ddl = library_stats.postgres_stats_ddl(ROLLUPS, COUNTED_COLUMNS)
+    else:
+        ddl = library_stats.sqlite_stats_ddl(ROLLUPS, COUNTED_COLUMNS)
+    for statement in ddl:
+        op.execute(statement)
+    for statement in library_stats.rebuild_statements(ROLLUPS):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP TRIGGER books_stats_au ON books")
+        op.execute("DROP TRIGGER books_stats_aid ON books")
+        op.execute("DROP FUNCTION books_stats()")
+    else:
+        op.execute("DROP TRIGGER books_stats_au")
+        op.execute("DROP TRIGGER books_stats_ad")
+        op.execute("DROP TRIGGER books_stats_ai")
+    op.drop_index('ix_title_stats_top', table_name='title_stats')
+    op.drop_table('title_stats')
+    op.drop_index('ix_category_stats_top', table_name='category_stats')
+    op.drop_table('category_stats')
+    op.drop_index('ix_user_author_stats_top', table_name='user_author_stats')
+    op.drop_table('user_author_stats')
+    op.drop_index('ix_user_category_stats_top', table_name='user_category_stats')
+    op.drop_table('user_category_stats')
+    op.drop_table('user_stats')
@@ -0,0 +1,29 @@
+"""Index books by category and id
+
+Revision ID: f6a1d4c8e293
+Revises: d3b8f61a2c57
+Create Date: 2026-10-19 15:03:27.541962
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a1d4c8e293'
+down_revision: Union[str, Sequence[str], None] = 'd3b8f61a2c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_books_category_id', 'books', ['category', 'id'], unique=False)
+    op.drop_index('ix_books_category', table_name='books')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_books_category', 'books', ['category'], unique=False)
+    op.drop_index('ix_books_category_id', table_name='books')
@@ -0,0 +1,208 @@
+"""Re-enrich books whose summary or category is missing.
+
+Scans `books` in id order (keyset chunks), re-enriches the rows with bounded
+concurrency and a calls-per-second limit, and saves the last finished id to
+a checkpoint file so an interrupted run resumes where it stopped. Books that
+failed are listed in the checkpoint too and retried first by the next run.
+Only missing fields are filled in; existing values are never cleared:
+
+    python backfill.py --concurrency=4 --rate=2
+    python backfill.py --restart   # ignore the checkpoint, e.g. after a prompt change
+"""
+
+import asyncio
+import json
+import os
+import time
+import fire
+from sqlalchemy import func, or_, select, update
+from config import Config
+from database import AsyncSessionLocal
+from enrichment import fetch_enrichment, get_cached_enrichment, store_cached_enrichment
+from models import Book
+from n8n import WebhookError, n8n_client
+
+
+class RateLimiter:
+    """Spaces calls so no more than `rate` start per second."""
+
+    def __init__(self, rate: float, clock=time.monotonic):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.clock = clock
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = self.clock()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def read_checkpoint(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as checkpoint:
+            return json.load(checkpoint)
+    except FileNotFoundError:
+        return {}
+
+
+def load_checkpoint(path: str) -> int:
+    return int(read_checkpoint(path).get("last_id", 0))
+
+
+def load_failed_ids(path: str) -> list:
+    return [int(book_id) for book_id in read_checkpoint(path).get("failed_ids", [])]
+
+
+def save_checkpoint(path: str, last_id: int, failed_ids, stats: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as checkpoint:
+        json.dump({"last_id": last_id, "failed_ids": sorted(failed_ids), **stats}, checkpoint)
+    os.replace(tmp_path, path)
+
+
+INCOMPLETE = or_(Book.summary.is_(None), Book.category.is_(None))
+
+
+async def next_chunk(db, after_id: int, chunk_size: int):
+    return (
+        await db.execute(
+            select(Book.id, Book.title, Book.author, Book.summary, Book.category)
+            .filter(Book.id > after_id)
+            .filter(INCOMPLETE)
+            .order_by(Book.id)
+            .limit(chunk_size)
+        )
+    ).all()
+
+
+async def books_by_id(db, book_ids):
+    return (
+        await db.execute(
+            select(Book.id, Book.title, Book.author, Book.summary, Book.category)
+            .filter(Book.id.in_(book_ids))
+            .filter(INCOMPLETE)
+            .order_by(Book.id)
+        )
+    ).all()
+
+
+def completes(book, result: dict) -> bool:
+    """Whether `result` has a value for every field `book` is missing."""
+    return (book.summary is not None or result.get("summary_by_ai") is not None) and (
+        book.category is not None or result.get("category_by_ai") is not None
+    )
+
+
+async def enrich_book(session_factory, book, limiter, semaphore, stats) -> bool:
+    """Fill in the book's missing fields. Returns False if the webhook failed."""
+    async with semaphore, session_factory() as db:
+        result = await get_cached_enrichment(db, book.title, book.author)
+        await db.commit()
+        if result is not None and completes(book, result):
+            stats["cached"] += 1
+        else:
+            # A cached result lacking a field this row needs would only write
+            # the same gap back: ask the webhook again.
+            await limiter.wait()
+            try:
+                result = await fetch_enrichment(book.title, book.author)
+            except WebhookError as exc:
+                stats["failed"] += 1
+                print(f"Book {book.id} failed: {exc}")
+                return False
+            await store_cached_enrichment(db, book.title, book.author, result)
+
+        await db.execute(
+            update(Book)
+            .filter(Book.id == book.id)
+            .values(
+                summary=func.coalesce(result.get("summary_by_ai"), Book.summary),
+                category=func.coalesce(result.get("category_by_ai"), Book.category),
+            )
+        )
+        await db.commit()
+        stats["enriched" if completes(book, result) else "incomplete"] += 1
+        return True
+
+
+async def enrich_books(session_factory, books, limiter, semaphore, stats) -> set:
+    """Enrich `books` concurrently. Returns the ids that failed."""
+    succeeded = await asyncio.gather(
+        *(enrich_book(session_factory, book, limiter, semaphore, stats) for book in books)
+    )
+    return {book.id for book, ok in zip(books, succeeded) if not ok}
+
+
+async def backfill(
+    session_factory=AsyncSessionLocal,
+    chunk_size: int = 200,
+    concurrency: int = 4,
+    rate: float = 5.0,
+    checkpoint: str = Config.BACKFILL_CHECKPOINT_PATH,
+    restart: bool = False,
+    max_chunks: int = None,
+) -> dict:
+    last_id = 0 if restart else load_checkpoint(checkpoint)
+    retry_ids = [] if restart else load_failed_ids(checkpoint)
+    stats = {"enriched": 0, "incomplete": 0, "cached": 0, "failed": 0}
+    limiter = RateLimiter(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    failed_ids = set()
+    chunks = 0
+
+    # Books that failed last time sit behind the checkpoint: retry them first.
+    for start in range(0, len(retry_ids), chunk_size):
+        async with session_factory() as db:
+            books = await books_by_id(db, retry_ids[start : start + chunk_size])
+        failed_ids |= await enrich_books(session_factory, books, limiter, semaphore, stats)
+    if retry_ids:
+        save_checkpoint(checkpoint, last_id, failed_ids, stats)
+
+    while max_chunks is None or chunks < max_chunks:
+        async with session_factory() as db:
+            books = await next_chunk(db, last_id, chunk_size)
+        if not books:
+            break
+
+        failed_ids |= await enrich_books(session_factory, books, limiter, semaphore, stats)
+        last_id = books[-1].id
+        chunks += 1
+        save_checkpoint(checkpoint, last_id, failed_ids, stats)
+        print(f"Backfilled up to book {last_id}: {stats}")
+
+    return {"last_id": last_id, "failed_ids": sorted(failed_ids), **stats}
+
+
+def main(
+    chunk_size: int = 200,
+    concurrency: int = 4,
+    rate: float = 5.0,
+    checkpoint: str = Config.BACKFILL_CHECKPOINT_PATH,
+    restart: bool = False,
+    max_chunks: int = None,
+):
+    """Re-enrich books with a missing summary or category."""
+
+    async def run():
+        try:
+            return await backfill(
+                AsyncSessionLocal,
+                chunk_size=chunk_size,
+                concurrency=concurrency,
+                rate=rate,
+                checkpoint=checkpoint,
+                restart=restart,
+                max_chunks=max_chunks,
+            )
+        finally:
+            await n8n_client.aclose()
+
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
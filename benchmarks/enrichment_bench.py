@@ -0,0 +1,142 @@
+"""Benchmark add-book and background enrichment against the local N8N stand-in.
+
+Runs the app in-process on a throwaway SQLite database, fires concurrent
+`POST /books/add-book` requests while the enrichment workers drain the
+outbox through the stand-in with the given latency / failure profile:
+
+    python benchmarks/enrichment_bench.py --requests=500 --concurrency=50 \\
+        --latency=lognormal:0,0.6 --error_rate=0.1 --distinct_titles=50
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_, DB_PATH = tempfile.mkstemp(suffix=".db")
+os.environ["SQL_DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_HASH_ALGORITHM", "HS256")
+
+import fire
+import httpx
+import enrichment
+from database import Base, SessionLocal, engine
+from main import app
+from models import EnrichmentJob
+from n8n import N8NClient
+from n8n_stub import create_app as create_n8n_stub
+from routers.auth import get_current_user
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def outstanding_jobs():
+    db = SessionLocal()
+    try:
+        return (
+            db.query(EnrichmentJob)
+            .filter(EnrichmentJob.status.in_(("pending", "running")))
+            .count()
+        )
+    finally:
+        db.close()
+
+
+async def run(
+    requests, concurrency, workers, latency, error_rate, distinct_titles, seed, settle
+):
+    Base.metadata.create_all(bind=engine)
+    app.dependency_overrides[get_current_user] = lambda: {
+        "username": "bench",
+        "id": 1,
+        "user_role": "admin",
+    }
+
+    stub = create_n8n_stub(latency=latency, error_rate=error_rate, seed=seed)
+    enrichment.n8n_client = N8NClient(
+        url="http://n8n.local/webhook/books",
+        transport=httpx.ASGITransport(app=stub),
+    )
+    enrichment.worker_pool.workers = workers
+    enrichment.worker_pool.poll_interval = 0.05
+    await enrichment.worker_pool.start()
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+
+        async def add_book(i):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/books/add-book",
+                    json={"title": f"Title {i % distinct_titles}", "author": "Author"},
+                )
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(add_book(i) for i in range(requests)))
+        accepted_after = time.perf_counter() - started
+
+        deadline = time.perf_counter() + settle
+        while outstanding_jobs() and time.perf_counter() < deadline:
+            await asyncio.sleep(0.1)
+        drained_after = time.perf_counter() - started
+
+    await enrichment.worker_pool.stop()
+    await enrichment.n8n_client.aclose()
+
+    print(f"add-book requests:   {requests} (concurrency {concurrency})")
+    print(f"  p50 / p95 / p99:   {percentile(latencies, 0.5) * 1000:.1f} / "
+          f"{percentile(latencies, 0.95) * 1000:.1f} / "
+          f"{percentile(latencies, 0.99) * 1000:.1f} ms")
+    print(f"  mean:              {statistics.mean(latencies) * 1000:.1f} ms")
+    print(f"  all accepted in:   {accepted_after:.2f} s")
+    print(f"outbox drained in:   {drained_after:.2f} s "
+          f"({outstanding_jobs()} jobs still waiting on retries)")
+    print(f"n8n client:          {enrichment.n8n_client.stats()}")
+    print(f"single-flight:       {enrichment.enrichment_flight.stats()}")
+    print(f"enrichment cache:    {enrichment.cache_stats}")
+
+
+def main(
+    requests: int = 200,
+    concurrency: int = 20,
+    workers: int = 4,
+    latency: str = "lognormal:-1,0.5",
+    error_rate: float = 0.0,
+    distinct_titles: int = 50,
+    seed: int = 1,
+    settle: float = 60.0,
+):
+    try:
+        asyncio.run(
+            run(
+                requests,
+                concurrency,
+                workers,
+                latency,
+                error_rate,
+                distinct_titles,
+                seed,
+                settle,
+            )
+        )
+    finally:
+        os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,103 @@
+"""Compare the ORM + jsonable_encoder list path with the Core-row + response-model one.
+
+Seeds a throwaway SQLite database and times fetching and serializing one
+page of books both ways:
+
+    python benchmarks/list_bench.py --rows=5000 --repeat=20
+"""
+
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_, DB_PATH = tempfile.mkstemp(suffix=".db")
+os.environ["SQL_DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_HASH_ALGORITHM", "HS256")
+
+import fire
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from database import Base, SessionLocal, engine
+from models import Book
+from pagination import paginate
+import queries
+from schemas import BookPage
+
+
+def seed(rows):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Book),
+            [
+                {
+                    "title": f"Title {i}",
+                    "author": f"Author {i % 100}",
+                    "summary": "A summary of reasonable length. " * 20,
+                    "category": f"Category {i % 10}",
+                    "owner_id": 1,
+                }
+                for i in range(rows)
+            ],
+        )
+
+
+def orm_path(db, limit):
+    """What the endpoints did before: entities run through jsonable_encoder."""
+    books = db.scalars(select(Book).filter(Book.owner_id == 1).limit(limit)).all()
+    return json.dumps(jsonable_encoder(books)).encode()
+
+
+def core_path(db, limit, adapter, fields=queries.BOOK_FIELDS):
+    """Core rows validated and dumped by pydantic-core, as FastAPI does now."""
+    statement = queries.books_page(0, limit + 1, owner_id=1, fields=fields)
+    page = paginate(queries.records(db.execute(statement)), limit)
+    return adapter.dump_json(adapter.validate_python(page), exclude_unset=True)
+
+
+def timed(fn, repeat):
+    samples, size = [], 0
+    for _ in range(repeat):
+        db = SessionLocal()
+        started = time.perf_counter()
+        size = len(fn(db))
+        samples.append(time.perf_counter() - started)
+        db.close()
+    return statistics.median(samples), size
+
+
+def main(rows: int = 5000, limit: int = None, repeat: int = 20):
+    limit = limit or rows
+    try:
+        seed(rows)
+        adapter = TypeAdapter(BookPage)
+        sparse = queries.parse_book_fields("title,author,category")
+        results = {
+            "orm + jsonable_encoder": timed(lambda db: orm_path(db, limit), repeat),
+            "core rows + response model": timed(
+                lambda db: core_path(db, limit, adapter), repeat
+            ),
+            "core rows, sparse fields": timed(
+                lambda db: core_path(db, limit, adapter, sparse), repeat
+            ),
+        }
+        baseline = results["orm + jsonable_encoder"][0]
+        print(f"{limit} books per response, median of {repeat} runs")
+        for name, (seconds, size) in results.items():
+            print(
+                f"  {name:28} {seconds * 1000:8.1f} ms  {size / 1024:8.1f} KiB  "
+                f"x{baseline / seconds:.1f}"
+            )
+    finally:
+        os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,142 @@
+"""Benchmark login throughput and what it costs the rest of the worker.
+
+Runs the app in-process on a throwaway SQLite database and fires concurrent
+`POST /auth/token` requests while a probe polls `GET /healthy`. With bcrypt
+on the event loop every probe waits behind the hashes in flight; with the
+password pool the probe stays fast. `--mode=both` runs the two back to back:
+
+    python benchmarks/login_bench.py --logins=100 --concurrency=20 --workers=4
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_, DB_PATH = tempfile.mkstemp(suffix=".db")
+os.environ["SQL_DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_HASH_ALGORITHM", "HS256")
+
+import fire
+import httpx
+from database import Base, SessionLocal, async_engine, engine
+from main import app
+from models import User
+from passwords import bcrypt_context, password_hasher
+
+
+PASSWORD = "benchmark-password"
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def create_user():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add(
+            User(
+                username="bench",
+                email="bench@example.com",
+                hashed_password=bcrypt_context.hash(PASSWORD),
+                role="user",
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run_inline(fn, *args):
+    # The old behaviour: bcrypt straight on the event loop.
+    return fn(*args)
+
+
+async def run(mode, logins, concurrency, probe_interval):
+    latencies, probes, statuses = [], [], {}
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+
+        async def login():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/auth/token", data={"username": "bench", "password": PASSWORD}
+                )
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def probe():
+            # Time from "should run now" to the response, so a blocked loop
+            # shows up as a slow probe rather than as fewer probes.
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(probe_interval)
+                (await client.get("/healthy")).raise_for_status()
+                probes.append(time.perf_counter() - started - probe_interval)
+
+        prober = asyncio.ensure_future(probe())
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(login() for _ in range(logins)))
+            elapsed = time.perf_counter() - started
+        finally:
+            # Stop the probe while the client is still open.
+            done.set()
+            prober.cancel()
+            await asyncio.gather(prober, return_exceptions=True)
+    # The pool's connections belong to this event loop; the next mode runs
+    # in a new one.
+    await async_engine.dispose()
+
+    print(f"{mode}: {logins} logins (concurrency {concurrency}) in {elapsed:.2f} s "
+          f"= {logins / elapsed:.1f} logins/s, statuses {statuses}")
+    print(f"  login p50 / p99:   {percentile(latencies, 0.5) * 1000:.1f} / "
+          f"{percentile(latencies, 0.99) * 1000:.1f} ms")
+    print(f"  /healthy p50 / p99 / max: {percentile(probes, 0.5) * 1000:.1f} / "
+          f"{percentile(probes, 0.99) * 1000:.1f} / {max(probes) * 1000:.1f} ms "
+          f"({len(probes)} probes, mean {statistics.mean(probes) * 1000:.1f} ms)")
+    if mode == "pool":
+        print(f"  password pool:     {password_hasher.stats()}")
+
+
+def main(
+    mode: str = "both",
+    logins: int = 100,
+    concurrency: int = 20,
+    workers: int = 4,
+    max_pending: int = 64,
+    probe_interval: float = 0.01,
+):
+    """mode is "inline" (bcrypt on the event loop), "pool" or "both"."""
+    password_hasher.workers = workers
+    password_hasher.max_pending = max_pending
+    try:
+        create_user()
+        for current in ("inline", "pool") if mode == "both" else (mode,):
+            pooled_run = password_hasher._run
+            if current == "inline":
+                password_hasher._run = run_inline
+            try:
+                asyncio.run(run(current, logins, concurrency, probe_interval))
+            finally:
+                password_hasher._run = pooled_run
+    finally:
+        password_hasher.shutdown()
+        os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
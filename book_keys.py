@@ -0,0 +1,28 @@
+"""Normalized identity of a book across users.
+
+Titles and authors typed by different users differ in case, accents,
+punctuation and spacing. `cache_key` folds those away so the enrichment
+cache and the most-added-books rollup treat them as the same book.
+Accents are the generic combining diacritics (U+0300-U+036F), so "Café"
+and "Cafe" match; marks specific to other scripts are kept.
+"""
+
+import hashlib
+import re
+import unicodedata
+
+
+def normalize(text: str) -> str:
+    text = "".join(
+        char
+        for char in unicodedata.normalize("NFKD", text)
+        if not "\u0300" <= char <= "\u036f"
+    )
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = re.sub(r"[\W_]+", " ", text)
+    return " ".join(text.split())
+
+
+def cache_key(title: str, author: str) -> str:
+    normalized = f"{normalize(title)}\x1f{normalize(author)}"
+    return hashlib.sha256(normalized.encode()).hexdigest()
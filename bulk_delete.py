@@ -0,0 +1,31 @@
+"""Filter-based bulk delete of books.
+
+Matching rows are deleted in keyset chunks with one short transaction per
+chunk. Locks are only held on `chunk_size` rows at a time, and a failure
+part-way keeps the chunks that were already committed.
+"""
+
+from config import Config
+import queries
+
+
+async def count_books(db, conditions) -> int:
+    return await db.scalar(queries.count_books(conditions))
+
+
+async def delete_books(db, conditions, chunk_size: int = Config.BULK_DELETE_CHUNK_SIZE) -> dict:
+    deleted = 0
+    chunks = 0
+    last_id = 0
+    while True:
+        book_ids = (
+            await db.scalars(queries.book_ids_page(conditions, last_id, chunk_size))
+        ).all()
+        if not book_ids:
+            break
+        result = await db.execute(queries.delete_books_by_id(book_ids, conditions))
+        await db.commit()
+        deleted += result.rowcount
+        chunks += 1
+        last_id = book_ids[-1]
+    return {"deleted": deleted, "chunks": chunks}
@@ -0,0 +1,186 @@
+"""Streaming CSV / NDJSON book import.
+
+The upload is parsed line by line as it arrives, valid rows are inserted in
+batched transactions together with their enrichment outbox rows and every
+row gets an entry in the returned report.
+"""
+
+import codecs
+import csv
+import json
+from pydantic import ValidationError
+from config import Config
+from enrichment import cache_key, enqueue_enrichment, get_cached_enrichments
+from models import Book
+
+
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+
+CONTENT_TYPES = {
+    "text/csv": FORMAT_CSV,
+    "application/csv": FORMAT_CSV,
+    "application/x-ndjson": FORMAT_NDJSON,
+    "application/ndjson": FORMAT_NDJSON,
+    "application/jsonl": FORMAT_NDJSON,
+}
+
+
+class ImportFormatError(Exception):
+    """The upload cannot be parsed as the requested format."""
+
+
+def detect_format(content_type, requested=None):
+    if requested is not None:
+        if requested not in (FORMAT_CSV, FORMAT_NDJSON):
+            return None
+        return requested
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPES.get(media_type)
+
+
+async def iter_lines(chunks):
+    """Decode a byte stream into text lines without buffering the whole body."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_csv_rows(lines):
+    """Yield one dict per CSV record; quoted fields may span several lines."""
+    header = None
+    pending = None
+    async for line in lines:
+        pending = line if pending is None else f"{pending}\n{line}"
+        if pending.count('"') % 2:
+            continue
+        record = next(csv.reader([pending]), [])
+        pending = None
+        if not record:
+            continue
+        if header is None:
+            header = [name.strip().lower() for name in record]
+            if "title" not in header or "author" not in header:
+                raise ImportFormatError(
+                    "CSV header must contain 'title' and 'author' columns."
+                )
+            continue
+        yield dict(zip(header, record))
+
+    if pending is not None:
+        raise ImportFormatError("CSV ended inside a quoted field.")
+
+
+async def iter_ndjson_rows(lines):
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            yield None
+
+
+def iter_rows(chunks, import_format):
+    lines = iter_lines(chunks)
+    if import_format == FORMAT_CSV:
+        return iter_csv_rows(lines)
+    return iter_ndjson_rows(lines)
+
+
+async def insert_batch(db, owner_id, batch, report):
+    """Insert one batch of validated `(row_number, AddBookRequest)` in one transaction."""
+    cached = await get_cached_enrichments(
+        db, [(request.title, request.author) for _, request in batch]
+    )
+
+    books = []
+    for _, request in batch:
+        result = cached.get(cache_key(request.title, request.author)) or {}
+        books.append(
+            Book(
+                title=request.title,
+                author=request.author,
+                summary=result.get("summary_by_ai"),
+                category=result.get("category_by_ai"),
+                owner_id=owner_id,
+            )
+        )
+
+    db.add_all(books)
+    await db.flush()
+    queued = 0
+    for book in books:
+        if cache_key(book.title, book.author) not in cached:
+            enqueue_enrichment(db, book.id)
+            queued += 1
+    rows = [
+        {
+            "row": row_number,
+            "status": "created",
+            "id": book.id,
+            "enrichment_status": (
+                "done" if cache_key(book.title, book.author) in cached else "pending"
+            ),
+        }
+        for (row_number, _), book in zip(batch, books)
+    ]
+    await db.commit()
+
+    report["rows"].extend(rows)
+    report["created"] += len(rows)
+    return queued
+
+
+async def import_books(db, owner_id, rows, request_model, on_batch=None):
+    """Validate and insert streamed rows, returning a per-row report."""
+    report = {"created": 0, "failed": 0, "rows": []}
+    batch = []
+
+    async def flush():
+        queued = await insert_batch(db, owner_id, batch, report)
+        batch.clear()
+        if on_batch is not None and queued:
+            on_batch()
+
+    row_number = 0
+    async for row in rows:
+        row_number += 1
+        if not isinstance(row, dict):
+            report["failed"] += 1
+            report["rows"].append(
+                {"row": row_number, "status": "invalid", "errors": ["Malformed row."]}
+            )
+            continue
+        try:
+            request = request_model.model_validate(row)
+        except ValidationError as exc:
+            report["failed"] += 1
+            report["rows"].append(
+                {
+                    "row": row_number,
+                    "status": "invalid",
+                    "errors": [
+                        f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+                        for error in exc.errors()
+                    ],
+                }
+            )
+            continue
+
+        batch.append((row_number, request))
+        if len(batch) >= Config.IMPORT_BATCH_SIZE:
+            await flush()
+
+    if batch:
+        await flush()
+
+    report["rows"].sort(key=lambda row: row["row"])
+    return report
@@ -0,0 +1,339 @@
+"""Storage behind the response cache.
+
+Every backend offers the same small async interface: TTL'd `get`/`set` of
+JSON-compatible values plus never-expiring counters (`incr`/`counters`)
+that the response cache uses as invalidation generations.
+
+* `MemoryBackend`: this process only (the default, fine for one worker).
+* `SQLiteBackend`: a WAL-mode SQLite file shared by the workers on one host.
+* `RedisBackend`: any server speaking the Redis protocol (RESP), shared by
+  workers on any host. `redis_stub.py` is a local stand-in for tests.
+
+Shared backends store values as JSON, so tuples come back as lists.
+Failures surface as one of `BACKEND_ERRORS`, which callers treat as a miss.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+from cache import TTLCache
+
+
+class MemoryBackend:
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self.entries = TTLCache(maxsize, ttl, clock)
+        self._counters = {}
+
+    async def get(self, key: str):
+        return self.entries.get(key)
+
+    async def set(self, key: str, value):
+        self.entries.set(key, value)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def counters(self, keys) -> list:
+        return [self._counters.get(key, 0) for key in keys]
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self.entries.stats()}
+
+
+SQLITE_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS entries "
+    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_entries_expires_at ON entries (expires_at)",
+    "CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+)
+
+
+class SQLiteBackend:
+    """Cache entries in a SQLite file on the local host.
+
+    Each worker thread keeps its own connection. Expiry uses wall-clock time
+    so all processes agree on it. Every `evict_every` writes, expired entries
+    are dropped and then the ones closest to expiry until at most `maxsize`
+    remain; with a single TTL that is oldest-first.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        maxsize: int,
+        ttl: float,
+        evict_every: int = 100,
+        clock=time.time,
+    ):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self.clock = clock
+        self.evictions = 0
+        self.expirations = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            # Losing the cache on a crash is harmless; durability is not needed.
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            for statement in SQLITE_SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _get(self, key: str):
+        row = self._connection().execute(
+            "SELECT value FROM entries WHERE key = ? AND expires_at > ?",
+            (key, self.clock()),
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def _set(self, key: str, value):
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), self.clock() + self.ttl),
+        )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        if evict:
+            self._evict(connection)
+
+    def _evict(self, connection):
+        expired = connection.execute(
+            "DELETE FROM entries WHERE expires_at <= ?", (self.clock(),)
+        ).rowcount
+        overflow = connection.execute("SELECT count(*) FROM entries").fetchone()[0]
+        overflow -= self.maxsize
+        evicted = 0
+        if overflow > 0:
+            evicted = connection.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY expires_at LIMIT ?)",
+                (overflow,),
+            ).rowcount
+        with self._lock:
+            self.expirations += expired
+            self.evictions += evicted
+
+    def _incr(self, key: str) -> int:
+        return self._connection().execute(
+            "INSERT INTO counters (key, value) VALUES (?, 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1 RETURNING value",
+            (key,),
+        ).fetchone()[0]
+
+    def _counters(self, keys) -> list:
+        keys = list(keys)
+        rows = dict(
+            self._connection().execute(
+                f"SELECT key, value FROM counters WHERE key IN ({', '.join('?' * len(keys))})",
+                keys,
+            )
+        )
+        return [rows.get(key, 0) for key in keys]
+
+    async def get(self, key: str):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value):
+        await asyncio.to_thread(self._set, key, value)
+
+    async def incr(self, key: str) -> int:
+        return await asyncio.to_thread(self._incr, key)
+
+    async def counters(self, keys) -> list:
+        return await asyncio.to_thread(self._counters, keys)
+
+    async def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "maxsize": self.maxsize,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CacheBackendError(Exception):
+    """The backend failed or did not answer in time."""
+
+
+class RedisError(CacheBackendError):
+    """An error reply from the server."""
+
+
+# Everything a backend call may raise when the store is down or misbehaving.
+BACKEND_ERRORS = (CacheBackendError, OSError, EOFError, ValueError, sqlite3.Error)
+
+
+def encode_command(*args) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by the server.")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise RedisError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise RedisError(f"Unexpected reply: {line!r}")
+
+
+class RedisBackend:
+    """Minimal RESP client: one connection per process, one command at a time.
+
+    Entries are plain keys with a TTL (`SET ... PX`), so eviction is left to
+    the server's `maxmemory-policy`. Counters are keys without a TTL.
+
+    A command that does not finish (connection, queueing behind the lock and
+    the reply included) within `timeout` seconds raises `CacheBackendError`,
+    so a hung server costs each request at most that long.
+    """
+
+    def __init__(
+        self, url: str, ttl: float, prefix: str = "books:", timeout: float = 0.5
+    ):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = parsed.password
+        self.ttl = ttl
+        self.prefix = prefix
+        self.timeout = timeout
+        self.reconnects = 0
+        self.timeouts = 0
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self.reconnects += 1
+        if self.password:
+            await self._call("AUTH", self.password)
+        if self.db:
+            await self._call("SELECT", self.db)
+
+    async def _call(self, *args):
+        self._writer.write(encode_command(*args))
+        await self._writer.drain()
+        return await read_reply(self._reader)
+
+    async def execute(self, *args):
+        try:
+            return await asyncio.wait_for(self._execute(*args), self.timeout)
+        except asyncio.TimeoutError as exc:
+            self.timeouts += 1
+            raise CacheBackendError(
+                f"No reply from {self.host}:{self.port} within {self.timeout}s."
+            ) from exc
+
+    async def _execute(self, *args):
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await self._connect()
+                return await self._call(*args)
+            except BaseException:
+                # Failed, timed out or cancelled mid-command: the reply may
+                # still arrive and would be read as the answer to the next
+                # command, so the connection is never reused.
+                self._drop()
+                raise
+
+    def _drop(self):
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+
+    async def get(self, key: str):
+        data = await self.execute("GET", self.prefix + key)
+        return None if data is None else json.loads(data)
+
+    async def set(self, key: str, value):
+        await self.execute(
+            "SET", self.prefix + key, json.dumps(value), "PX", int(self.ttl * 1000)
+        )
+
+    async def incr(self, key: str) -> int:
+        return await self.execute("INCR", self.prefix + key)
+
+    async def counters(self, keys) -> list:
+        values = await self.execute("MGET", *(self.prefix + key for key in keys))
+        return [int(value) if value is not None else 0 for value in values]
+
+    async def close(self):
+        async with self._lock:
+            self._drop()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis",
+            "host": self.host,
+            "port": self.port,
+            "reconnects": self.reconnects,
+            "timeouts": self.timeouts,
+        }
+
+
+def create_backend(name: str, url: str, maxsize: int, ttl: float, timeout: float = 0.5):
+    if name == "memory":
+        return MemoryBackend(maxsize, ttl)
+    # Without a URL SQLite would open a private temporary database: a cache
+    # that looks healthy but is shared with no one.
+    if name in ("sqlite", "redis") and url in ("", ":memory:"):
+        raise ValueError(f"The {name} cache backend needs RESPONSE_CACHE_URL.")
+    if name == "sqlite":
+        return SQLiteBackend(url, maxsize, ttl)
+    if name == "redis":
+        return RedisBackend(url, ttl, timeout=timeout)
+    raise ValueError(f"Unknown cache backend: {name!r}")
@@ -17,3 +17,104 @@ class Config:
     # JWT
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
     JWT_HASH_ALGORITHM = os.getenv("JWT_HASH_ALGORITHM")
+
+    # Enrichment outbox workers
+    ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", "2"))
+    ENRICHMENT_MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "6"))
+    ENRICHMENT_POLL_INTERVAL = float(os.getenv("ENRICHMENT_POLL_INTERVAL", "2"))
+    ENRICHMENT_BACKOFF_BASE = float(os.getenv("ENRICHMENT_BACKOFF_BASE", "5"))
+    ENRICHMENT_BACKOFF_MAX = float(os.getenv("ENRICHMENT_BACKOFF_MAX", "900"))
+    ENRICHMENT_LEASE_SECONDS = float(os.getenv("ENRICHMENT_LEASE_SECONDS", "120"))
+
+    # N8N webhook client
+    N8N_MAX_CONCURRENCY = int(os.getenv("N8N_MAX_CONCURRENCY", "10"))
+    N8N_MAX_CONNECTIONS = int(os.getenv("N8N_MAX_CONNECTIONS", "10"))
+    N8N_TIMEOUT_DEFAULT = float(os.getenv("N8N_TIMEOUT_DEFAULT", "60"))
+    N8N_TIMEOUT_MIN = float(os.getenv("N8N_TIMEOUT_MIN", "5"))
+    N8N_TIMEOUT_MAX = float(os.getenv("N8N_TIMEOUT_MAX", "60"))
+    N8N_TIMEOUT_PERCENTILE = float(os.getenv("N8N_TIMEOUT_PERCENTILE", "0.99"))
+    N8N_TIMEOUT_MULTIPLIER = float(os.getenv("N8N_TIMEOUT_MULTIPLIER", "2"))
+    N8N_LATENCY_WINDOW = int(os.getenv("N8N_LATENCY_WINDOW", "200"))
+    N8N_LATENCY_MIN_SAMPLES = int(os.getenv("N8N_LATENCY_MIN_SAMPLES", "20"))
+    N8N_BREAKER_FAILURES = int(os.getenv("N8N_BREAKER_FAILURES", "5"))
+    N8N_BREAKER_RESET_SECONDS = float(os.getenv("N8N_BREAKER_RESET_SECONDS", "30"))
+
+    # Enrichment result cache
+    ENRICHMENT_CACHE_SIZE = int(os.getenv("ENRICHMENT_CACHE_SIZE", "2048"))
+    ENRICHMENT_CACHE_TTL = float(os.getenv("ENRICHMENT_CACHE_TTL", "3600"))
+
+    # Per-user cache of read endpoint responses: "memory" (per worker),
+    # "sqlite" (URL is a file path shared by the workers on this host) or
+    # "redis" (URL like redis://host:6379/0, shared by every worker)
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "")
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "4096"))
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+    RESPONSE_CACHE_TIMEOUT = float(os.getenv("RESPONSE_CACHE_TIMEOUT", "0.5"))
+
+    # Password hashing pool: bcrypt runs on these threads, and logins or
+    # sign-ups beyond MAX_PENDING running or queued hashes get a 503.
+    # Keep MAX_PENDING below the DB pool's size + overflow.
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "10"))
+
+    # Bulk import
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+    # Re-enrichment backfill
+    BACKFILL_CHECKPOINT_PATH = os.getenv(
+        "BACKFILL_CHECKPOINT_PATH", ".backfill_checkpoint.json"
+    )
+
+    # Database connection pool
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+    # Read replicas (comma-separated URLs); empty means every read hits the primary
+    SQL_REPLICA_URLS = [
+        url.strip() for url in os.getenv("SQL_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+    DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "10"))
+    DB_REPLICA_CHECK_TIMEOUT = float(os.getenv("DB_REPLICA_CHECK_TIMEOUT", "2"))
+    # Shared between workers through the response cache backend, whose TTL
+    # must be longer than this window
+    DB_READ_AFTER_WRITE_SECONDS = float(os.getenv("DB_READ_AFTER_WRITE_SECONDS", "5"))
+
+    # Production SQLite profile (WAL + tuned pragmas + scheduled maintenance)
+    SQLITE_PRODUCTION = os.getenv("SQLITE_PRODUCTION", "false").lower() in ("1", "true", "yes")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # ms
+    SQLITE_MAINTENANCE_POLL = float(os.getenv("SQLITE_MAINTENANCE_POLL", "60"))
+    SQLITE_OPTIMIZE_INTERVAL = float(os.getenv("SQLITE_OPTIMIZE_INTERVAL", "3600"))
+    SQLITE_ANALYZE_INTERVAL = float(os.getenv("SQLITE_ANALYZE_INTERVAL", "86400"))
+    SQLITE_VACUUM_INTERVAL = float(os.getenv("SQLITE_VACUUM_INTERVAL", "3600"))
+    SQLITE_VACUUM_PAGES = int(os.getenv("SQLITE_VACUUM_PAGES", "2000"))
+
+    # Keyset-paginated listings
+    PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+    PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+    # Streaming export
+    EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+    # Admin bulk delete
+    BULK_DELETE_CHUNK_SIZE = int(os.getenv("BULK_DELETE_CHUNK_SIZE", "500"))
+
+    # Background account deletion
+    ACCOUNT_DELETION_CHUNK_SIZE = int(os.getenv("ACCOUNT_DELETION_CHUNK_SIZE", "500"))
+    ACCOUNT_DELETION_POLL_INTERVAL = float(
+        os.getenv("ACCOUNT_DELETION_POLL_INTERVAL", "5")
+    )
+    ACCOUNT_DELETION_LEASE_SECONDS = float(
+        os.getenv("ACCOUNT_DELETION_LEASE_SECONDS", "120")
+    )
+    ACCOUNT_DELETION_MAX_ATTEMPTS = int(os.getenv("ACCOUNT_DELETION_MAX_ATTEMPTS", "5"))
+
+    # Library statistics
+    STATS_TOP_N = int(os.getenv("STATS_TOP_N", "10"))
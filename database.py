@@ -1,18 +1,561 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import hashlib
+import logging
+import time
+from collections import deque
+from functools import partial
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from cache import TTLCache
+from cache_backends import BACKEND_ERRORS
 from config import Config
+from response_cache import response_cache
 
 
+logger = logging.getLogger(__name__)
+
 SQL_DATABASE_URL = Config.SQL_DATABASE_URL
 
+
+class PoolMetrics:
+    """Checkout wait, saturation and connection churn for one engine's pool."""
+
+    def __init__(self, window: int = 1000):
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+        self.wait_max = 0.0
+        self.wait_total = 0.0
+        self.waits = deque(maxlen=window)
+        self.pool = None
+
+    def record_wait(self, seconds: float):
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        self.waits.append(seconds)
+
+    def wait_percentile(self, q: float) -> float:
+        if not self.waits:
+            return 0.0
+        ordered = sorted(self.waits)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        checked_out = pool.checkedout() if pool is not None else 0
+        max_overflow = getattr(pool, "max_overflow", None)
+        capacity = pool.size() + max_overflow if max_overflow is not None else None
+        return {
+            "pool_class": type(pool).__name__ if pool is not None else None,
+            "checked_out": checked_out,
+            "overflow": max(pool.overflow(), 0) if isinstance(pool, QueuePool) else 0,
+            "capacity": capacity,
+            "saturation": checked_out / capacity if capacity else None,
+            "peak_checked_out": self.peak_checked_out,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "checkout_timeouts": self.timeouts,
+            "checkout_wait_p50": self.wait_percentile(0.5),
+            "checkout_wait_p99": self.wait_percentile(0.99),
+            "checkout_wait_max": self.wait_max,
+            "checkout_wait_mean": self.wait_total / self.checkouts if self.checkouts else 0.0,
+            "connections_opened": self.connects,
+            "connections_closed": self.closes,
+            "connections_invalidated": self.invalidations,
+        }
+
+
+class TimedCheckoutMixin:
+    """Times how long callers wait to get a connection out of a queue pool.
+
+    Wraps the public `Pool.connect()`, so the time includes a pre-ping or a
+    fresh connect for an overflow slot as well as the wait for a free one.
+    """
+
+    metrics = None
+
+    def __init__(self, *args, max_overflow: int = 10, **kwargs):
+        # Kept for the capacity figure; QueuePool only exposes the current overflow.
+        self.max_overflow = max_overflow if max_overflow >= 0 else None
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - started)
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep reporting to the same metrics.
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        self.metrics.pool = pool
+        return pool
+
+
+class InstrumentedQueuePool(TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_pool(target_engine, metrics: PoolMetrics):
+    pool = target_engine.pool
+    metrics.pool = pool
+    if isinstance(pool, TimedCheckoutMixin):
+        pool.metrics = metrics
+
+    @event.listens_for(pool, "connect")
+    def on_connect(_dbapi_connection, _connection_record):
+        metrics.connects += 1
+
+    @event.listens_for(pool, "close")
+    def on_close(_dbapi_connection, _connection_record):
+        metrics.closes += 1
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(_dbapi_connection, _connection_record, _exception):
+        metrics.invalidations += 1
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(_dbapi_connection, _connection_record, _connection_proxy):
+        metrics.checkouts += 1
+        metrics.peak_checked_out = max(
+            metrics.peak_checked_out, metrics.pool.checkedout()
+        )
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(_dbapi_connection, _connection_record):
+        metrics.checkins += 1
+
+
+def pool_options(url: str, poolclass=InstrumentedQueuePool) -> dict:
+    if url.startswith("sqlite") and ":memory:" in url:
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": Config.DB_POOL_SIZE,
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "pool_timeout": Config.DB_POOL_TIMEOUT,
+        "pool_recycle": Config.DB_POOL_RECYCLE,
+        "pool_pre_ping": Config.DB_POOL_PRE_PING,
+    }
+
+
+def sqlite_pragmas() -> dict:
+    """Per-connection pragmas of the production SQLite profile."""
+    return {
+        # Only takes effect on a new database (or after a full VACUUM).
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": Config.SQLITE_SYNCHRONOUS,
+        "mmap_size": Config.SQLITE_MMAP_SIZE,
+        "cache_size": Config.SQLITE_CACHE_SIZE,
+        "busy_timeout": Config.SQLITE_BUSY_TIMEOUT,
+    }
+
+
+def apply_sqlite_pragmas(target_engine, pragmas: dict):
+    @event.listens_for(target_engine, "connect")
+    def on_connect(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
 if SQL_DATABASE_URL.startswith("sqlite"):
     engine = create_engine(
-        url=SQL_DATABASE_URL, connect_args={"check_same_thread": False}
+        url=SQL_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        **pool_options(SQL_DATABASE_URL),
     )
 else:
-    engine = create_engine(url=SQL_DATABASE_URL)
+    engine = create_engine(url=SQL_DATABASE_URL, **pool_options(SQL_DATABASE_URL))
+
+pool_metrics = PoolMetrics()
+instrument_pool(engine, pool_metrics)
+
+if SQL_DATABASE_URL.startswith("sqlite") and Config.SQLITE_PRODUCTION:
+    apply_sqlite_pragmas(engine, sqlite_pragmas())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+# libpq options that asyncpg.connect() does not accept; the dialect would
+# pass them through from the URL and fail every connection.
+LIBPQ_ONLY_OPTIONS = ("sslmode", "channel_binding")
+
+
+def async_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver (asyncpg / aiosqlite)."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "postgresql":
+        return (
+            parsed.set(drivername="postgresql+asyncpg")
+            .difference_update_query(LIBPQ_ONLY_OPTIONS)
+            .render_as_string(hide_password=False)
+        )
+    if parsed.get_backend_name() == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(
+            hide_password=False
+        )
+    return url
+
+
+def async_connect_args(url: str) -> dict:
+    """asyncpg arguments standing in for the options `async_url` drops.
+
+    asyncpg takes libpq's sslmode names for `ssl`. It has no channel binding
+    setting, so `channel_binding` is dropped.
+    """
+    parsed = make_url(url)
+    sslmode = parsed.query.get("sslmode")
+    if parsed.get_backend_name() == "postgresql" and sslmode:
+        return {"ssl": sslmode if isinstance(sslmode, str) else sslmode[-1]}
+    return {}
+
+
+# The routers run on the async engine; the sync engine above stays for
+# Alembic and scripts.
+async_engine = create_async_engine(
+    async_url(SQL_DATABASE_URL),
+    connect_args=async_connect_args(SQL_DATABASE_URL),
+    **pool_options(SQL_DATABASE_URL, poolclass=InstrumentedAsyncQueuePool),
+)
+
+async_pool_metrics = PoolMetrics()
+instrument_pool(async_engine.sync_engine, async_pool_metrics)
+
+if SQL_DATABASE_URL.startswith("sqlite") and Config.SQLITE_PRODUCTION:
+    apply_sqlite_pragmas(async_engine.sync_engine, sqlite_pragmas())
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
+
+
+# A replica that replayed everything it received is caught up: the time since
+# the last replayed transaction only says how long the primary has been idle.
+LAG_QUERIES = {
+    "postgresql": (
+        "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+        "END"
+    ),
+}
+
+
+class Replica:
+    """One read replica with its own pool and its last known health and lag."""
+
+    def __init__(self, url: str):
+        parsed = make_url(url)
+        self.name = parsed.render_as_string(hide_password=True)
+        self.engine = create_async_engine(
+            async_url(url),
+            connect_args=async_connect_args(url),
+            **pool_options(url, poolclass=InstrumentedAsyncQueuePool),
+        )
+        self.metrics = PoolMetrics()
+        instrument_pool(self.engine.sync_engine, self.metrics)
+        self.session_factory = async_sessionmaker(
+            bind=self.engine, autoflush=False, expire_on_commit=False
+        )
+        self.lag_query = text(LAG_QUERIES.get(parsed.get_backend_name(), "SELECT 0"))
+        # Unchecked replicas get no traffic until the first health check passes.
+        self.healthy = False
+        self.lag = None
+        self.last_error = "Not checked yet."
+        self.checked_at = None
+
+        @event.listens_for(self.engine.sync_engine, "handle_error")
+        def on_error(context):
+            if context.is_disconnect:
+                self.healthy = False
+                self.last_error = str(context.original_exception)
+
+    async def _measure_lag(self) -> float:
+        async with self.engine.connect() as connection:
+            return float(await connection.scalar(self.lag_query) or 0)
+
+    async def check(self, max_lag: float, timeout: float):
+        try:
+            self.lag = await asyncio.wait_for(self._measure_lag(), timeout)
+        except (SQLAlchemyError, OSError) as exc:
+            self.healthy = False
+            self.lag = None
+            self.last_error = str(exc) or type(exc).__name__
+            return
+        self.healthy = self.lag <= max_lag
+        self.last_error = None if self.healthy else f"Replica is {self.lag:.1f}s behind."
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag": self.lag,
+            "last_error": self.last_error,
+            "pool": self.metrics.snapshot(),
+        }
+
+
+class ReplicaSet:
+    """Round-robins reads over the healthy replicas.
+
+    A background task re-checks each replica's health and replication lag
+    every `check_interval` seconds; `choose()` only reads the last results,
+    so a slow replica never holds up a request. With no healthy replica,
+    reads go to the primary.
+    """
+
+    def __init__(
+        self,
+        urls,
+        max_lag: float = Config.DB_REPLICA_MAX_LAG,
+        check_interval: float = Config.DB_REPLICA_CHECK_INTERVAL,
+        check_timeout: float = Config.DB_REPLICA_CHECK_TIMEOUT,
+        clock=time.monotonic,
+    ):
+        self.replicas = [Replica(url) for url in urls]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.clock = clock
+        self.routed = 0
+        self.fallbacks = 0
+        self._next = 0
+        self._task = None
+
+    def __len__(self):
+        return len(self.replicas)
+
+    async def refresh(self):
+        """Check every replica now."""
+        results = await asyncio.gather(
+            *(replica.check(self.max_lag, self.check_timeout) for replica in self.replicas),
+            return_exceptions=True,
+        )
+        now = self.clock()
+        for replica, result in zip(self.replicas, results):
+            # An unexpected failure must not leave the last good state behind,
+            # nor stop the loop that keeps checking.
+            if isinstance(result, Exception):
+                logger.error(
+                    "Health check of replica %s failed", replica.name, exc_info=result
+                )
+                replica.healthy = False
+                replica.lag = None
+                replica.last_error = str(result) or type(result).__name__
+            replica.checked_at = now
+
+    async def start(self):
+        if self.replicas:
+            self._task = asyncio.create_task(self._run(), name="replica-health-checks")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.check_interval)
+
+    def choose(self):
+        """Return the next healthy replica, or None to fall back to the primary."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            self.fallbacks += 1
+            return None
+        replica = healthy[self._next % len(healthy)]
+        self._next += 1
+        self.routed += 1
+        return replica
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "routed": self.routed,
+            "fallbacks": self.fallbacks,
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
+
+
+read_replicas = ReplicaSet(Config.SQL_REPLICA_URLS)
+
+
+class RecentWrites:
+    """Clients that committed a write in the last `window` seconds.
+
+    They read from the primary until the replicas caught up. A worker
+    remembers its own clients' writes and publishes them to the response
+    cache's backend, so with a shared backend (sqlite or redis) the other
+    workers route those clients to the primary too. When the backend
+    cannot be read the client counts as a recent writer.
+    """
+
+    def __init__(self, cache, window: float, clock=time.time):
+        self.cache = cache
+        self.window = window
+        self.clock = clock
+        self.local = TTLCache(maxsize=10_000, ttl=window)
+        self.errors = 0
+
+    def remember(self, key: str):
+        self.local.set(key, True)
+
+    async def publish(self, key: str):
+        try:
+            await self.cache.backend.set(f"wrote:{key}", [self.clock()])
+        except BACKEND_ERRORS:
+            logger.exception("Could not share a recent write")
+            self.errors += 1
+
+    async def seen(self, key: str) -> bool:
+        if self.local.get(key) is not None:
+            return True
+        try:
+            entry = await self.cache.backend.get(f"wrote:{key}")
+        except BACKEND_ERRORS:
+            logger.exception("Could not read recent writes")
+            self.errors += 1
+            return True
+        return entry is not None and self.clock() - entry[0] < self.window
+
+    def clear(self):
+        self.local.clear()
+
+
+recent_writes = RecentWrites(response_cache, Config.DB_READ_AFTER_WRITE_SECONDS)
+
+
+def client_key(request: Request) -> str:
+    credential = request.headers.get("authorization") or request.cookies.get(
+        "access_token"
+    )
+    if credential is None:
+        credential = request.client.host if request.client else ""
+    return hashlib.sha256(credential.encode()).hexdigest()
+
+
+@event.listens_for(Session, "after_flush")
+def mark_flush_write(session, _flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def mark_statement_write(orm_execute_state):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def remember_write(session):
+    key = session.info.get("client_key")
+    if session.info.pop("wrote", False) and key is not None:
+        recent_writes.remember(key)
+        session.info["unpublished_write"] = True
+
+
+class LazySession:
+    """Stands in for a Session and only creates it on first use.
+
+    Handlers that return early (e.g. redirect to the login page) never touch
+    the session, so they never check a connection out of the pool.
+    """
+
+    def __init__(self, session_factory):
+        self._session_factory = session_factory
+        self._session = None
+
+    @property
+    def session_started(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name):
+        if self._session is None:
+            self._session = self._session_factory()
+        return getattr(self._session, name)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    async def commit(self):
+        if self._session is None:
+            self._session = self._session_factory()
+        await self._session.commit()
+        # Published before the response goes out, so the client's next read
+        # finds it on whichever worker serves it.
+        if self._session.info.pop("unpublished_write", False):
+            await recent_writes.publish(self._session.info["client_key"])
+
+    async def aclose(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+async def get_db(request: Request):
+    key = client_key(request) if read_replicas else None
+    db = LazySession(partial(AsyncSessionLocal, info={"client_key": key}))
+    try:
+        yield db
+    finally:
+        await db.aclose()
+
+
+async def get_read_session_factory(request: Request):
+    """Session factory for reads: a replica when one is usable.
+
+    Clients that committed a write in the last DB_READ_AFTER_WRITE_SECONDS
+    stay on the primary so they read their own writes. Handlers that stream
+    their response use this directly and open the session in the stream.
+    """
+    if read_replicas and not await recent_writes.seen(client_key(request)):
+        replica = read_replicas.choose()
+        if replica is not None:
+            return replica.session_factory
+    return AsyncSessionLocal
+
+
+async def get_read_db(request: Request):
+    """Session for read-only handlers, see `get_read_session_factory`."""
+    db = LazySession(await get_read_session_factory(request))
+    try:
+        yield db
+    finally:
+        await db.aclose()
@@ -0,0 +1,339 @@
+"""Background enrichment of books through the N8N webhook.
+
+`add_new_book` stores the book and an `EnrichmentJob` outbox row in the same
+transaction and returns straight away. The worker pool started with the app
+drains the outbox, calls N8N and fills in `summary` and `category`, retrying
+failed calls with exponential backoff.
+
+Results are cached by normalized (title, author), in process and in the
+`enrichment_cache` table, so popular books only reach N8N once, and
+concurrent jobs for the same book share a single in-flight webhook call.
+"""
+
+import asyncio
+import logging
+import random
+from datetime import timedelta
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from book_keys import cache_key
+from cache import SingleFlight, TTLCache
+from config import Config
+from database import AsyncSessionLocal
+from models import Book, EnrichmentCacheEntry, EnrichmentJob, utcnow
+from n8n import CircuitOpenError, WebhookError, n8n_client
+from response_cache import response_cache
+
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+memory_cache = TTLCache(Config.ENRICHMENT_CACHE_SIZE, Config.ENRICHMENT_CACHE_TTL)
+cache_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+enrichment_flight = SingleFlight()
+
+
+async def get_cached_enrichment(db, title: str, author: str):
+    """Return a cached webhook result for this title/author, or None."""
+    key = cache_key(title, author)
+
+    result = memory_cache.get(key)
+    if result is not None:
+        cache_stats["memory_hits"] += 1
+        return result
+
+    entry = await db.get(EnrichmentCacheEntry, key)
+    if entry is None:
+        cache_stats["misses"] += 1
+        return None
+
+    result = {"summary_by_ai": entry.summary, "category_by_ai": entry.category}
+    memory_cache.set(key, result)
+    cache_stats["db_hits"] += 1
+    return result
+
+
+async def get_cached_enrichments(db, pairs) -> dict:
+    """Batch variant of `get_cached_enrichment`, keyed by `cache_key`."""
+    found = {}
+    missing = set()
+    for title, author in pairs:
+        key = cache_key(title, author)
+        result = memory_cache.get(key)
+        if result is not None:
+            cache_stats["memory_hits"] += 1
+            found[key] = result
+        else:
+            missing.add(key)
+
+    if missing:
+        entries = (
+            await db.scalars(
+                select(EnrichmentCacheEntry).filter(
+                    EnrichmentCacheEntry.cache_key.in_(missing)
+                )
+            )
+        ).all()
+        for entry in entries:
+            result = {"summary_by_ai": entry.summary, "category_by_ai": entry.category}
+            memory_cache.set(entry.cache_key, result)
+            found[entry.cache_key] = result
+        cache_stats["db_hits"] += len(entries)
+        cache_stats["misses"] += len(missing) - len(entries)
+    return found
+
+
+async def store_cached_enrichment(db, title: str, author: str, result: dict):
+    summary = result.get("summary_by_ai")
+    category = result.get("category_by_ai")
+    if summary is None and category is None:
+        return
+
+    key = cache_key(title, author)
+    memory_cache.set(key, {"summary_by_ai": summary, "category_by_ai": category})
+    try:
+        await db.merge(
+            EnrichmentCacheEntry(
+                cache_key=key,
+                title=title,
+                author=author,
+                summary=summary,
+                category=category,
+            )
+        )
+        await db.commit()
+    except IntegrityError:
+        # Another worker stored the same key first.
+        await db.rollback()
+
+
+async def fetch_enrichment(title: str, author: str) -> dict:
+    """Call N8N, sharing the call with concurrent requests for the same book."""
+    return await enrichment_flight.do(
+        cache_key(title, author), lambda: n8n_client.enrich(title, author)
+    )
+
+
+def enqueue_enrichment(db, book_id: int) -> EnrichmentJob:
+    job = EnrichmentJob(book_id=book_id, status=STATUS_PENDING)
+    db.add(job)
+    return job
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the given (1-based) attempt number."""
+    delay = min(
+        Config.ENRICHMENT_BACKOFF_MAX,
+        Config.ENRICHMENT_BACKOFF_BASE * 2 ** max(attempts - 1, 0),
+    )
+    return random.uniform(delay / 2, delay)
+
+
+async def claim_next_job(db):
+    """Lease the next due job so no other worker picks it up.
+
+    Running jobs whose lease expired (e.g. the worker died) are due again,
+    unless that was their last attempt: those are marked failed.
+    """
+    now = utcnow()
+    await db.execute(
+        update(EnrichmentJob)
+        .filter(EnrichmentJob.status == STATUS_RUNNING)
+        .filter(EnrichmentJob.next_attempt_at <= now)
+        .filter(EnrichmentJob.attempts >= Config.ENRICHMENT_MAX_ATTEMPTS)
+        .values(status=STATUS_FAILED, last_error="Lease expired on the last attempt.")
+    )
+    due = (
+        await db.scalars(
+            select(EnrichmentJob.id)
+            .filter(EnrichmentJob.status.in_((STATUS_PENDING, STATUS_RUNNING)))
+            .filter(EnrichmentJob.next_attempt_at <= now)
+            .order_by(EnrichmentJob.next_attempt_at)
+            .limit(10)
+        )
+    ).all()
+    await db.commit()
+
+    for job_id in due:
+        claimed = await db.execute(
+            update(EnrichmentJob)
+            .filter(EnrichmentJob.id == job_id)
+            .filter(EnrichmentJob.status.in_((STATUS_PENDING, STATUS_RUNNING)))
+            .filter(EnrichmentJob.next_attempt_at <= now)
+            .values(
+                status=STATUS_RUNNING,
+                attempts=EnrichmentJob.attempts + 1,
+                next_attempt_at=now
+                + timedelta(seconds=Config.ENRICHMENT_LEASE_SECONDS),
+            )
+        )
+        await db.commit()
+        if claimed.rowcount:
+            return await db.get(EnrichmentJob, job_id, populate_existing=True)
+    return None
+
+
+async def fill_book(db, book_id: int, result: dict):
+    # Only fill gaps: the owner may have saved their own values while the
+    # job waited in the outbox.
+    await db.execute(
+        update(Book)
+        .filter(Book.id == book_id)
+        .values(
+            summary=func.coalesce(Book.summary, result.get("summary_by_ai")),
+            category=func.coalesce(Book.category, result.get("category_by_ai")),
+        )
+    )
+
+
+async def complete_job(db, job: EnrichmentJob):
+    """Fill in the job's book and mark the job done. Returns the book's owner."""
+    book_id = job.book_id
+    book = await db.get(Book, book_id)
+    if book is None:
+        job.status = STATUS_DONE
+        job.last_error = "Book no longer exists."
+        await db.commit()
+        return None
+
+    title, author, owner_id = book.title, book.author, book.owner_id
+    result = await get_cached_enrichment(db, title, author)
+    if result is None:
+        # Release the connection while waiting on the webhook.
+        await db.commit()
+        result = await fetch_enrichment(title, author)
+        await store_cached_enrichment(db, title, author, result)
+
+    await fill_book(db, book_id, result)
+    job.status = STATUS_DONE
+    job.last_error = None
+    await db.commit()
+    return owner_id
+
+
+async def reschedule(db, job_id: int, **values):
+    await db.execute(
+        update(EnrichmentJob).filter(EnrichmentJob.id == job_id).values(**values)
+    )
+    await db.commit()
+
+
+async def process_job(db, job: EnrichmentJob):
+    job_id, attempts = job.id, job.attempts
+    try:
+        owner_id = await complete_job(db, job)
+    except CircuitOpenError as exc:
+        # N8N is known to be down: wait for the breaker without burning an attempt.
+        await db.rollback()
+        await reschedule(
+            db,
+            job_id,
+            status=STATUS_PENDING,
+            attempts=attempts - 1,
+            last_error=str(exc),
+            next_attempt_at=utcnow() + timedelta(seconds=exc.retry_after + 1),
+        )
+        return
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        # Anything else (a webhook error, a malformed result, a failed write)
+        # is retried with backoff until the attempts run out; a job is never
+        # left running.
+        if not isinstance(exc, WebhookError):
+            logger.exception("Enrichment job %s failed", job_id)
+        error = str(exc) or type(exc).__name__
+        await db.rollback()
+        if attempts >= Config.ENRICHMENT_MAX_ATTEMPTS:
+            await reschedule(db, job_id, status=STATUS_FAILED, last_error=error)
+        else:
+            await reschedule(
+                db,
+                job_id,
+                status=STATUS_PENDING,
+                last_error=error,
+                next_attempt_at=utcnow() + timedelta(seconds=backoff_delay(attempts)),
+            )
+        return
+
+    if owner_id is not None:
+        await response_cache.invalidate(owner_id)
+
+
+async def run_once(session_factory=AsyncSessionLocal) -> bool:
+    """Claim and process a single job. Returns False when nothing was due."""
+    async with session_factory() as db:
+        job = await claim_next_job(db)
+        if job is None:
+            return False
+        await process_job(db, job)
+        return True
+
+
+async def drain(session_factory=AsyncSessionLocal) -> int:
+    """Process due jobs until the outbox is empty. Returns the number processed."""
+    processed = 0
+    while await run_once(session_factory):
+        processed += 1
+    return processed
+
+
+class EnrichmentWorkerPool:
+    """A fixed number of asyncio workers polling the outbox."""
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        workers: int = Config.ENRICHMENT_WORKERS,
+        poll_interval: float = Config.ENRICHMENT_POLL_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def notify(self):
+        """Wake idle workers, e.g. right after a job was enqueued."""
+        self._wakeup.set()
+
+    async def start(self):
+        self._stopping = False
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"enrichment-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                processed = await run_once(self.session_factory)
+            except SQLAlchemyError:
+                # Jobs handle their own failures; this is the outbox itself
+                # being unreachable. Retry after the poll interval.
+                logger.exception("Enrichment worker failed to claim a job")
+                processed = False
+
+            if processed:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+worker_pool = EnrichmentWorkerPool()
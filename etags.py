@@ -0,0 +1,37 @@
+"""Entity tags for conditional GETs of books.
+
+Tags are opaque digests of what determines a representation: the book's
+`version` (or the owner's `book_collections.version` for listings) plus the
+query parameters that shape the body. Handlers compare `If-None-Match`
+before running the body query and answer 304 straight away on a match.
+"""
+
+import hashlib
+from starlette import status
+from starlette.responses import Response
+
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256("\x1f".join(map(str, parts)).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers(etag))
@@ -0,0 +1,199 @@
+"""Rollup tables behind the per-user and admin library statistics.
+
+Each rollup keeps a `book_count` per key (owner, owner+category, owner+author,
+category, normalized title+author). Triggers on `books` maintain the counts
+in the same transaction as every insert, delete and update of a counted
+column, so all write paths stay covered: the endpoints, bulk import/delete,
+account deletion and enrichment filling in a category. Reads then look up a
+handful of index-ordered rows instead of grouping `books`.
+
+A missing category is counted under `''` per owner, but not in the global
+`category_stats`. Titles are counted by `books.title_key` (see book_keys.py),
+so case and spacing variants add up. Rows whose count drops to zero are
+removed. `python library_stats.py` rebuilds every rollup from `books` in one
+transaction, to repair drift (e.g. rows changed with triggers off).
+
+The same triggers bump `book_collections.version` for the owner of every
+inserted, updated or deleted book; `/books/my-books` derives its ETag from
+it. Versions only ever grow and are left alone by the rebuild.
+"""
+
+import fire
+from sqlalchemy import text
+from database import engine as default_engine
+
+
+class Rollup:
+    """A rollup table: `book_count` per `keys`, plus `labels` kept from one of the rows.
+
+    With `categorized_only`, books without a category are not counted.
+    """
+
+    def __init__(self, keys, labels=(), categorized_only=False):
+        self.keys = keys
+        self.labels = labels
+        self.categorized_only = categorized_only
+
+
+ROLLUPS = {
+    "user_stats": Rollup(("owner_id",)),
+    "user_category_stats": Rollup(("owner_id", "category")),
+    "user_author_stats": Rollup(("owner_id", "author")),
+    # Every new book is uncategorized until enriched: an '' row here would be
+    # one row updated by every insert from every user.
+    "category_stats": Rollup(("category",), categorized_only=True),
+    "title_stats": Rollup(("title_key",), labels=("title", "author")),
+}
+
+COUNTED_COLUMNS = ("owner_id", "category", "title", "author", "title_key")
+
+
+def key_value(column: str, row: str) -> str:
+    if column == "category":
+        return f"coalesce({row}.category, '')"
+    return f"{row}.{column}"
+
+
+def counted(rollup: Rollup, row: str) -> str:
+    # Rows without an owner are left out of the per-owner rollups.
+    conditions = [
+        f"{row}.{column} IS NOT NULL" for column in rollup.keys if column != "category"
+    ]
+    if rollup.categorized_only:
+        conditions.append(f"coalesce({row}.category, '') <> ''")
+    return " AND ".join(conditions) or "1 = 1"
+
+
+def add_statements(row: str = "new", rollups=None) -> list:
+    statements = []
+    for table, rollup in (rollups or ROLLUPS).items():
+        keys = ", ".join(rollup.keys)
+        names = ", ".join(rollup.keys + rollup.labels)
+        values = ", ".join(
+            [key_value(column, row) for column in rollup.keys]
+            + [f"{row}.{column}" for column in rollup.labels]
+        )
+        statements.append(
+            f"INSERT INTO {table} ({names}, book_count) "
+            f"SELECT {values}, 1 WHERE {counted(rollup, row)} "
+            f"ON CONFLICT ({keys}) DO UPDATE SET book_count = {table}.book_count + 1"
+        )
+    return statements
+
+
+def remove_statements(row: str = "old", rollups=None) -> list:
+    statements = []
+    for table, rollup in (rollups or ROLLUPS).items():
+        match = " AND ".join(
+            f"{column} = {key_value(column, row)}" for column in rollup.keys
+        )
+        statements.append(
+            f"UPDATE {table} SET book_count = book_count - 1 WHERE {match}"
+        )
+        statements.append(f"DELETE FROM {table} WHERE {match} AND book_count <= 0")
+    return statements
+
+
+def rebuild_statements(rollups=None) -> list:
+    statements = []
+    for table, rollup in (rollups or ROLLUPS).items():
+        names = ", ".join(rollup.keys + rollup.labels)
+        keys = ", ".join(key_value(column, "books") for column in rollup.keys)
+        labels = "".join(f"min(books.{column}), " for column in rollup.labels)
+        statements.append(f"DELETE FROM {table}")
+        statements.append(
+            f"INSERT INTO {table} ({names}, book_count) "
+            f"SELECT {keys}, {labels}count(*) FROM books "
+            f"WHERE {counted(rollup, 'books')} GROUP BY {keys}"
+        )
+    return statements
+
+
+def bump_collection(row: str) -> str:
+    return (
+        f"INSERT INTO book_collections (owner_id, version) "
+        f"SELECT {row}.owner_id, 1 WHERE {row}.owner_id IS NOT NULL "
+        f"ON CONFLICT (owner_id) DO UPDATE SET version = book_collections.version + 1"
+    )
+
+
+def _body(statements) -> str:
+    return " ".join(f"{statement};" for statement in statements)
+
+
+def changed(counted_columns) -> str:
+    return " OR ".join(f"old.{column} IS NOT new.{column}" for column in counted_columns)
+
+
+def sqlite_stats_ddl(rollups=None, counted_columns=COUNTED_COLUMNS) -> tuple:
+    removes = remove_statements(rollups=rollups)
+    adds = add_statements(rollups=rollups)
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS books_stats_ai AFTER INSERT ON books "
+        f"BEGIN {_body(adds)} END",
+        f"CREATE TRIGGER IF NOT EXISTS books_stats_ad AFTER DELETE ON books "
+        f"BEGIN {_body(removes)} END",
+        f"CREATE TRIGGER IF NOT EXISTS books_stats_au "
+        f"AFTER UPDATE OF {', '.join(counted_columns)} ON books "
+        f"WHEN {changed(counted_columns)} BEGIN {_body(removes + adds)} END",
+    )
+
+
+def postgres_stats_ddl(rollups=None, counted_columns=COUNTED_COLUMNS) -> tuple:
+    distinct = changed(counted_columns).replace(" IS NOT ", " IS DISTINCT FROM ")
+    return (
+        "CREATE OR REPLACE FUNCTION books_stats() RETURNS trigger AS $$ BEGIN "
+        f"IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+        f"{_body(remove_statements(rollups=rollups))} END IF; "
+        f"IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+        f"{_body(add_statements(rollups=rollups))} END IF; "
+        "RETURN NULL; END $$ LANGUAGE plpgsql",
+        "CREATE TRIGGER books_stats_aid AFTER INSERT OR DELETE ON books "
+        "FOR EACH ROW EXECUTE FUNCTION books_stats()",
+        f"CREATE TRIGGER books_stats_au AFTER UPDATE OF {', '.join(counted_columns)} "
+        f"ON books FOR EACH ROW WHEN ({distinct}) "
+        "EXECUTE FUNCTION books_stats()",
+    )
+
+
+SQLITE_STATS_DDL = sqlite_stats_ddl()
+
+SQLITE_COLLECTION_DDL = (
+    f"CREATE TRIGGER IF NOT EXISTS books_collection_ai AFTER INSERT ON books "
+    f"BEGIN {_body([bump_collection('new')])} END",
+    f"CREATE TRIGGER IF NOT EXISTS books_collection_ad AFTER DELETE ON books "
+    f"BEGIN {_body([bump_collection('old')])} END",
+    f"CREATE TRIGGER IF NOT EXISTS books_collection_au AFTER UPDATE ON books "
+    f"BEGIN {_body([bump_collection('old'), bump_collection('new')])} END",
+)
+
+POSTGRES_STATS_DDL = postgres_stats_ddl()
+
+POSTGRES_COLLECTION_DDL = (
+    "CREATE OR REPLACE FUNCTION books_collection_version() RETURNS trigger AS $$ BEGIN "
+    f"IF TG_OP IN ('UPDATE', 'DELETE') THEN {bump_collection('old')}; END IF; "
+    f"IF TG_OP IN ('INSERT', 'UPDATE') THEN {bump_collection('new')}; END IF; "
+    "RETURN NULL; END $$ LANGUAGE plpgsql",
+    "CREATE TRIGGER books_collection_aiud AFTER INSERT OR UPDATE OR DELETE ON books "
+    "FOR EACH ROW EXECUTE FUNCTION books_collection_version()",
+)
+
+
+def rebuild(target_engine=default_engine) -> dict:
+    """Recompute every rollup from `books`. Returns the row count per rollup."""
+    with target_engine.begin() as connection:
+        for statement in rebuild_statements():
+            connection.execute(text(statement))
+        return {
+            table: connection.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+            for table in ROLLUPS
+        }
+
+
+def main():
+    """Rebuild the library statistics rollups from the books table."""
+    return rebuild()
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -1,10 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from starlette import status
-from routers import auth, users, books, admin, home
-
-
-app = FastAPI(title="Books application bundled with N8N", version="1.0.0")
+from routers import auth, users, books, admin, home, diagnostics
+from config import Config
+from account_deletion import deletion_worker
+from database import engine, read_replicas
+from enrichment import worker_pool
+from n8n import n8n_client
+from passwords import password_hasher
+from response_cache import response_cache
+from sqlite_maintenance import sqlite_maintenance
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    await worker_pool.start()
+    await deletion_worker.start()
+    await read_replicas.start()
+    if engine.dialect.name == "sqlite" and Config.SQLITE_PRODUCTION:
+        await sqlite_maintenance.start()
+    yield
+    await sqlite_maintenance.stop()
+    await worker_pool.stop()
+    await deletion_worker.stop()
+    await n8n_client.aclose()
+    await read_replicas.stop()
+    await read_replicas.dispose()
+    await response_cache.backend.close()
+    password_hasher.shutdown()
+
+
+app = FastAPI(
+    title="Books application bundled with N8N", version="1.0.0", lifespan=lifespan
+)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -14,6 +43,7 @@ app.include_router(auth.router)
 app.include_router(books.router)
 app.include_router(users.router)
 app.include_router(admin.router)
+app.include_router(diagnostics.router)
 
 
 @app.get("/healthy", status_code=status.HTTP_200_OK)
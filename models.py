@@ -1,5 +1,30 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from datetime import datetime, timezone
+from sqlalchemy import (
+    DDL,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    PrimaryKeyConstraint,
+    String,
+    event,
+    literal_column,
+)
 from database import Base
+import book_keys
+import library_stats
+import search
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def default_title_key(context):
+    row = context.get_current_parameters()
+    return book_keys.cache_key(row["title"], row["author"])
 
 
 class User(Base):
@@ -15,10 +40,201 @@ class User(Base):
 
 class Book(Base):
     __tablename__ = "books"
+    __table_args__ = (
+        Index("ix_books_owner_id_id", "owner_id", "id"),
+        Index("ix_books_category_id", "category", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, nullable=False)
+    author = Column(String, nullable=False)
+    summary = Column(String, nullable=True)
+    category = Column(String, nullable=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="cascade"))
+    # Normalized title/author (book_keys.cache_key) the title rollup counts by.
+    # Filled in on insert; updates changing title or author must set it too
+    # (see queries.update_owned_book).
+    title_key = Column(String(64), nullable=True, default=default_title_key)
+    # Bumped by every UPDATE issued through SQLAlchemy (ORM or Core); the ETag
+    # of the book's representation is derived from it.
+    version = Column(
+        Integer,
+        nullable=False,
+        default=1,
+        server_default="1",
+        onupdate=literal_column("version") + 1,
+    )
+
+
+# The full-text index lives outside the mapped columns (see search.py).
+for statement in search.SQLITE_FTS_DDL:
+    event.listen(
+        Book.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+for statement in search.POSTGRES_FTS_DDL:
+    event.listen(
+        Book.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql")
+    )
+event.listen(
+    Book.__table__,
+    "before_drop",
+    DDL(search.SQLITE_FTS_DROP).execute_if(dialect="sqlite"),
+)
+
+# Rollup counts and collection versions are kept current by triggers
+# (see library_stats.py).
+for statement in library_stats.SQLITE_STATS_DDL + library_stats.SQLITE_COLLECTION_DDL:
+    event.listen(
+        Book.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+for statement in (
+    library_stats.POSTGRES_STATS_DDL + library_stats.POSTGRES_COLLECTION_DDL
+):
+    event.listen(
+        Book.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql")
+    )
+
+
+class EnrichmentJob(Base):
+    """Outbox row asking the enrichment workers to fill in a book's AI fields."""
+
+    __tablename__ = "enrichment_jobs"
+    __table_args__ = (
+        Index("ix_enrichment_jobs_status_next_attempt_at", "status", "next_attempt_at"),
+        Index("ix_enrichment_jobs_book_id", "book_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(
+        Integer, ForeignKey("books.id", ondelete="cascade"), nullable=False
+    )
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    updated_at = Column(DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+
+
+class EnrichmentCacheEntry(Base):
+    """Webhook result shared by every book with the same normalized title/author."""
+
+    __tablename__ = "enrichment_cache"
+
+    cache_key = Column(String(64), primary_key=True)
     title = Column(String, nullable=False)
     author = Column(String, nullable=False)
     summary = Column(String, nullable=True)
     category = Column(String, nullable=True)
-    owner_id = Column(Integer, ForeignKey("users.id", ondelete="cascade"))
\ No newline at end of file
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+
+
+class AccountDeletion(Base):
+    """A user's account being torn down in the background, one chunk of books at a time.
+
+    `user_id` is not a foreign key: the user row is deleted last and the
+    finished job stays behind as the record of the deletion.
+    """
+
+    __tablename__ = "account_deletions"
+    __table_args__ = (
+        Index("ix_account_deletions_status_next_attempt_at", "status", "next_attempt_at"),
+        Index("ix_account_deletions_user_id", "user_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    books_total = Column(Integer, nullable=False, default=0)
+    books_deleted = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    updated_at = Column(DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class UserStats(Base):
+    """Rollup: books per owner (maintained by library_stats triggers)."""
+
+    __tablename__ = "user_stats"
+
+    owner_id = Column(Integer, primary_key=True, autoincrement=False)
+    book_count = Column(Integer, nullable=False, default=0)
+
+
+class UserCategoryStats(Base):
+    """Rollup: books per owner and category; `''` is uncategorized."""
+
+    __tablename__ = "user_category_stats"
+    __table_args__ = (
+        PrimaryKeyConstraint("owner_id", "category"),
+        Index("ix_user_category_stats_top", "owner_id", "book_count", "category"),
+    )
+
+    owner_id = Column(Integer, nullable=False)
+    category = Column(String, nullable=False)
+    book_count = Column(Integer, nullable=False, default=0)
+
+
+class UserAuthorStats(Base):
+    """Rollup: books per owner and author."""
+
+    __tablename__ = "user_author_stats"
+    __table_args__ = (
+        PrimaryKeyConstraint("owner_id", "author"),
+        Index("ix_user_author_stats_top", "owner_id", "book_count", "author"),
+    )
+
+    owner_id = Column(Integer, nullable=False)
+    author = Column(String, nullable=False)
+    book_count = Column(Integer, nullable=False, default=0)
+
+
+class CategoryStats(Base):
+    """Rollup: books per category across all users."""
+
+    __tablename__ = "category_stats"
+    __table_args__ = (Index("ix_category_stats_top", "book_count", "category"),)
+
+    category = Column(String, primary_key=True)
+    book_count = Column(Integer, nullable=False, default=0)
+
+
+class TitleStats(Base):
+    """Rollup: how many times each book was added across all users.
+
+    Counted by normalized title/author; `title` and `author` show one spelling.
+    """
+
+    __tablename__ = "title_stats"
+    __table_args__ = (
+        Index("ix_title_stats_top", "book_count", "title_key", "title", "author"),
+    )
+
+    title_key = Column(String(64), primary_key=True)
+    title = Column(String, nullable=False)
+    author = Column(String, nullable=False)
+    book_count = Column(Integer, nullable=False, default=0)
+
+
+class BookCollection(Base):
+    """Per-owner version of the book collection, bumped on any change to their books.
+
+    Never reset, unlike the counting rollups, so a version is never reused.
+    """
+
+    __tablename__ = "book_collections"
+
+    owner_id = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class MaintenanceRun(Base):
+    """When a scheduled SQLite maintenance task last ran, shared by every worker."""
+
+    __tablename__ = "maintenance_runs"
+
+    name = Column(String, primary_key=True)
+    last_run_at = Column(DateTime, nullable=True)
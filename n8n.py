@@ -0,0 +1,237 @@
+"""Shared, non-blocking client for the N8N enrichment webhook.
+
+One `httpx.AsyncClient` keeps connections to N8N alive between calls, a
+semaphore caps the number of concurrent calls, a circuit breaker fails fast
+while N8N is down and the request timeout follows the observed latency
+instead of a fixed 60 seconds.
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import deque
+import httpx
+from config import Config
+
+
+class WebhookError(Exception):
+    """The webhook could not produce an enrichment result."""
+
+
+class CircuitOpenError(WebhookError):
+    """N8N failed repeatedly and calls are paused until the breaker resets."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Webhook circuit is open, N8N calls are paused.")
+        self.retry_after = retry_after
+
+
+class LatencyTracker:
+    """Rolling window of call latencies used to size the next timeout."""
+
+    def __init__(
+        self,
+        window: int = Config.N8N_LATENCY_WINDOW,
+        min_samples: int = Config.N8N_LATENCY_MIN_SAMPLES,
+    ):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[index]
+
+    def timeout(self) -> float:
+        if len(self.samples) < self.min_samples:
+            return Config.N8N_TIMEOUT_DEFAULT
+        adaptive = self.percentile(Config.N8N_TIMEOUT_PERCENTILE) * (
+            Config.N8N_TIMEOUT_MULTIPLIER
+        )
+        return min(Config.N8N_TIMEOUT_MAX, max(Config.N8N_TIMEOUT_MIN, adaptive))
+
+
+class CircuitBreaker:
+    """Classic closed / open / half-open breaker on consecutive failures."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = Config.N8N_BREAKER_FAILURES,
+        reset_timeout: float = Config.N8N_BREAKER_RESET_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+    def before_call(self) -> bool:
+        """Raise while calls are paused. Returns True if this call is the trial."""
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                raise CircuitOpenError(self.retry_after())
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            # Only one trial call goes through while half-open.
+            if self._trial_in_flight:
+                raise CircuitOpenError(self.reset_timeout)
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def end_trial(self):
+        """Let another trial through if this one ended without an outcome."""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+
+
+def parse_payload(content: bytes) -> dict:
+    try:
+        result = json.loads(content)
+    except json.JSONDecodeError as exc:
+        raise WebhookError(
+            "Invalid response received from webhook service (malformed JSON)"
+        ) from exc
+
+    if isinstance(result, dict) and "output" in result:
+        result = result["output"]
+    if not isinstance(result, dict):
+        raise WebhookError(
+            "Invalid response received from webhook service (not a JSON object)"
+        )
+    return result
+
+
+class N8NClient:
+    def __init__(
+        self,
+        url: str = Config.N8N_WEBHOOK_URL,
+        max_concurrency: int = Config.N8N_MAX_CONCURRENCY,
+        max_connections: int = Config.N8N_MAX_CONNECTIONS,
+        transport=None,
+    ):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.transport = transport
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self._client = None
+        self._semaphore = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self.transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def enrich(self, title: str, author: str) -> dict:
+        client = self._get_client()
+        trial = self.breaker.before_call()
+        try:
+            response = await self._post(client, title, author)
+            # A 200 with an unusable payload is as broken as a 500.
+            try:
+                result = parse_payload(response.content)
+            except WebhookError:
+                self._failed()
+                raise
+            self.breaker.record_success()
+        finally:
+            # A cancelled or otherwise interrupted trial must not block the
+            # breaker in half-open for good.
+            if trial:
+                self.breaker.end_trial()
+        return result
+
+    async def _post(self, client: httpx.AsyncClient, title: str, author: str):
+        async with self._semaphore:
+            timeout = self.latency.timeout()
+            self.in_flight += 1
+            self.calls += 1
+            started = time.monotonic()
+            try:
+                response = await client.post(
+                    self.url,
+                    json={"title": title, "author": author},
+                    timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+                )
+                response.raise_for_status()  # raises for 4xx/5xx from N8N itself
+            except httpx.TimeoutException as exc:
+                # Censored sample: the call took at least `timeout`.
+                self.latency.record(timeout)
+                self._failed()
+                raise WebhookError(
+                    "Webhook service is unreachable or timedout."
+                ) from exc
+            except httpx.HTTPError as exc:
+                self._failed()
+                raise WebhookError(
+                    "Webhook service is unreachable or timedout."
+                ) from exc
+            finally:
+                self.in_flight -= 1
+
+            self.latency.record(time.monotonic() - started)
+        return response
+
+    def _failed(self):
+        self.failures += 1
+        self.breaker.record_failure()
+
+    def stats(self) -> dict:
+        return {
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "calls": self.calls,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "timeout_seconds": self.latency.timeout(),
+            "latency_p50": self.latency.percentile(0.5),
+            "latency_p95": self.latency.percentile(0.95),
+            "latency_p99": self.latency.percentile(0.99),
+        }
+
+
+n8n_client = N8NClient()
@@ -0,0 +1,225 @@
+"""Local stand-in for the N8N enrichment webhook.
+
+Answers `POST /webhook/...` with the same `output.summary_by_ai` /
+`output.category_by_ai` payload as the real workflow, replays recorded
+responses and injects latency and failures so the enrichment path can be
+tested and benchmarked without a live N8N:
+
+    python n8n_stub.py --port=5678 --latency=lognormal:-0.5,0.6 --error_rate=0.05
+    python n8n_stub.py --record=recordings.json --upstream=https://n8n.example/webhook/...
+
+Latency specs: `fixed:S`, `uniform:LOW,HIGH`, `normal:MEAN,STDDEV`,
+`lognormal:MU,SIGMA` and `exponential:MEAN`, all in seconds. The same
+settings can be changed at runtime with `PUT /__stub/config`.
+"""
+
+import asyncio
+import json
+import random
+import fire
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
+
+
+class LatencyDistribution:
+    def __init__(self, spec: str = "fixed:0", rng: random.Random = None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(param) for param in params.split(",") if param]
+
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+        if expected.get(kind) != len(self.params):
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = self.rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = self.rng.gauss(*self.params)
+        elif self.kind == "lognormal":
+            value = self.rng.lognormvariate(*self.params)
+        else:
+            value = self.rng.expovariate(1.0 / self.params[0])
+        return max(0.0, value)
+
+
+class StubConfig(BaseModel):
+    latency: str = "fixed:0"
+    error_rate: float = Field(default=0.0, ge=0, le=1)
+    malformed_rate: float = Field(default=0.0, ge=0, le=1)
+    hang_rate: float = Field(default=0.0, ge=0, le=1)
+    hang_seconds: float = Field(default=120.0, ge=0)
+    wrap_output: bool = True
+
+
+def recording_key(title: str, author: str) -> str:
+    return f"{' '.join(title.casefold().split())}|{' '.join(author.casefold().split())}"
+
+
+def default_payload(title: str, author: str) -> dict:
+    return {
+        "summary_by_ai": f"{title} by {author}, summarized by the local N8N stand-in.",
+        "category_by_ai": "Stub",
+    }
+
+
+def create_app(
+    latency: str = "fixed:0",
+    error_rate: float = 0.0,
+    malformed_rate: float = 0.0,
+    hang_rate: float = 0.0,
+    hang_seconds: float = 120.0,
+    recordings: str = None,
+    record: str = None,
+    upstream: str = None,
+    seed: int = None,
+    sleep=asyncio.sleep,
+    upstream_transport=None,
+) -> FastAPI:
+    """Build the stand-in app.
+
+    `recordings` is a JSON file of responses to replay, keyed by
+    `recording_key(title, author)`. With `record` set, unknown requests are
+    forwarded to `upstream` and its responses are saved to that file.
+    """
+    rng = random.Random(seed)
+    state = {
+        "config": StubConfig(
+            latency=latency,
+            error_rate=error_rate,
+            malformed_rate=malformed_rate,
+            hang_rate=hang_rate,
+            hang_seconds=hang_seconds,
+        ),
+        "latency": LatencyDistribution(latency, rng),
+        "recordings": {},
+        "stats": {
+            "requests": 0,
+            "replayed": 0,
+            "recorded": 0,
+            "errors": 0,
+            "upstream_errors": 0,
+        },
+    }
+
+    for path in (recordings, record):
+        if path is None:
+            continue
+        try:
+            with open(path, encoding="utf-8") as recorded:
+                state["recordings"].update(json.load(recorded))
+        except FileNotFoundError:
+            pass
+
+    app = FastAPI(title="N8N stand-in")
+
+    def save_recordings():
+        with open(record, "w", encoding="utf-8") as recorded:
+            json.dump(state["recordings"], recorded, indent=2, sort_keys=True)
+
+    @app.post("/webhook/{path:path}")
+    async def webhook(request: Request):
+        config = state["config"]
+        stats = state["stats"]
+        stats["requests"] += 1
+
+        await sleep(state["latency"].sample())
+
+        roll = rng.random()
+        if roll < config.hang_rate:
+            await sleep(config.hang_seconds)
+        roll -= config.hang_rate
+        if roll < config.error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"message": "Injected failure"}, status_code=500)
+        roll -= config.error_rate
+        if roll < config.malformed_rate:
+            return Response("Not JSON", media_type="text/plain")
+
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            return JSONResponse(
+                {"message": "Expected a JSON object with title and author"},
+                status_code=400,
+            )
+        title, author = body.get("title", ""), body.get("author", "")
+        if not isinstance(title, str) or not isinstance(author, str):
+            return JSONResponse(
+                {"message": "title and author must be strings"}, status_code=400
+            )
+        key = recording_key(title, author)
+
+        payload = state["recordings"].get(key)
+        if payload is not None:
+            stats["replayed"] += 1
+        elif record is not None and upstream is not None:
+            # Upstream failures pass through as a 502 and are not recorded.
+            try:
+                async with httpx.AsyncClient(
+                    timeout=120, transport=upstream_transport
+                ) as upstream_client:
+                    response = await upstream_client.post(upstream, json=body)
+                response.raise_for_status()
+                recorded = response.json()
+            except (httpx.HTTPError, ValueError) as exc:
+                stats["upstream_errors"] += 1
+                return JSONResponse(
+                    {"message": f"Upstream failed: {exc}"}, status_code=502
+                )
+            if isinstance(recorded, dict):
+                recorded = recorded.get("output", recorded)
+            if not isinstance(recorded, dict):
+                stats["upstream_errors"] += 1
+                return JSONResponse(
+                    {"message": "Upstream answered with a non-object payload"},
+                    status_code=502,
+                )
+            payload = recorded
+            state["recordings"][key] = payload
+            stats["recorded"] += 1
+            save_recordings()
+        else:
+            payload = default_payload(title, author)
+
+        if config.wrap_output:
+            return {"output": payload}
+        return payload
+
+    @app.get("/__stub/config")
+    async def get_config():
+        return state["config"]
+
+    @app.put("/__stub/config")
+    async def update_config(config: StubConfig):
+        try:
+            state["latency"] = LatencyDistribution(config.latency, rng)
+        except ValueError as exc:
+            return JSONResponse({"detail": str(exc)}, status_code=422)
+        state["config"] = config
+        return config
+
+    @app.get("/__stub/stats")
+    async def get_stats():
+        return state["stats"]
+
+    return app
+
+
+def main(host: str = "127.0.0.1", port: int = 5678, **options):
+    """Serve the stand-in; point N8N_WEBHOOK_URL at http://HOST:PORT/webhook/books."""
+    import uvicorn
+
+    uvicorn.run(create_app(**options), host=host, port=port)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
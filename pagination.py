@@ -0,0 +1,37 @@
+"""Opaque keyset cursors for the paginated book listings.
+
+A cursor only carries the last id of the previous page, so every page is an
+index range scan (`id > :after ORDER BY id LIMIT :n`) whatever its depth.
+"""
+
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not produced by `encode_cursor`."""
+
+
+def encode_cursor(last_id: int) -> str:
+    payload = json.dumps({"after": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str = None) -> int:
+    if not cursor:
+        return 0
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        after = json.loads(payload)["after"]
+    except (ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursor("Invalid cursor.") from exc
+    if not isinstance(after, int) or isinstance(after, bool) or after < 0:
+        raise InvalidCursor("Invalid cursor.")
+    return after
+
+
+def paginate(records: list, limit: int) -> dict:
+    """Build a page from `limit + 1` fetched records; the extra one only signals more."""
+    items = records[:limit]
+    next_cursor = encode_cursor(items[-1]["id"]) if len(records) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,125 @@
+"""Password hashing and verification off the event loop.
+
+A bcrypt hash or verify burns a couple of hundred milliseconds of CPU. Run
+inline in an `async def` handler it stalls every other request on the
+worker, so calls go to a small dedicated thread pool instead; the bcrypt
+backend releases the GIL while it works, so the loop keeps serving.
+
+At most `max_pending` calls may be running or queued at once. Beyond that
+`PasswordHasherBusy` is raised straight away (the endpoints answer 503)
+rather than letting a login burst build a queue nobody will wait out.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from config import Config
+
+
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasherBusy(Exception):
+    """Too many password hashes are already running or queued."""
+
+
+def percentile(samples, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class PasswordHasher:
+    def __init__(
+        self, context: CryptContext, workers: int, max_pending: int, window: int = 1000
+    ):
+        self.context = context
+        self.workers = workers
+        self.max_pending = max_pending
+        self.hashes = 0
+        self.verifications = 0
+        self.rejected = 0
+        self.pending = 0
+        self.peak_pending = 0
+        self.queue_waits = deque(maxlen=window)
+        self.durations = deque(maxlen=window)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password-hasher"
+            )
+        return self._executor
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy(
+                    f"{self.pending} password hashes already pending."
+                )
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.queue_waits.append(started - submitted)
+                    self.durations.append(time.perf_counter() - started)
+
+        future = self._pool().submit(timed)
+        # Released when the thread is done, not when the caller stops waiting:
+        # a cancelled request does not free the slot its hash still occupies.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        self.hashes += 1
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        self.verifications += 1
+        return await self._run(self.context.verify, password, hashed_password)
+
+    def shutdown(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            queue_waits, durations = list(self.queue_waits), list(self.durations)
+            pending = self.pending
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": pending,
+            "peak_pending": self.peak_pending,
+            "hashes": self.hashes,
+            "verifications": self.verifications,
+            "rejected": self.rejected,
+            "queue_wait_p50": percentile(queue_waits, 0.5),
+            "queue_wait_p99": percentile(queue_waits, 0.99),
+            "duration_p50": percentile(durations, 0.5),
+            "duration_p99": percentile(durations, 0.99),
+        }
+
+
+password_hasher = PasswordHasher(
+    bcrypt_context, Config.PASSWORD_HASH_WORKERS, Config.PASSWORD_HASH_MAX_PENDING
+)
@@ -0,0 +1,274 @@
+"""Statements behind the router endpoints.
+
+Kept in one place so tests/test_query_plans.py can EXPLAIN exactly what the
+routers run against a seeded database.
+"""
+
+from sqlalchemy import delete, func, or_, select, update
+from book_keys import cache_key
+from models import (
+    AccountDeletion,
+    Book,
+    BookCollection,
+    CategoryStats,
+    EnrichmentJob,
+    TitleStats,
+    User,
+    UserAuthorStats,
+    UserCategoryStats,
+    UserStats,
+)
+
+
+BOOK_FIELDS = ("id", "title", "author", "summary", "category", "owner_id")
+
+
+class UnknownFields(ValueError):
+    """A sparse fieldset named columns books do not have."""
+
+
+def parse_book_fields(fields: str = None):
+    """`"title,author"` -> `("id", "title", "author")`; None selects every field.
+
+    `id` is always included, the cursor of the paginated listings needs it.
+    """
+    if not fields:
+        return BOOK_FIELDS
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = sorted(set(requested) - set(BOOK_FIELDS))
+    if unknown:
+        raise UnknownFields(f"Unknown fields: {', '.join(unknown)}.")
+    return tuple(field for field in BOOK_FIELDS if field == "id" or field in requested)
+
+
+def select_books(fields=BOOK_FIELDS):
+    """Only the given book columns, fetched as Core rows instead of entities."""
+    return select(*(getattr(Book, field) for field in fields))
+
+
+def books_owned_by(owner_id: int):
+    return select_books().filter(Book.owner_id == owner_id).order_by(Book.id)
+
+
+def book_by_id(book_id: int, fields=BOOK_FIELDS):
+    return select_books(fields).filter(Book.id == book_id)
+
+
+def book_version(book_id: int):
+    return select(Book.version).filter(Book.id == book_id)
+
+
+def book_with_version(book_id: int, fields=BOOK_FIELDS):
+    return book_by_id(book_id, fields).add_columns(Book.version)
+
+
+def collection_version(owner_id: int):
+    return select(BookCollection.version).filter(BookCollection.owner_id == owner_id)
+
+
+def owned_book(owner_id: int, book_id: int):
+    return select(Book).filter(Book.owner_id == owner_id).filter(Book.id == book_id)
+
+
+def books_page(
+    after_id: int,
+    limit: int,
+    owner_id: int = None,
+    category: str = None,
+    fields=BOOK_FIELDS,
+):
+    """One keyset page of books, optionally filtered, in id order."""
+    statement = select_books(fields).filter(Book.id > after_id)
+    if owner_id is not None:
+        statement = statement.filter(Book.owner_id == owner_id)
+    if category is not None:
+        statement = statement.filter(Book.category == category)
+    return statement.order_by(Book.id).limit(limit)
+
+
+def latest_enrichment_job(book_id: int):
+    return (
+        select(EnrichmentJob)
+        .filter(EnrichmentJob.book_id == book_id)
+        .order_by(EnrichmentJob.id.desc())
+        .limit(1)
+    )
+
+
+def update_owned_book(owner_id: int, book_id: int, values: dict):
+    """Single-statement edit; returns the id only when the book exists and is theirs."""
+    if "title" in values and "author" in values:
+        values = {**values, "title_key": cache_key(values["title"], values["author"])}
+    return (
+        update(Book)
+        .filter(Book.id == book_id)
+        .filter(Book.owner_id == owner_id)
+        .values(**values)
+        .returning(Book.id)
+    )
+
+
+def delete_book(book_id: int):
+    return delete(Book).filter(Book.id == book_id).returning(Book.id, Book.owner_id)
+
+
+def delete_owned_book(owner_id: int, book_id: int):
+    return (
+        delete(Book)
+        .filter(Book.id == book_id)
+        .filter(Book.owner_id == owner_id)
+        .returning(Book.id)
+    )
+
+
+def delete_books_owned_by(owner_id: int):
+    return (
+        delete(Book)
+        .filter(Book.owner_id == owner_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def book_conditions(ids=None, owner_id=None, category=None, title_pattern=None) -> list:
+    """WHERE clauses for the admin bulk delete; empty when no filter was given."""
+    conditions = []
+    if ids is not None:
+        conditions.append(Book.id.in_(ids))
+    if owner_id is not None:
+        conditions.append(Book.owner_id == owner_id)
+    if category is not None:
+        conditions.append(Book.category == category)
+    if title_pattern is not None:
+        conditions.append(Book.title.like(title_pattern))
+    return conditions
+
+
+def count_books(conditions):
+    return select(func.count(Book.id)).filter(*conditions)
+
+
+def book_ids_page(conditions, after_id: int, limit: int):
+    return (
+        select(Book.id)
+        .filter(*conditions)
+        .filter(Book.id > after_id)
+        .order_by(Book.id)
+        .limit(limit)
+    )
+
+
+def delete_books_by_id(book_ids, conditions=()):
+    # Conditions are re-checked: a row may have changed since its id was read.
+    return (
+        delete(Book)
+        .filter(Book.id.in_(book_ids))
+        .filter(*conditions)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def records(result) -> list:
+    """Core rows as plain dicts.
+
+    Pydantic validates dicts faster than it reads attributes off rows, most of
+    all for sparse rows where every unselected field is a failed lookup.
+    """
+    return [row._asdict() for row in result]
+
+
+def user_by_username(username: str):
+    return select(User).filter(User.username == username)
+
+
+def user_profile(username: str):
+    """The public columns of a user; never the password hash."""
+    return select(User.id, User.username, User.email, User.is_active, User.role).filter(
+        User.username == username
+    )
+
+
+def user_by_username_or_email(username: str, email: str):
+    return (
+        select(User)
+        .filter(or_(User.username == username, User.email == email))
+        .limit(1)
+    )
+
+
+def delete_user(user_id: int):
+    return delete(User).filter(User.id == user_id)
+
+
+def deactivate_user(user_id: int):
+    return (
+        update(User)
+        .filter(User.id == user_id)
+        .values(is_active=False)
+        .returning(User.id)
+    )
+
+
+def count_books_owned_by(owner_id: int):
+    return count_books([Book.owner_id == owner_id])
+
+
+def latest_account_deletion(user_id: int):
+    return (
+        select(AccountDeletion)
+        .filter(AccountDeletion.user_id == user_id)
+        .order_by(AccountDeletion.id.desc())
+        .limit(1)
+    )
+
+
+def books_export(owner_id: int = None, category: str = None):
+    """Plain column rows (no ORM objects) for the streaming export, in id order."""
+    statement = select(
+        Book.id, Book.title, Book.author, Book.summary, Book.category, Book.owner_id
+    )
+    if owner_id is not None:
+        statement = statement.filter(Book.owner_id == owner_id)
+    if category is not None:
+        statement = statement.filter(Book.category == category)
+    return statement.order_by(Book.id)
+
+
+def user_book_count(owner_id: int):
+    return select(UserStats.book_count).filter(UserStats.owner_id == owner_id)
+
+
+def user_top_categories(owner_id: int, limit: int):
+    return (
+        select(
+            func.nullif(UserCategoryStats.category, "").label("category"),
+            UserCategoryStats.book_count,
+        )
+        .filter(UserCategoryStats.owner_id == owner_id)
+        .order_by(UserCategoryStats.book_count.desc(), UserCategoryStats.category.desc())
+        .limit(limit)
+    )
+
+
+def user_top_authors(owner_id: int, limit: int):
+    return (
+        select(UserAuthorStats.author, UserAuthorStats.book_count)
+        .filter(UserAuthorStats.owner_id == owner_id)
+        .order_by(UserAuthorStats.book_count.desc(), UserAuthorStats.author.desc())
+        .limit(limit)
+    )
+
+
+def top_categories(limit: int):
+    return (
+        select(CategoryStats.category, CategoryStats.book_count)
+        .order_by(CategoryStats.book_count.desc(), CategoryStats.category.desc())
+        .limit(limit)
+    )
+
+
+def most_added_books(limit: int):
+    return (
+        select(TitleStats.title, TitleStats.author, TitleStats.book_count)
+        .order_by(TitleStats.book_count.desc(), TitleStats.title_key.desc())
+        .limit(limit)
+    )
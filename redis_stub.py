@@ -0,0 +1,142 @@
+"""Local stand-in for a Redis server.
+
+Speaks enough of the Redis protocol (RESP) for `cache_backends.RedisBackend`:
+PING, GET, SET (with EX/PX), DEL, INCR, MGET, FLUSHDB, AUTH and SELECT. Data
+lives in memory, so several app workers on one machine can share a cache in
+development and tests without a real Redis:
+
+    python redis_stub.py --port=6379
+"""
+
+import asyncio
+import time
+import fire
+from cache_backends import RedisError, encode_command
+
+
+class RedisStub:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.commands = 0
+        self.connections = 0
+        self.delay = 0.0
+        self._data = {}
+        self._server = None
+        self._writers = set()
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self
+
+    async def stop(self):
+        # Drop the open client connections too, like a server going away.
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                writer.write(self.reply(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def reply(self, args) -> bytes:
+        self.commands += 1
+        try:
+            return encode_reply(self.execute(args[0].decode().upper(), args[1:]))
+        except RedisError as exc:
+            return f"-ERR {exc}\r\n".encode()
+
+    def _get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= self.clock():
+            del self._data[key]
+            return None
+        return value
+
+    def execute(self, command: str, args):
+        if command == "PING":
+            return "PONG"
+        if command in ("AUTH", "SELECT"):
+            return "OK"
+        if command == "GET":
+            return self._get(args[0])
+        if command == "MGET":
+            return [self._get(key) for key in args]
+        if command == "SET":
+            expires_at = None
+            options = [arg.decode().upper() for arg in args[2::2]]
+            for option, amount in zip(options, args[3::2]):
+                if option == "EX":
+                    expires_at = self.clock() + int(amount)
+                elif option == "PX":
+                    expires_at = self.clock() + int(amount) / 1000
+            self._data[args[0]] = (args[1], expires_at)
+            return "OK"
+        if command == "DEL":
+            return sum(self._data.pop(key, None) is not None for key in args)
+        if command == "INCR":
+            value = self._get(args[0])
+            try:
+                number = int(value or 0) + 1
+            except ValueError as exc:
+                raise RedisError("value is not an integer") from exc
+            self._data[args[0]] = (str(number).encode(), None)
+            return number
+        if command == "FLUSHDB":
+            self._data.clear()
+            return "OK"
+        raise RedisError(f"unknown command '{command}'")
+
+
+def encode_reply(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, list):
+        return f"*{len(value)}\r\n".encode() + b"".join(map(encode_reply, value))
+    return encode_command(value)[len(b"*1\r\n"):]
+
+
+def main(host: str = "127.0.0.1", port: int = 6379):
+    """Serve the stand-in; set RESPONSE_CACHE_URL=redis://HOST:PORT/0."""
+
+    async def serve():
+        stub = await RedisStub().start(host, port)
+        await stub.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,123 @@
+"""Per-user cache of read responses, shared by every worker.
+
+`/books/my-books`, `/books/my-books-page` and `/users/` are served from it
+for up to `RESPONSE_CACHE_TTL` seconds. Entries live in the backend chosen
+by `RESPONSE_CACHE_BACKEND` (see cache_backends.py). With a shared backend,
+a response cached by one worker is a hit for all of them.
+
+Keys carry a per-user generation and a global one, both counters in the
+backend and read before the response is computed. Every write path that
+changes a user's books or profile calls `invalidate(user_id)` after
+committing. That bumps the user's generation for all workers at once, so
+entries cached before the write are never served again and age out
+through TTL/eviction. A response read before a write but stored after it
+lands under the old generation instead of shadowing fresh data. `clear()`
+bumps the global generation.
+
+Cache failures and timeouts are logged and counted, and the request falls
+back to the database.
+"""
+
+import json
+import logging
+from cache_backends import BACKEND_ERRORS, create_backend
+from config import Config
+
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_GENERATION = "gen:*"
+
+
+class UserResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    async def key(self, user_id, endpoint: str, *params):
+        """The key for this user's response right now; None if the backend is down."""
+        try:
+            everyone, user = await self.backend.counters(
+                [GLOBAL_GENERATION, f"gen:{user_id}"]
+            )
+        except BACKEND_ERRORS:
+            logger.exception("Response cache unavailable")
+            self.errors += 1
+            return None
+        return json.dumps(
+            [everyone, user, user_id, endpoint, params], default=str, separators=(",", ":")
+        )
+
+    async def get(self, key, default=None):
+        entry = None
+        if key is not None:
+            try:
+                entry = await self.backend.get(key)
+            except BACKEND_ERRORS:
+                logger.exception("Response cache read failed")
+                self.errors += 1
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        # Stored wrapped so a cached None is told apart from a miss.
+        return entry[0]
+
+    async def set(self, key, value):
+        if key is None:
+            return
+        try:
+            await self.backend.set(key, [value])
+        except BACKEND_ERRORS:
+            logger.exception("Response cache write failed")
+            self.errors += 1
+
+    async def get_or_load(self, key, load):
+        """The cached value for `key`, or the awaited `load()`, which is then cached."""
+        missing = object()
+        value = await self.get(key, missing)
+        if value is missing:
+            value = await load()
+            await self.set(key, value)
+        return value
+
+    async def _bump(self, counter: str):
+        try:
+            await self.backend.incr(counter)
+        except BACKEND_ERRORS:
+            # Nothing else to do: entries expire within the TTL.
+            logger.exception("Response cache invalidation failed")
+            self.errors += 1
+        else:
+            self.invalidations += 1
+
+    async def invalidate(self, *user_ids):
+        for user_id in user_ids:
+            await self._bump(f"gen:{user_id}")
+
+    async def clear(self):
+        """Invalidate every user, e.g. after a write touching many of them."""
+        await self._bump(GLOBAL_GENERATION)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "backend": self.backend.stats(),
+        }
+
+
+response_cache = UserResponseCache(
+    create_backend(
+        Config.RESPONSE_CACHE_BACKEND,
+        Config.RESPONSE_CACHE_URL,
+        Config.RESPONSE_CACHE_SIZE,
+        Config.RESPONSE_CACHE_TTL,
+        Config.RESPONSE_CACHE_TIMEOUT,
+    )
+)
@@ -1,29 +1,118 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from starlette import status
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import Book
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from config import Config
+from database import get_db, get_read_db, get_read_session_factory
+import bulk_delete
+import export
+import queries
+from schemas import BookPage, LibraryStatsOut
+from response_cache import response_cache
+from pagination import InvalidCursor, decode_cursor, paginate
 from routers.auth import get_current_user
 
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 
-def get_db():
-    db = SessionLocal()
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
+read_session_factory_dependency = Annotated[
+    async_sessionmaker, Depends(get_read_session_factory)
+]
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+
+class BulkDeleteRequest(BaseModel):
+    ids: list[int] | None = Field(default=None, max_length=10000)
+    owner_id: int | None = None
+    category: str | None = Field(default=None, max_length=200)
+    title_pattern: str | None = Field(
+        default=None, max_length=200, description="SQL LIKE pattern, e.g. 'Spam %'"
+    )
+    dry_run: bool = False
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {"owner_id": 42, "category": "Spam", "dry_run": True}
+        }
+    }
+
+
+@router.get("/all-books", response_model=BookPage, response_model_exclude_unset=True)
+async def get_all_books(
+    user: user_dependency,
+    db: read_db_dependency,
+    limit: Annotated[int, Query(ge=1, le=Config.PAGE_SIZE_MAX)] = Config.PAGE_SIZE_DEFAULT,
+    cursor: str | None = None,
+    owner_id: int | None = None,
+    category: str | None = None,
+    fields: Annotated[
+        str | None, Query(description="Comma-separated columns, e.g. title,author")
+    ] = None,
+):
+    """One page of every user's books; pass `next_cursor` back to get the next one."""
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
+        )
+    if user.get("user_role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
+        )
+
     try:
-        yield db
-    finally:
-        db.close()
+        after_id = decode_cursor(cursor)
+        columns = queries.parse_book_fields(fields)
+    except (InvalidCursor, queries.UnknownFields) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        ) from exc
 
+    statement = queries.books_page(
+        after_id, limit + 1, owner_id=owner_id, category=category, fields=columns
+    )
+    books = queries.records(await db.execute(statement))
+    return paginate(books, limit)
 
-db_dependency = Annotated[Session, Depends(get_db)]
-user_dependency = Annotated[dict, Depends(get_current_user)]
+
+@router.get("/stats", status_code=status.HTTP_200_OK, response_model=LibraryStatsOut)
+async def get_library_stats(user: user_dependency, db: read_db_dependency):
+    """Category distribution and most-added books across all users."""
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
+        )
+    if user.get("user_role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
+        )
+
+    return {
+        "categories": queries.records(
+            await db.execute(queries.top_categories(Config.STATS_TOP_N))
+        ),
+        "most_added_books": queries.records(
+            await db.execute(queries.most_added_books(Config.STATS_TOP_N))
+        ),
+    }
 
 
-@router.get("/all-books")
-async def get_all_books(user: user_dependency, db: db_dependency):
+@router.get("/export")
+async def export_books(
+    user: user_dependency,
+    session_factory: read_session_factory_dependency,
+    export_format: Annotated[
+        str, Query(alias="format", pattern="^(ndjson|csv)$")
+    ] = "ndjson",
+    compress: bool = False,
+    owner_id: int | None = None,
+    category: str | None = None,
+):
+    """Stream every book (optionally filtered) as NDJSON or CSV, gzipped on request."""
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
@@ -32,7 +121,23 @@ async def get_all_books(user: user_dependency, db: db_dependency):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
         )
-    return db.query(Book).all()
+
+    # The session is opened inside the stream: it has to outlive this handler.
+    body = export.stream_books(
+        session_factory,
+        queries.books_export(owner_id=owner_id, category=category),
+        export_format=export_format,
+        compress=compress,
+    )
+    return StreamingResponse(
+        body,
+        media_type="application/gzip" if compress else export.MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{export.filename(export_format, compress)}"'
+            )
+        },
+    )
 
 
 @router.delete("/delete/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -46,10 +151,60 @@ async def delete_book(book_id: int, db: db_dependency, user: user_dependency):
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
         )
     try:
-        db.query(Book).filter(Book.id == book_id).delete()
-        db.commit()
+        deleted = (await db.execute(queries.delete_book(book_id))).first()
+        await db.commit()
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Delete item failed.",
         ) from exc
+
+    if deleted is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book not found."
+        )
+    await response_cache.invalidate(deleted.owner_id)
+
+
+@router.post("/bulk-delete", status_code=status.HTTP_200_OK)
+async def bulk_delete_books(
+    bulk_delete_request: BulkDeleteRequest, db: db_dependency, user: user_dependency
+):
+    """Delete every book matching the ids and/or filters, in chunked transactions."""
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
+        )
+    if user.get("user_role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
+        )
+
+    conditions = queries.book_conditions(
+        ids=bulk_delete_request.ids,
+        owner_id=bulk_delete_request.owner_id,
+        category=bulk_delete_request.category,
+        title_pattern=bulk_delete_request.title_pattern,
+    )
+    if not conditions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give ids or at least one filter.",
+        )
+
+    if bulk_delete_request.dry_run:
+        matched = await bulk_delete.count_books(db, conditions)
+        return {"dry_run": True, "matched": matched, "deleted": 0}
+
+    try:
+        result = await bulk_delete.delete_books(db, conditions)
+    except Exception as exc:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Delete items failed.",
+        ) from exc
+    finally:
+        # Any number of owners may be affected, including by committed chunks.
+        await response_cache.clear()
+    return {"dry_run": False, **result}
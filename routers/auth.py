@@ -5,38 +5,36 @@ from starlette import status
 from starlette.responses import RedirectResponse
 from pydantic import BaseModel, Field
 from typing import Annotated
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt, JWTError
 from datetime import datetime, timezone, timedelta
 from models import User
-from database import SessionLocal
+from database import get_db
+import queries
 from config import Config
+from passwords import PasswordHasherBusy, password_hasher
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth_bearer = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 JWT_SECRET_KEY = Config.JWT_SECRET_KEY
 JWT_HASH_ALGORITHM = Config.JWT_HASH_ALGORITHM
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-def authenticate_user(username, password, db):
-    user = db.query(User).filter(User.username == username).first()
+async def authenticate_user(username, password, db):
+    user = await db.scalar(queries.user_by_username(username))
 
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.hashed_password):
+    # Deactivated accounts (e.g. pending deletion) cannot log in.
+    if not user.is_active:
+        return False
+    # Hand the connection back before queueing for bcrypt; sessions keep
+    # loaded attributes on commit, so the user stays readable.
+    await db.commit()
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
     return user
 
@@ -49,7 +47,7 @@ def create_access_token(
     return jwt.encode(encode, key=JWT_SECRET_KEY, algorithm=JWT_HASH_ALGORITHM)
 
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
 
 
 async def get_current_user(
@@ -80,6 +78,14 @@ def redirect_to_login():
     return redirect_response
 
 
+def server_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many password checks in progress, try again shortly.",
+        headers={"Retry-After": "1"},
+    )
+
+
 class CreateUserRequest(BaseModel):
     username: str = Field(max_length=200)
     email: str
@@ -120,9 +126,10 @@ async def logout_page():
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 async def add_new_user(create_user_request: CreateUserRequest, db: db_dependency):
-    existing_user = (
-        db.query(User).filter(User.username == create_user_request.username).first()
-        or db.query(User).filter(User.email == create_user_request.email).first()
+    existing_user = await db.scalar(
+        queries.user_by_username_or_email(
+            create_user_request.username, create_user_request.email
+        )
     )
 
     if existing_user is not None:
@@ -130,20 +137,27 @@ async def add_new_user(create_user_request: CreateUserRequest, db: db_dependency
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email or username already exists!",
         )
+    # The INSERT checks a connection out again once the hash is ready.
+    await db.commit()
+
+    try:
+        hashed_password = await password_hasher.hash(create_user_request.password)
+    except PasswordHasherBusy as exc:
+        raise server_busy() from exc
 
     create_user_model = User(
         username=create_user_request.username,
         email=create_user_request.email,
-        hashed_password=bcrypt_context.hash(create_user_request.password),
+        hashed_password=hashed_password,
         role=create_user_request.role,
     )
 
     try:
         db.add(create_user_model)
-        db.commit()
+        await db.commit()
     except Exception as exc:
         print(exc)
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR) from exc
 
 
@@ -151,7 +165,10 @@ async def add_new_user(create_user_request: CreateUserRequest, db: db_dependency
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: db_dependency
 ):
-    user = authenticate_user(form_data.username, form_data.password, db)
+    try:
+        user = await authenticate_user(form_data.username, form_data.password, db)
+    except PasswordHasherBusy as exc:
+        raise server_busy() from exc
 
     if not user:
         raise HTTPException(
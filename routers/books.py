@@ -1,33 +1,30 @@
-import requests
-import json
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from fastapi.templating import Jinja2Templates
 from starlette import status
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
-from database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
 from config import Config
+from database import get_db, get_read_db
 from models import Book
+import etags
+import queries
+import search
+from schemas import BookOut, BookPage, BookSearchResults, UserStatsOut
+from pagination import InvalidCursor, decode_cursor, paginate
+from enrichment import enqueue_enrichment, get_cached_enrichment, worker_pool
+from response_cache import response_cache
+import bulk_import
 from routers.auth import get_current_user, redirect_to_login
 
 
-N8N_WEBHOOK_URL = Config.N8N_WEBHOOK_URL
-
 templates = Jinja2Templates(directory='templates')
 
 router = APIRouter(prefix="/books", tags=["books"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 
@@ -52,7 +49,7 @@ class EditBookRequest(BaseModel):
 ## Pages ##
 
 @router.get('/my-books-page')
-async def render_my_books_page(request: Request, db: db_dependency):
+async def render_my_books_page(request: Request, db: read_db_dependency):
 
     token = request.cookies.get('access_token')
 
@@ -67,7 +64,14 @@ async def render_my_books_page(request: Request, db: db_dependency):
     if user is None:
         return redirect_to_login()
     
-    books = db.query(Book).filter(Book.owner_id==user.get("id")).all()
+    user_id = user.get("id")
+
+    async def load_books():
+        return queries.records(await db.execute(queries.books_owned_by(user_id)))
+
+    books = await response_cache.get_or_load(
+        await response_cache.key(user_id, "my-books-page"), load_books
+    )
 
     return templates.TemplateResponse('books.html', {
         'request': request,
@@ -90,7 +94,7 @@ async def render_edit_book_page(request: Request, book_id: int, db: db_dependenc
     if user is None:
         return redirect_to_login()
     
-    book = db.query(Book).filter(Book.owner_id == user.get('id')).filter(Book.id == book_id).first()
+    book = await db.scalar(queries.owned_book(user.get('id'), book_id))
 
     return templates.TemplateResponse('edit_book.html', {
         'request': request,
@@ -99,28 +103,163 @@ async def render_edit_book_page(request: Request, book_id: int, db: db_dependenc
 
 ## Endpoints ##
 
-@router.get("/my-books", status_code=status.HTTP_200_OK)
-async def get_all_books(user: user_dependency, db: db_dependency):
+@router.get(
+    "/my-books",
+    status_code=status.HTTP_200_OK,
+    response_model=BookPage,
+    response_model_exclude_unset=True,
+)
+async def get_all_books(
+    user: user_dependency,
+    db: read_db_dependency,
+    response: Response,
+    limit: Annotated[int, Query(ge=1, le=Config.PAGE_SIZE_MAX)] = Config.PAGE_SIZE_DEFAULT,
+    cursor: str | None = None,
+    category: str | None = None,
+    fields: Annotated[
+        str | None, Query(description="Comma-separated columns, e.g. title,author")
+    ] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
+    """One page of the user's books; pass `next_cursor` back to get the next one.
+
+    Answers 304 when `If-None-Match` carries the ETag of the unchanged collection.
+    """
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
+        )
+
+    try:
+        after_id = decode_cursor(cursor)
+        columns = queries.parse_book_fields(fields)
+    except (InvalidCursor, queries.UnknownFields) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        ) from exc
+
+    user_id = user.get("id")
+    # The page is cached together with its tag so the two never disagree.
+    cache_key = await response_cache.key(
+        user_id, "my-books", after_id, limit, category, columns
+    )
+    cached = await response_cache.get(cache_key)
+    if cached is None:
+        # Read the version before the page: a write in between then yields a
+        # stale tag (one extra 200 later), never a current tag on a stale body.
+        version = await db.scalar(queries.collection_version(user_id)) or 0
+        etag = etags.make_etag(
+            "books", user_id, version, after_id, limit, category, ",".join(columns)
+        )
+        if etags.matches(if_none_match, etag):
+            return etags.not_modified(etag)
+
+        statement = queries.books_page(
+            after_id, limit + 1, owner_id=user_id, category=category, fields=columns
+        )
+        books = queries.records(await db.execute(statement))
+        cached = (etag, paginate(books, limit))
+        await response_cache.set(cache_key, cached)
+
+    etag, page = cached
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
+    response.headers.update(etags.headers(etag))
+    return page
+
+
+@router.get("/search", status_code=status.HTTP_200_OK, response_model=BookSearchResults)
+async def search_books(
+    user: user_dependency,
+    db: read_db_dependency,
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    limit: Annotated[int, Query(ge=1, le=Config.PAGE_SIZE_MAX)] = 20,
+):
+    """Full-text search over the user's books, best match first."""
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
+        )
+
+    dialect_name = db.get_bind().dialect.name
+    match = search.match_expression(q, dialect_name)
+    if match is None:
+        return {"items": []}
+
+    rows = await db.execute(
+        search.search_statement(dialect_name),
+        {"match": match, "owner_id": user.get("id"), "limit": limit},
+    )
+    return {"items": queries.records(rows)}
+
+
+@router.get("/stats", status_code=status.HTTP_200_OK, response_model=UserStatsOut)
+async def get_library_stats(user: user_dependency, db: read_db_dependency):
+    """Book count, category breakdown and top authors, read from the rollups."""
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
         )
 
-    books = db.query(Book).filter(Book.owner_id == user.get("id")).all()
-    return books
+    user_id = user.get("id")
+    return {
+        "book_count": await db.scalar(queries.user_book_count(user_id)) or 0,
+        "categories": queries.records(
+            await db.execute(queries.user_top_categories(user_id, Config.STATS_TOP_N))
+        ),
+        "top_authors": queries.records(
+            await db.execute(queries.user_top_authors(user_id, Config.STATS_TOP_N))
+        ),
+    }
 
 
-@router.get("/book-info/{book_id}", status_code=status.HTTP_200_OK)
-async def get_book(book_id: int, user: user_dependency, db: db_dependency):
+@router.get(
+    "/book-info/{book_id}",
+    status_code=status.HTTP_200_OK,
+    response_model=BookOut,
+    response_model_exclude_unset=True,
+)
+async def get_book(
+    book_id: int,
+    user: user_dependency,
+    db: read_db_dependency,
+    response: Response,
+    fields: Annotated[
+        str | None, Query(description="Comma-separated columns, e.g. title,author")
+    ] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
         )
-    book = db.query(Book).filter(Book.id == book_id).first()
+
+    try:
+        columns = queries.parse_book_fields(fields)
+    except queries.UnknownFields as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        ) from exc
+
+    # A revalidation only needs the version; read the row once it is stale.
+    if if_none_match is not None:
+        version = await db.scalar(queries.book_version(book_id))
+        if version is not None:
+            etag = etags.make_etag("book", book_id, version, ",".join(columns))
+            if etags.matches(if_none_match, etag):
+                return etags.not_modified(etag)
+
+    books = queries.records(
+        await db.execute(queries.book_with_version(book_id, columns))
+    )
+    book = books[0] if books else None
     if book is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Book not found."
         )
+
+    etag = etags.make_etag("book", book_id, book.pop("version"), ",".join(columns))
+    response.headers.update(etags.headers(etag))
     return book
 
 
@@ -134,47 +273,118 @@ async def add_new_book(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
         )
 
-    payload = {"title": add_book_request.title, "author": add_book_request.author}
+    cached = await get_cached_enrichment(
+        db, add_book_request.title, add_book_request.author
+    )
 
-    try:
-        response = requests.post(N8N_WEBHOOK_URL, json=payload, timeout=60)
-        response.raise_for_status()  # raises for 4xx/5xx from N8N itself
-    except requests.exceptions.RequestException as exc:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Webhook service is unreachable or timedout.",
-        ) from exc
+    new_book = Book(
+        title=add_book_request.title,
+        author=add_book_request.author,
+        owner_id=user.get("id"),
+    )
+    if cached is not None:
+        new_book.summary = cached.get("summary_by_ai")
+        new_book.category = cached.get("category_by_ai")
 
     try:
-        response_dict = json.loads(response.content)
-    except json.JSONDecodeError as exc:
+        db.add(new_book)
+        await db.flush()
+        if cached is None:
+            enqueue_enrichment(db, new_book.id)
+        created = {
+            "id": new_book.id,
+            "title": new_book.title,
+            "author": new_book.author,
+            "summary": new_book.summary,
+            "category": new_book.category,
+            "owner_id": new_book.owner_id,
+            "enrichment_status": "pending" if cached is None else "done",
+        }
+        await db.commit()
+    except Exception as exc:
         raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Invalid response received from webhook service (malformed JSON)",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Database storage failed.",
         ) from exc
 
-    if "output" in response_dict:
-        result = response_dict["output"]
-    else:
-        result = response_dict
+    await response_cache.invalidate(user.get("id"))
+    if cached is None:
+        worker_pool.notify()
+    return created
 
-    new_book = Book(
-        title=add_book_request.title,
-        author=add_book_request.author,
-        summary=result.get("summary_by_ai"),
-        category=result.get("category_by_ai"),
-        owner_id=user.get("id"),
+
+@router.post("/import", status_code=status.HTTP_200_OK)
+async def import_books(
+    request: Request,
+    user: user_dependency,
+    db: db_dependency,
+    import_format: Annotated[str | None, Query(alias="format")] = None,
+):
+    """Bulk-create books from a streamed CSV (title,author header) or NDJSON body."""
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
+        )
+
+    detected_format = bulk_import.detect_format(
+        request.headers.get("content-type"), import_format
     )
+    if detected_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Upload must be CSV or NDJSON.",
+        )
 
+    rows = bulk_import.iter_rows(request.stream(), detected_format)
     try:
-        db.add(new_book)
-        db.commit()
+        return await bulk_import.import_books(
+            db, user.get("id"), rows, AddBookRequest, on_batch=worker_pool.notify
+        )
+    except bulk_import.ImportFormatError as exc:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        ) from exc
     except Exception as exc:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database storage failed.",
         ) from exc
-    
+    finally:
+        # Batches committed before a failure are kept.
+        await response_cache.invalidate(user.get("id"))
+
+
+@router.get("/enrichment-status/{book_id}", status_code=status.HTTP_200_OK)
+async def get_enrichment_status(book_id: int, user: user_dependency, db: db_dependency):
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
+        )
+
+    book = await db.scalar(queries.owned_book(user.get("id"), book_id))
+    if book is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book not found."
+        )
+
+    job = await db.scalar(queries.latest_enrichment_job(book_id))
+    if job is None:
+        # Filled from the enrichment cache when the book was added.
+        return {
+            "book_id": book_id,
+            "enrichment_status": "done",
+            "attempts": 0,
+            "last_error": None,
+        }
+    return {
+        "book_id": book_id,
+        "enrichment_status": job.status,
+        "attempts": job.attempts,
+        "last_error": job.last_error,
+    }
+
 
 @router.put('/edit-book/{book_id}', status_code=status.HTTP_204_NO_CONTENT)
 async def edit_book(
@@ -186,25 +396,28 @@ async def edit_book(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
         )
 
-    book_model = db.query(Book).filter(Book.id == book_id).first()
-
-    book_model.title = edit_book_request.title
-    book_model.author = edit_book_request.author
-    book_model.category = edit_book_request.category
-    book_model.summary = edit_book_request.summary
-
     try:
-        db.add(book_model)
-        db.commit()
+        edited = await db.scalar(
+            queries.update_owned_book(
+                user.get("id"), book_id, edit_book_request.model_dump()
+            )
+        )
+        await db.commit()
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database storage failed.",
         ) from exc
+
+    if edited is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book not found."
+        )
+    await response_cache.invalidate(user.get("id"))
     
 
 @router.delete('/delete-book/{book_id}', status_code=status.HTTP_204_NO_CONTENT)
-def delete_book(
+async def delete_book(
     book_id: int, db: db_dependency, user: user_dependency
 ):
     if user is None:
@@ -213,10 +426,16 @@ def delete_book(
         )
     
     try:
-        db.query(Book).filter(Book.id==book_id).delete()
-        db.commit()
+        deleted = await db.scalar(queries.delete_owned_book(user.get("id"), book_id))
+        await db.commit()
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database interaction failed",
-        ) from exc
\ No newline at end of file
+        ) from exc
+
+    if deleted is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book not found."
+        )
+    await response_cache.invalidate(user.get("id"))
\ No newline at end of file
@@ -0,0 +1,83 @@
+import asyncio
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException
+from starlette import status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import async_pool_metrics, get_db, pool_metrics, read_replicas
+from models import EnrichmentJob
+import enrichment
+from passwords import password_hasher
+from response_cache import response_cache
+from sqlite_maintenance import sqlite_maintenance
+from routers.auth import get_current_user
+
+
+router = APIRouter(prefix="/diagnostics", tags=["diagnostics"])
+
+
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+
+def require_admin(user):
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
+        )
+    if user.get("user_role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed."
+        )
+
+
+@router.get("/db", status_code=status.HTTP_200_OK)
+async def get_db_pool_stats(user: user_dependency):
+    require_admin(user)
+    return {
+        "async": async_pool_metrics.snapshot(),
+        "sync": pool_metrics.snapshot(),
+        "replicas": read_replicas.stats(),
+    }
+
+
+@router.get("/enrichment", status_code=status.HTTP_200_OK)
+async def get_enrichment_stats(user: user_dependency, db: db_dependency):
+    require_admin(user)
+    outbox = dict(
+        (
+            await db.execute(
+                select(EnrichmentJob.status, func.count(EnrichmentJob.id)).group_by(
+                    EnrichmentJob.status
+                )
+            )
+        ).all()
+    )
+    return {
+        "outbox": outbox,
+        "n8n": enrichment.n8n_client.stats(),
+        "single_flight": enrichment.enrichment_flight.stats(),
+        "cache": {**enrichment.cache_stats, "memory": enrichment.memory_cache.stats()},
+    }
+
+
+@router.get("/sqlite", status_code=status.HTTP_200_OK)
+async def get_sqlite_stats(user: user_dependency):
+    require_admin(user)
+    if sqlite_maintenance.engine.dialect.name != "sqlite":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Database is not SQLite."
+        )
+    return await asyncio.to_thread(sqlite_maintenance.status)
+
+
+@router.get("/cache", status_code=status.HTTP_200_OK)
+async def get_response_cache_stats(user: user_dependency):
+    require_admin(user)
+    return response_cache.stats()
+
+
+@router.get("/passwords", status_code=status.HTTP_200_OK)
+async def get_password_hasher_stats(user: user_dependency):
+    require_admin(user)
+    return password_hasher.stats()
@@ -1,50 +1,75 @@
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException
 from starlette import status
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import User, Book
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_read_db
+import account_deletion
+import queries
+from response_cache import response_cache
+from schemas import UserOut
 from routers.auth import get_current_user
 
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 user_dependency = Annotated[dict, Depends(get_current_user)]
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 
 
-@router.get("/", status_code=status.HTTP_200_OK)
-async def get_user(user: user_dependency, db: db_dependency):
+@router.get("/", status_code=status.HTTP_200_OK, response_model=UserOut | None)
+async def get_user(user: user_dependency, db: read_db_dependency):
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed"
         )
-    user_model = db.query(User).filter(User.username == user.get("username")).first()
-    return user_model
 
+    async def load_profile():
+        profiles = queries.records(
+            await db.execute(queries.user_profile(user.get("username")))
+        )
+        return profiles[0] if profiles else None
+
+    return await response_cache.get_or_load(
+        await response_cache.key(user.get("id"), "profile"), load_profile
+    )
 
-@router.delete("/delete-user", status_code=status.HTTP_204_NO_CONTENT)
+
+@router.delete("/delete-user", status_code=status.HTTP_202_ACCEPTED)
 async def delete_current_user(user: user_dependency, db: db_dependency):
+    """Deactivate the account now; its books and the user row go in the background."""
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed"
         )
     try:
-        db.query(User).filter(User.id == user.get("id")).delete()
-        # Delete their books
-        db.query(Book).filter(Book.owner_id == user.get("id")).delete()
-        db.commit()
+        deletion = await account_deletion.request_deletion(db, user.get("id"))
     except Exception as exc:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database interaction failed",
         ) from exc
+
+    if deletion is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    await response_cache.invalidate(user.get("id"))
+    account_deletion.deletion_worker.notify()
+    return account_deletion.progress(deletion)
+
+
+@router.get("/deletion-status", status_code=status.HTTP_200_OK)
+async def get_deletion_status(user: user_dependency, db: db_dependency):
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed"
+        )
+    deletion = await db.scalar(queries.latest_account_deletion(user.get("id")))
+    if deletion is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="No account deletion found"
+        )
+    return account_deletion.progress(deletion)
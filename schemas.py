@@ -0,0 +1,70 @@
+"""Response models of the read endpoints.
+
+Handlers return Core query results as plain dicts (`queries.records`, no
+ORM identity map) and FastAPI validates them against these models and
+serializes them to JSON bytes in pydantic-core, skipping `jsonable_encoder`. Fields a sparse
+fieldset did not select are left unset and dropped from the response.
+"""
+
+from pydantic import BaseModel, ConfigDict
+
+
+class BookOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: str | None = None
+    author: str | None = None
+    summary: str | None = None
+    category: str | None = None
+    owner_id: int | None = None
+
+
+class BookPage(BaseModel):
+    items: list[BookOut]
+    next_cursor: str | None
+
+
+class BookSearchHit(BookOut):
+    rank: float
+
+
+class BookSearchResults(BaseModel):
+    items: list[BookSearchHit]
+
+
+class UserOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    username: str
+    email: str
+    is_active: bool | None
+    role: str | None
+
+
+class CategoryCount(BaseModel):
+    category: str | None
+    book_count: int
+
+
+class AuthorCount(BaseModel):
+    author: str
+    book_count: int
+
+
+class TitleCount(BaseModel):
+    title: str
+    author: str
+    book_count: int
+
+
+class UserStatsOut(BaseModel):
+    book_count: int
+    categories: list[CategoryCount]
+    top_authors: list[AuthorCount]
+
+
+class LibraryStatsOut(BaseModel):
+    categories: list[CategoryCount]
+    most_added_books: list[TitleCount]
@@ -0,0 +1,78 @@
+"""Full-text search over book title, author and summary.
+
+SQLite uses an external-content FTS5 table kept in sync by triggers;
+Postgres uses a stored, generated `tsvector` column with a GIN index. Both
+are created with the `books` table (see models.py) and by the Alembic
+migration for existing databases. Titles rank above authors above summaries
+and the last search term matches as a prefix.
+"""
+
+import re
+from sqlalchemy import text
+
+
+SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+    "title, author, summary, content='books', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+    "INSERT INTO books_fts(rowid, title, author, summary) "
+    "VALUES (new.id, new.title, new.author, new.summary); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author, summary) "
+    "VALUES ('delete', old.id, old.title, old.author, old.summary); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_au "
+    "AFTER UPDATE OF title, author, summary ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author, summary) "
+    "VALUES ('delete', old.id, old.title, old.author, old.summary); "
+    "INSERT INTO books_fts(rowid, title, author, summary) "
+    "VALUES (new.id, new.title, new.author, new.summary); END",
+    # Index rows that existed before the table was (re)created.
+    "INSERT INTO books_fts(books_fts) VALUES ('rebuild')",
+)
+
+SQLITE_FTS_DROP = "DROP TABLE IF EXISTS books_fts"
+
+POSTGRES_FTS_DDL = (
+    "ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(summary, '')), 'C')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING GIN (search_vector)",
+)
+
+SQLITE_SEARCH = text(
+    "SELECT books.id, books.title, books.author, books.summary, books.category, "
+    "books.owner_id, -bm25(books_fts, 10.0, 5.0, 1.0) AS rank "
+    "FROM books_fts JOIN books ON books.id = books_fts.rowid "
+    "WHERE books_fts MATCH :match AND books.owner_id = :owner_id "
+    "ORDER BY rank DESC, books.id LIMIT :limit"
+)
+
+POSTGRES_SEARCH = text(
+    "SELECT id, title, author, summary, category, owner_id, "
+    "ts_rank(search_vector, to_tsquery('simple', :match)) AS rank "
+    "FROM books "
+    "WHERE search_vector @@ to_tsquery('simple', :match) AND owner_id = :owner_id "
+    "ORDER BY rank DESC, id LIMIT :limit"
+)
+
+
+def search_terms(query: str) -> list:
+    return re.findall(r"\w+", query.casefold())
+
+
+def match_expression(query: str, dialect_name: str):
+    """Every term must match, the last one as a prefix. None if nothing to match."""
+    terms = search_terms(query)
+    if not terms:
+        return None
+    if dialect_name == "postgresql":
+        return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+    return " ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def search_statement(dialect_name: str):
+    return POSTGRES_SEARCH if dialect_name == "postgresql" else SQLITE_SEARCH
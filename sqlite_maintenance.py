@@ -0,0 +1,203 @@
+"""Scheduled upkeep for the production SQLite profile.
+
+`PRAGMA optimize`, `ANALYZE` and `PRAGMA incremental_vacuum` each run on
+their own interval in a worker thread so the event loop keeps serving
+requests. `/diagnostics/sqlite` reports each task's last run across all
+workers, and the runs, durations and errors of the worker answering.
+
+Every uvicorn worker runs the scheduler, so a task is claimed first by
+moving its `maintenance_runs.last_run_at` forward in one conditional
+UPDATE: only the worker whose update lands runs it, and a restarted
+worker picks up the interval where the last run left it.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+from datetime import timedelta
+from sqlalchemy import or_, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import SQLAlchemyError
+from config import Config
+from database import engine as default_engine
+from models import MaintenanceRun, utcnow
+
+
+logger = logging.getLogger(__name__)
+
+INSPECTED_PRAGMAS = (
+    "journal_mode",
+    "synchronous",
+    "mmap_size",
+    "cache_size",
+    "busy_timeout",
+    "auto_vacuum",
+    "page_count",
+    "freelist_count",
+)
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class MaintenanceTask:
+    def __init__(self, name: str, script: str, interval: float, needs_incremental=False):
+        self.name = name
+        self.script = script
+        self.interval = interval
+        self.needs_incremental = needs_incremental
+        self.runs = 0
+        self.last_run_at = None
+        self.last_duration = None
+        self.last_error = None
+        self.skipped = None
+
+    def status(self, last_run_at=None) -> dict:
+        """`last_run_at` is the shared one; `this_worker` only covers this process."""
+        return {
+            "interval": self.interval,
+            "last_run_at": last_run_at.isoformat() if last_run_at else None,
+            "this_worker": {
+                "runs": self.runs,
+                "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+                "last_duration": self.last_duration,
+                "last_error": self.last_error,
+                "skipped": self.skipped,
+            },
+        }
+
+
+def default_tasks():
+    return [
+        MaintenanceTask("optimize", "PRAGMA optimize;", Config.SQLITE_OPTIMIZE_INTERVAL),
+        MaintenanceTask("analyze", "ANALYZE;", Config.SQLITE_ANALYZE_INTERVAL),
+        MaintenanceTask(
+            "incremental_vacuum",
+            f"PRAGMA incremental_vacuum({Config.SQLITE_VACUUM_PAGES});",
+            Config.SQLITE_VACUUM_INTERVAL,
+            needs_incremental=True,
+        ),
+    ]
+
+
+def claim(connection, task: MaintenanceTask, now) -> bool:
+    """Record `now` as the task's last run if it is due; True if this call did."""
+    connection.execute(
+        insert(MaintenanceRun).values(name=task.name).on_conflict_do_nothing()
+    )
+    claimed = connection.execute(
+        update(MaintenanceRun)
+        .where(MaintenanceRun.name == task.name)
+        .where(
+            or_(
+                MaintenanceRun.last_run_at.is_(None),
+                MaintenanceRun.last_run_at <= now - timedelta(seconds=task.interval),
+            )
+        )
+        .values(last_run_at=now)
+    ).rowcount
+    connection.commit()
+    return claimed == 1
+
+
+def read_last_runs(target_engine) -> dict:
+    with target_engine.connect() as connection:
+        return dict(
+            connection.execute(
+                select(MaintenanceRun.name, MaintenanceRun.last_run_at)
+            ).all()
+        )
+
+
+def read_pragmas(target_engine) -> dict:
+    with target_engine.connect() as connection:
+        return {
+            name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in INSPECTED_PRAGMAS
+        }
+
+
+class SQLiteMaintenance:
+    """Runs the due maintenance tasks every `poll_interval` seconds."""
+
+    def __init__(
+        self,
+        target_engine=default_engine,
+        tasks=None,
+        poll_interval: float = Config.SQLITE_MAINTENANCE_POLL,
+        clock=utcnow,
+    ):
+        self.engine = target_engine
+        self.tasks = default_tasks() if tasks is None else tasks
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def run_due(self) -> list:
+        """Run every task whose interval elapsed. Returns the names that ran."""
+        now = self.clock()
+        ran = []
+        with self.engine.connect() as connection:
+            # executescript steps each statement to completion; a plain execute
+            # of `PRAGMA incremental_vacuum` would free a single page.
+            dbapi_connection = connection.connection.dbapi_connection
+            auto_vacuum = connection.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+            connection.commit()
+            for task in self.tasks:
+                if not claim(connection, task, now):
+                    continue
+                if task.needs_incremental and auto_vacuum != AUTO_VACUUM_INCREMENTAL:
+                    task.skipped = (
+                        "auto_vacuum is not INCREMENTAL; run VACUUM once to enable it."
+                    )
+                    continue
+                started = time.perf_counter()
+                try:
+                    dbapi_connection.executescript(task.script)
+                except sqlite3.Error as exc:
+                    logger.exception("SQLite maintenance task %s failed", task.name)
+                    task.last_error = str(exc)
+                else:
+                    task.last_error = None
+                    ran.append(task.name)
+                task.skipped = None
+                task.runs += 1
+                task.last_run_at = utcnow()
+                task.last_duration = time.perf_counter() - started
+        return ran
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run(), name="sqlite-maintenance")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await asyncio.to_thread(self.run_due)
+            except SQLAlchemyError:
+                logger.exception("SQLite maintenance failed")
+
+    def status(self) -> dict:
+        last_runs = read_last_runs(self.engine)
+        return {
+            "production_profile": Config.SQLITE_PRODUCTION,
+            "running": self.running,
+            "pragmas": read_pragmas(self.engine),
+            "tasks": {
+                task.name: task.status(last_runs.get(task.name)) for task in self.tasks
+            },
+        }
+
+
+sqlite_maintenance = SQLiteMaintenance()
@@ -0,0 +1,200 @@
+import asyncio
+from datetime import timedelta
+import pytest
+from sqlalchemy.exc import OperationalError
+from account_deletion import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_PENDING,
+    STATUS_RUNNING,
+    AccountDeletionWorker,
+    claim_next_deletion,
+    drain,
+    process_deletion,
+    request_deletion,
+)
+from config import Config
+from models import utcnow
+import queries
+from .utils import (
+    TestingAsyncSessionLocal,
+    TestingSessionLocal,
+    test_user,
+    AccountDeletion,
+    Book,
+    User,
+)
+
+
+def add_books(owner_id: int, count: int):
+    db = TestingSessionLocal()
+    db.add_all(
+        [Book(title=f"title {i}", author="author", owner_id=owner_id) for i in range(count)]
+    )
+    db.commit()
+
+
+def cleanup_books():
+    db = TestingSessionLocal()
+    db.query(Book).delete()
+    db.commit()
+
+
+@pytest.mark.asyncio
+async def test_books_are_deleted_in_committed_chunks(test_user):
+    add_books(1, 5)
+    add_books(2, 2)
+    async with TestingAsyncSessionLocal() as db:
+        await request_deletion(db, 1)
+        deletion = await claim_next_deletion(db)
+        await process_deletion(db, deletion, chunk_size=2)
+
+    db = TestingSessionLocal()
+    deletion = db.query(AccountDeletion).one()
+    assert (deletion.status, deletion.books_total, deletion.books_deleted) == (
+        STATUS_DONE,
+        5,
+        5,
+    )
+    assert deletion.finished_at is not None
+    assert db.query(User).filter(User.id == 1).first() is None
+    # Other users' books are untouched.
+    assert db.query(Book).count() == 2
+    cleanup_books()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_deletion_resumes_after_its_lease(test_user):
+    add_books(1, 3)
+    async with TestingAsyncSessionLocal() as db:
+        await request_deletion(db, 1)
+        deletion = await claim_next_deletion(db)
+        assert deletion.status == STATUS_RUNNING
+        # The worker died here: the job is leased and invisible...
+        assert await claim_next_deletion(db) is None
+
+    db = TestingSessionLocal()
+    db.query(AccountDeletion).update(
+        {"next_attempt_at": utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+
+    # ...until the lease expires.
+    assert await drain(TestingAsyncSessionLocal) == 1
+    db.expire_all()
+    deletion = db.query(AccountDeletion).one()
+    assert (deletion.status, deletion.attempts, deletion.books_deleted) == (
+        STATUS_DONE,
+        2,
+        3,
+    )
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_is_retried(monkeypatch, test_user):
+    add_books(1, 2)
+
+    def broken(*args, **kwargs):
+        raise OperationalError("DELETE", {}, Exception("database is locked"))
+
+    monkeypatch.setattr("queries.delete_books_by_id", broken)
+    async with TestingAsyncSessionLocal() as db:
+        await request_deletion(db, 1)
+        await process_deletion(db, await claim_next_deletion(db))
+
+    db = TestingSessionLocal()
+    deletion = db.query(AccountDeletion).one()
+    assert deletion.status == STATUS_PENDING
+    assert "database is locked" in deletion.last_error
+    assert deletion.next_attempt_at > utcnow()
+    assert db.query(User).filter(User.id == 1).one().is_active is False
+    cleanup_books()
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_propagates_and_keeps_the_lease(monkeypatch, test_user):
+    add_books(1, 2)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr("queries.delete_books_by_id", broken)
+    async with TestingAsyncSessionLocal() as db:
+        await request_deletion(db, 1)
+        with pytest.raises(RuntimeError):
+            await process_deletion(db, await claim_next_deletion(db))
+
+    deletion = TestingSessionLocal().query(AccountDeletion).one()
+    assert deletion.status == STATUS_RUNNING
+    assert deletion.next_attempt_at > utcnow()
+    cleanup_books()
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_on_the_last_attempt_fails_the_deletion(
+    monkeypatch, test_user
+):
+    add_books(1, 2)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr("queries.delete_books_by_id", broken)
+    async with TestingAsyncSessionLocal() as db:
+        await request_deletion(db, 1)
+    for _ in range(Config.ACCOUNT_DELETION_MAX_ATTEMPTS):
+        async with TestingAsyncSessionLocal() as db:
+            with pytest.raises(RuntimeError):
+                await process_deletion(db, await claim_next_deletion(db))
+        db = TestingSessionLocal()
+        db.query(AccountDeletion).update(
+            {"next_attempt_at": utcnow() - timedelta(seconds=1)}
+        )
+        db.commit()
+
+    async with TestingAsyncSessionLocal() as db:
+        assert await claim_next_deletion(db) is None
+
+    deletion = TestingSessionLocal().query(AccountDeletion).one()
+    assert deletion.status == STATUS_FAILED
+    assert deletion.attempts == Config.ACCOUNT_DELETION_MAX_ATTEMPTS
+    assert "Lease expired" in deletion.last_error
+    cleanup_books()
+
+
+@pytest.mark.asyncio
+async def test_books_added_after_the_last_chunk_are_deleted(monkeypatch, test_user):
+    async with TestingAsyncSessionLocal() as db:
+        await request_deletion(db, 1)
+    # A token issued before the deactivation adds books while the chunks run.
+    add_books(1, 2)
+    empty_page = queries.book_ids_page([], 0, 0)
+    monkeypatch.setattr("queries.book_ids_page", lambda *args: empty_page)
+
+    async with TestingAsyncSessionLocal() as db:
+        await process_deletion(db, await claim_next_deletion(db))
+
+    db = TestingSessionLocal()
+    deletion = db.query(AccountDeletion).one()
+    assert (deletion.status, deletion.books_deleted) == (STATUS_DONE, 2)
+    assert db.query(Book).count() == 0
+
+
+@pytest.mark.asyncio
+async def test_worker_processes_queued_deletions(test_user):
+    add_books(1, 3)
+    async with TestingAsyncSessionLocal() as db:
+        await request_deletion(db, 1)
+
+    worker = AccountDeletionWorker(TestingAsyncSessionLocal, poll_interval=0.05)
+    await worker.start()
+    try:
+        for _ in range(100):
+            db = TestingSessionLocal()
+            if db.query(AccountDeletion).one().status == STATUS_DONE:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await worker.stop()
+
+    assert TestingSessionLocal().query(AccountDeletion).one().status == STATUS_DONE
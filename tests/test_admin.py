@@ -1,3 +1,8 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
 from starlette import status
 from .utils import (
     app,
@@ -6,13 +11,22 @@ from .utils import (
     client,
     test_book,
     TestingSessionLocal,
+    TestingAsyncSessionLocal,
     bcrypt_context,
     Book,
 )
-from routers.admin import get_db, get_current_user
+from response_cache import response_cache
+from routers.admin import (
+    get_db,
+    get_read_db,
+    get_read_session_factory,
+    get_current_user,
+)
 
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_read_session_factory] = lambda: TestingAsyncSessionLocal
 app.dependency_overrides[get_current_user] = override_get_current_user
 
 
@@ -21,15 +35,47 @@ def test_get_all_books(test_book):
     response = client.get("/admin/all-books")
 
     assert response.status_code == status.HTTP_200_OK
-    assert response.json() == [
-        {
-            "id": 1,
-            "title": "test_title",
-            "author": "test_author",
-            "summary": "test_summary",
-            "category": "test_category",
-            "owner_id": 1,
-        }
+    assert response.json() == {
+        "items": [
+            {
+                "id": 1,
+                "title": "test_title",
+                "author": "test_author",
+                "summary": "test_summary",
+                "category": "test_category",
+                "owner_id": 1,
+            }
+        ],
+        "next_cursor": None,
+    }
+
+
+def test_get_all_books_paginates_with_filters(test_book):
+    db = TestingSessionLocal()
+    db.add_all(
+        [
+            Book(title="second", author="author", category="other", owner_id=2),
+            Book(title="third", author="author", category="other", owner_id=2),
+        ]
+    )
+    db.commit()
+
+    first = client.get("/admin/all-books", params={"limit": 2})
+    second = client.get(
+        "/admin/all-books", params={"limit": 2, "cursor": first.json().get("next_cursor")}
+    )
+
+    assert [book.get("title") for book in first.json().get("items")] == [
+        "test_title",
+        "second",
+    ]
+    assert [book.get("title") for book in second.json().get("items")] == ["third"]
+    assert second.json().get("next_cursor") is None
+
+    by_owner = client.get("/admin/all-books", params={"owner_id": 2, "category": "other"})
+    assert [book.get("title") for book in by_owner.json().get("items")] == [
+        "second",
+        "third",
     ]
 
 
@@ -75,6 +121,14 @@ def test_delete_book(test_book):
     assert model is None
 
 
+def test_delete_book_not_found(test_book):
+
+    response = client.delete("/admin/delete/99")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json() == {"detail": "Book not found."}
+
+
 def test_delete_book_not_existing_user(monkeypatch, test_book):
     """Using monkeypatch"""
 
@@ -115,3 +169,169 @@ def test_delete_book_not_admin_user(monkeypatch, test_book):
     all_books = db.query(Book).all()
 
     assert len(all_books) == 1
+
+
+def test_export_books_ndjson(test_book):
+
+    response = client.get("/admin/export")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert 'filename="books.ndjson"' in response.headers["content-disposition"]
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {
+            "id": 1,
+            "title": "test_title",
+            "author": "test_author",
+            "summary": "test_summary",
+            "category": "test_category",
+            "owner_id": 1,
+        }
+    ]
+
+
+def test_export_books_csv_gzip(test_book):
+    db = TestingSessionLocal()
+    db.add(Book(title='Quoted, "title"', author="author", owner_id=2))
+    db.commit()
+
+    response = client.get("/admin/export", params={"format": "csv", "compress": True})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/gzip"
+    assert 'filename="books.csv.gz"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode())))
+    assert [row["title"] for row in rows] == ["test_title", 'Quoted, "title"']
+    assert rows[1]["summary"] == ""
+
+
+def test_export_books_unknown_format(test_book):
+
+    response = client.get("/admin/export", params={"format": "xml"})
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+def test_export_books_not_admin_user(monkeypatch, test_book):
+
+    monkeypatch.setitem(
+        app.dependency_overrides,
+        get_current_user,
+        lambda: {"username": "testuser", "id": 1, "user_role": "regular"},
+    )
+
+    response = client.get("/admin/export")
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_get_all_books_sparse_fields(test_book):
+
+    response = client.get("/admin/all-books", params={"fields": "owner_id,category"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json().get("items") == [
+        {"id": 1, "category": "test_category", "owner_id": 1}
+    ]
+
+
+def test_bulk_delete_dry_run_counts_without_deleting(test_book):
+    db = TestingSessionLocal()
+    db.add_all([Book(title=f"spam {i}", author="author", owner_id=2) for i in range(3)])
+    db.commit()
+
+    response = client.post(
+        "/admin/bulk-delete", json={"owner_id": 2, "title_pattern": "spam%", "dry_run": True}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"dry_run": True, "matched": 3, "deleted": 0}
+    assert db.query(Book).count() == 4
+
+
+def test_bulk_delete_by_ids(test_book):
+    db = TestingSessionLocal()
+    db.add_all([Book(title=f"book {i}", author="author", owner_id=2) for i in range(3)])
+    db.commit()
+
+    response = client.post("/admin/bulk-delete", json={"ids": [1, 3, 99]})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"dry_run": False, "deleted": 2, "chunks": 1}
+    assert [book.title for book in db.query(Book).order_by(Book.id)] == [
+        "book 0",
+        "book 2",
+    ]
+
+
+def test_bulk_delete_requires_a_filter(test_book):
+
+    response = client.post("/admin/bulk-delete", json={"dry_run": False})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Give ids or at least one filter."}
+
+
+def test_bulk_delete_not_admin_user(monkeypatch, test_book):
+
+    monkeypatch.setitem(
+        app.dependency_overrides,
+        get_current_user,
+        lambda: {"username": "testuser", "id": 1, "user_role": "regular"},
+    )
+
+    response = client.post("/admin/bulk-delete", json={"owner_id": 1})
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    db = TestingSessionLocal()
+    assert db.query(Book).count() == 1
+
+
+def test_library_stats(test_book):
+    db = TestingSessionLocal()
+    db.add_all(
+        [
+            Book(title="test_title", author="test_author", category="other", owner_id=2),
+            # Spelling variants count as the same book.
+            Book(title="TEST title ", author="Test Author", owner_id=3),
+            Book(title="Unique", author="Someone", category="other", owner_id=2),
+        ]
+    )
+    db.commit()
+
+    response = client.get("/admin/stats")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "categories": [
+            {"category": "other", "book_count": 2},
+            {"category": "test_category", "book_count": 1},
+        ],
+        "most_added_books": [
+            {"title": "test_title", "author": "test_author", "book_count": 3},
+            {"title": "Unique", "author": "Someone", "book_count": 1},
+        ],
+    }
+
+
+def test_library_stats_not_admin_user(monkeypatch, test_book):
+
+    monkeypatch.setitem(
+        app.dependency_overrides,
+        get_current_user,
+        lambda: {"username": "testuser", "id": 1, "user_role": "regular"},
+    )
+
+    response = client.get("/admin/stats")
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_delete_book_invalidates_the_owners_cached_pages(test_book):
+    key = asyncio.run(response_cache.key(1, "my-books-page"))
+    asyncio.run(response_cache.set(key, ["cached page"]))
+
+    client.delete("/admin/delete/1")
+
+    key = asyncio.run(response_cache.key(1, "my-books-page"))
+    assert asyncio.run(response_cache.get(key)) is None
@@ -1,13 +1,22 @@
+import asyncio
+import time
+import httpx
 import pytest
 from jose import jwt
 from datetime import timedelta
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from database import get_read_db
 from .utils import (
+    SQLALCHEMY_ASYNC_TEST_URL,
     app,
     override_get_db,
     override_get_current_user,
     client,
+    test_book,
     test_user,
     TestingSessionLocal,
+    TestingAsyncSessionLocal,
     bcrypt_context,
     User
 )
@@ -17,8 +26,8 @@ from routers.auth import (
     create_access_token,
     JWT_SECRET_KEY,
     JWT_HASH_ALGORITHM,
-    bcrypt_context,
     authenticate_user,
+    password_hasher,
     HTTPException
 )
 
@@ -27,9 +36,10 @@ app.dependency_overrides[get_db] = override_get_db
 app.dependency_overrides[get_current_user] = override_get_current_user
 
 
-def test_authenticate_user(test_user):
-    db = TestingSessionLocal()
-    is_authenicated_user = authenticate_user('testuser', 'test1234!', db)
+@pytest.mark.asyncio
+async def test_authenticate_user(test_user):
+    db = TestingAsyncSessionLocal()
+    is_authenicated_user = await authenticate_user('testuser', 'test1234!', db)
 
     assert is_authenicated_user.username == 'testuser'
     assert is_authenicated_user.id == 1
@@ -37,9 +47,20 @@ def test_authenticate_user(test_user):
     assert is_authenicated_user.role == 'admin'
     assert bcrypt_context.verify('test1234!', is_authenicated_user.hashed_password)
 
-    not_authenicated_user = authenticate_user('testuser', 'wrongpassword', db)
+    not_authenicated_user = await authenticate_user('testuser', 'wrongpassword', db)
 
     assert not_authenicated_user is False
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_authenticate_inactive_user(test_user):
+    db = TestingSessionLocal()
+    db.query(User).filter(User.id == 1).update({"is_active": False})
+    db.commit()
+
+    async with TestingAsyncSessionLocal() as async_db:
+        assert await authenticate_user('testuser', 'test1234!', async_db) is False
 
 
 def test_create_access_token(test_user):
@@ -163,3 +184,68 @@ def test_login_for_access_token_authenticated_failed(test_user):
 
     assert response.status_code == 401
     assert response.json() == {"detail": "Authentication failed."}
+
+
+def test_login_when_password_hashing_is_saturated(test_user, monkeypatch):
+    monkeypatch.setattr(password_hasher, "max_pending", 0)
+
+    response = client.post(
+        "/auth/token", data={"username": "testuser", "password": "test1234!"}
+    )
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+class SlowContext:
+    def verify(self, password, hashed_password):
+        time.sleep(0.1)
+        return True
+
+
+@pytest.mark.asyncio
+async def test_login_burst_does_not_hold_pool_connections(
+    monkeypatch, test_user, test_book
+):
+    # Two connections and a short pool timeout: a login that kept its
+    # connection while queueing for bcrypt would starve the others.
+    small_engine = create_async_engine(
+        SQLALCHEMY_ASYNC_TEST_URL,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=2,
+        max_overflow=0,
+        pool_timeout=0.2,
+    )
+    small_sessions = async_sessionmaker(
+        bind=small_engine, autoflush=False, expire_on_commit=False
+    )
+
+    async def small_db():
+        async with small_sessions() as db:
+            yield db
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, small_db)
+    monkeypatch.setitem(app.dependency_overrides, get_read_db, small_db)
+    monkeypatch.setattr(password_hasher, "context", SlowContext())
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+            base_url="http://test",
+        ) as async_client:
+
+            async def login():
+                return await async_client.post(
+                    "/auth/token", data={"username": "testuser", "password": "x"}
+                )
+
+            logins = [asyncio.ensure_future(login()) for _ in range(8)]
+            await asyncio.sleep(0.05)
+            healthy = await async_client.get("/healthy")
+            book = await async_client.get("/books/book-info/1")
+            responses = await asyncio.gather(*logins)
+    finally:
+        await small_engine.dispose()
+
+    assert healthy.status_code == 200
+    assert book.status_code == 200
+    assert [response.status_code for response in responses] == [200] * 8
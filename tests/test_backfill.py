@@ -0,0 +1,161 @@
+import json
+import httpx
+import pytest
+from backfill import RateLimiter, backfill, load_checkpoint, load_failed_ids
+from enrichment import cache_key
+from .utils import (
+    TestingSessionLocal,
+    TestingAsyncSessionLocal,
+    test_book,
+    Book,
+    EnrichmentCacheEntry,
+    mock_n8n,
+    n8n_output,
+)
+
+
+def seed_books(count):
+    db = TestingSessionLocal()
+    for i in range(count):
+        db.add(Book(title=f"Backfill {i}", author="Author", owner_id=1))
+    db.commit()
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_backfill_fills_missing_fields(monkeypatch, tmp_path, test_book):
+    n8n_client = mock_n8n(monkeypatch, n8n_output)
+    seed_books(5)
+    checkpoint = str(tmp_path / "checkpoint.json")
+
+    result = await backfill(
+        TestingAsyncSessionLocal, chunk_size=2, rate=0, checkpoint=checkpoint
+    )
+
+    assert result.get("enriched") == 5
+    assert result.get("failed") == 0
+    # The fixture book already has a summary and category.
+    assert n8n_client.calls == 5
+
+    db = TestingSessionLocal()
+    assert db.query(Book).filter(Book.summary.is_(None)).count() == 0
+    assert db.query(Book).filter(Book.id == 1).first().summary == "test_summary"
+    assert load_checkpoint(checkpoint) == 6
+
+
+@pytest.mark.asyncio
+async def test_backfill_resumes_from_checkpoint(monkeypatch, tmp_path, test_book):
+    n8n_client = mock_n8n(monkeypatch, n8n_output)
+    seed_books(5)
+    checkpoint = str(tmp_path / "checkpoint.json")
+
+    await backfill(
+        TestingAsyncSessionLocal, chunk_size=2, rate=0, checkpoint=checkpoint, max_chunks=1
+    )
+
+    with open(checkpoint, encoding="utf-8") as saved:
+        assert json.load(saved).get("last_id") == 3
+    assert n8n_client.calls == 2
+
+    result = await backfill(
+        TestingAsyncSessionLocal, chunk_size=2, rate=0, checkpoint=checkpoint
+    )
+
+    assert result.get("enriched") == 3
+    assert n8n_client.calls == 5
+
+
+@pytest.mark.asyncio
+async def test_backfill_keeps_going_on_failures(monkeypatch, tmp_path, test_book):
+    def handler(request):
+        if b"Backfill 1" in request.read():
+            return httpx.Response(500)
+        return n8n_output(request)
+
+    mock_n8n(monkeypatch, handler)
+    seed_books(3)
+
+    result = await backfill(
+        TestingAsyncSessionLocal, rate=0, checkpoint=str(tmp_path / "checkpoint.json")
+    )
+
+    assert result.get("enriched") == 2
+    assert result.get("failed") == 1
+
+
+@pytest.mark.asyncio
+async def test_backfill_retries_failed_books_on_the_next_run(monkeypatch, tmp_path, test_book):
+    down = [True]
+
+    def handler(request):
+        if down[0] and b"Backfill 1" in request.read():
+            return httpx.Response(500)
+        return n8n_output(request)
+
+    mock_n8n(monkeypatch, handler)
+    seed_books(3)
+    checkpoint = str(tmp_path / "checkpoint.json")
+
+    await backfill(TestingAsyncSessionLocal, rate=0, checkpoint=checkpoint)
+    assert load_failed_ids(checkpoint) == [3]
+
+    down[0] = False
+    result = await backfill(TestingAsyncSessionLocal, rate=0, checkpoint=checkpoint)
+
+    assert result.get("enriched") == 1
+    assert load_failed_ids(checkpoint) == []
+    db = TestingSessionLocal()
+    assert db.query(Book).filter(Book.summary.is_(None)).count() == 0
+
+
+@pytest.mark.asyncio
+async def test_backfill_skips_partial_cache_entries_and_keeps_values(
+    monkeypatch, tmp_path, test_book
+):
+    def summary_only(request):
+        if b"Cached" in request.read():
+            return n8n_output(request)
+        return httpx.Response(200, json={"output": {"summary_by_ai": "new summary"}})
+
+    n8n_client = mock_n8n(monkeypatch, summary_only)
+    db = TestingSessionLocal()
+    db.add(Book(title="Cached", author="Author", owner_id=1, summary="old summary"))
+    db.add(Book(title="Partial", author="Author", owner_id=1, category="Kept"))
+    # An earlier run cached a result without a category.
+    db.add(
+        EnrichmentCacheEntry(
+            cache_key=cache_key("Cached", "Author"),
+            title="Cached",
+            author="Author",
+            summary="cached summary",
+        )
+    )
+    db.commit()
+
+    await backfill(TestingAsyncSessionLocal, rate=0, checkpoint=str(tmp_path / "c.json"))
+
+    assert n8n_client.calls == 2
+    cached = db.query(Book).filter(Book.title == "Cached").first()
+    partial = db.query(Book).filter(Book.title == "Partial").first()
+    db.refresh(cached)
+    db.refresh(partial)
+    assert cached.category == "ai category"
+    assert partial.summary == "new summary"
+    assert partial.category == "Kept"
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_spaces_calls(monkeypatch):
+    now = [0.0]
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    limiter = RateLimiter(rate=2, clock=lambda: now[0])
+    monkeypatch.setattr("backfill.asyncio.sleep", fake_sleep)
+
+    for _ in range(3):
+        await limiter.wait()
+
+    assert sleeps == [0.5, 1.0]
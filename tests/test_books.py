@@ -1,6 +1,7 @@
-import json
-import requests
-from routers.books import get_db, get_current_user
+import httpx
+import pytest
+from routers.books import get_db, get_read_db, get_current_user
+from enrichment import drain
 from .utils import (
     app,
     override_get_db,
@@ -8,12 +9,17 @@ from .utils import (
     client,
     test_book,
     TestingSessionLocal,
+    TestingAsyncSessionLocal,
     Book,
+    EnrichmentJob,
     text,
+    mock_n8n,
+    n8n_output,
 )
 
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
 app.dependency_overrides[get_current_user] = override_get_current_user
 
 
@@ -21,16 +27,19 @@ def test_get_all_books_authenticated(test_book):
 
     response = client.get("/books/my-books")
     assert response.status_code == 200
-    assert response.json() == [
-        {
-            "id": 1,
-            "title": "test_title",
-            "author": "test_author",
-            "summary": "test_summary",
-            "category": "test_category",
-            "owner_id": 1,
-        }
-    ]
+    assert response.json() == {
+        "items": [
+            {
+                "id": 1,
+                "title": "test_title",
+                "author": "test_author",
+                "summary": "test_summary",
+                "category": "test_category",
+                "owner_id": 1,
+            }
+        ],
+        "next_cursor": None,
+    }
 
 
 def test_get_all_books_unauthenticated(test_book):
@@ -64,11 +73,60 @@ def test_get_books_user_with_not_books(test_book):
         response = client.get("/books/my-books")
 
         assert response.status_code == 200
-        assert response.json() == []
+        assert response.json() == {"items": [], "next_cursor": None}
 
         db.execute(text("DELETE FROM books;"))
 
 
+def test_get_all_books_paginates_with_cursor(test_book):
+    db = TestingSessionLocal()
+    for i in range(4):
+        db.add(
+            Book(
+                title=f"paged {i}",
+                author="author",
+                category="odd" if i % 2 else "even",
+                owner_id=1,
+            )
+        )
+    db.add(Book(title="someone else's", author="author", owner_id=2))
+    db.commit()
+
+    pages = []
+    cursor = None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        response = client.get("/books/my-books", params=params)
+        assert response.status_code == 200
+        pages.append([book.get("title") for book in response.json().get("items")])
+        cursor = response.json().get("next_cursor")
+        if cursor is None:
+            break
+
+    assert pages == [["test_title", "paged 0"], ["paged 1", "paged 2"], ["paged 3"]]
+
+    response = client.get("/books/my-books", params={"category": "odd"})
+    assert [book.get("title") for book in response.json().get("items")] == [
+        "paged 1",
+        "paged 3",
+    ]
+
+
+def test_get_all_books_invalid_cursor(test_book):
+
+    response = client.get("/books/my-books", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor."}
+
+
+def test_get_all_books_limit_is_bounded(test_book):
+
+    response = client.get("/books/my-books", params={"limit": 100000})
+
+    assert response.status_code == 422
+
+
 def test_get_one_book_info_authenticated(test_book):
 
     response = client.get("/books/book-info/1")
@@ -104,48 +162,83 @@ def test_get_one_book_info_not_found(test_book):
 
 def test_add_new_book(monkeypatch, test_book):
 
-    class FakeResp:
-        def __init__(self, payload):
-            self.content = json.dumps(payload).encode()
-
-        def raise_for_status(self):
-            pass
-
-    def fake_post(url, json=None, timeout=None):
-        return FakeResp(
-            {"output": {"summary_by_ai": "ai summary", "category_by_ai": "ai category"}}
-        )
-
-    monkeypatch.setattr("routers.books.requests.post", fake_post)
+    mock_n8n(monkeypatch, n8n_output)
 
     request_data = {"title": "The Compound Effect", "author": "Darren Hardy"}
 
     response = client.post("/books/add-book", json=request_data)
 
     assert response.status_code == 201
+    assert response.json() == {
+        "id": 2,
+        "title": "The Compound Effect",
+        "author": "Darren Hardy",
+        "summary": None,
+        "category": None,
+        "owner_id": 1,
+        "enrichment_status": "pending",
+    }
 
     db = TestingSessionLocal()
     model = db.query(Book).filter(Book.id == 2).first()
 
     assert model.title == request_data.get("title")
     assert model.author == request_data.get("author")
+    assert model.summary is None
 
+    job = db.query(EnrichmentJob).filter(EnrichmentJob.book_id == 2).first()
+    assert job.status == "pending"
 
-def test_add_new_book_unauthenticated(monkeypatch, test_book):
 
-    class FakeResp:
-        def __init__(self, payload):
-            self.content = json.dumps(payload).encode()
+def test_add_new_book_does_not_call_webhook(monkeypatch, test_book):
 
-        def raise_for_status(self):
-            pass
+    def fail(request):
+        raise AssertionError("add-book must not wait on the webhook")
 
-    def fake_post(url, json=None, timeout=None):
-        return FakeResp(
-            {"output": {"summary_by_ai": "ai summary", "category_by_ai": "ai category"}}
-        )
+    mock_n8n(monkeypatch, fail)
+
+    request_data = {"title": "The Compound Effect", "author": "Darren Hardy"}
+
+    response = client.post("/books/add-book", json=request_data)
+
+    assert response.status_code == 201
 
-    monkeypatch.setattr("routers.books.requests.post", fake_post)
+
+@pytest.mark.asyncio
+async def test_add_new_book_cache_hit(monkeypatch, test_book):
+
+    mock_n8n(monkeypatch, n8n_output)
+
+    request_data = {"title": "The Compound Effect", "author": "Darren Hardy"}
+
+    client.post("/books/add-book", json=request_data)
+    await drain(TestingAsyncSessionLocal)
+
+    def fail(request):
+        raise AssertionError("cache hits must not call the webhook")
+
+    mock_n8n(monkeypatch, fail)
+
+    response = client.post(
+        "/books/add-book",
+        json={"title": "the compound effect", "author": "Darren Hardy"},
+    )
+
+    assert response.status_code == 201
+    assert response.json().get("summary") == "ai summary"
+    assert response.json().get("category") == "ai category"
+    assert response.json().get("enrichment_status") == "done"
+
+    db = TestingSessionLocal()
+    assert db.query(EnrichmentJob).filter(EnrichmentJob.book_id == 3).first() is None
+
+    response = client.get("/books/enrichment-status/3")
+    assert response.json().get("enrichment_status") == "done"
+
+
+def test_add_new_book_unauthenticated(monkeypatch, test_book):
+
+    mock_n8n(monkeypatch, n8n_output)
 
     app.dependency_overrides[get_current_user] = lambda: None
 
@@ -159,27 +252,17 @@ def test_add_new_book_unauthenticated(monkeypatch, test_book):
     app.dependency_overrides[get_current_user] = override_get_current_user
 
 
-def test_add_new_book_webhook_output(monkeypatch, test_book):
-
-    class FakeResp:
-        def __init__(self, payload):
-            self.content = json.dumps(payload).encode()
-
-        def raise_for_status(self):
-            pass
-
-    def fake_post(url, json=None, timeout=None):
-        return FakeResp(
-            {"output": {"summary_by_ai": "ai summary", "category_by_ai": "ai category"}}
-        )
+@pytest.mark.asyncio
+async def test_add_new_book_webhook_output(monkeypatch, test_book):
 
-    monkeypatch.setattr("routers.books.requests.post", fake_post)
+    mock_n8n(monkeypatch, n8n_output)
 
     request_data = {"title": "The Compound Effect", "author": "Darren Hardy"}
 
     response = client.post("/books/add-book", json=request_data)
 
     assert response.status_code == 201
+    assert await drain(TestingAsyncSessionLocal) == 1
 
     db = TestingSessionLocal()
     book_model = db.query(Book).filter(Book.id == 2).first()
@@ -187,28 +270,33 @@ def test_add_new_book_webhook_output(monkeypatch, test_book):
     assert book_model.summary == "ai summary"
     assert book_model.category == "ai category"
 
+    response = client.get("/books/enrichment-status/2")
 
-def test_add_new_book_webhook_without_output_key(monkeypatch, test_book):
-
-    class FakeResp:
-        def __init__(self, payload):
-            self.content = json.dumps(payload).encode()
+    assert response.status_code == 200
+    assert response.json() == {
+        "book_id": 2,
+        "enrichment_status": "done",
+        "attempts": 1,
+        "last_error": None,
+    }
 
-        def raise_for_status(self):
-            pass
 
-    def fake_post(url, json=None, timeout=None):
-        return FakeResp(
-            {"summary_by_ai": "test summary", "category_by_ai": "test category"}
-        )
+@pytest.mark.asyncio
+async def test_add_new_book_webhook_without_output_key(monkeypatch, test_book):
 
-    monkeypatch.setattr("routers.books.requests.post", fake_post)
+    mock_n8n(
+        monkeypatch,
+        lambda request: httpx.Response(
+            200, json={"summary_by_ai": "test summary", "category_by_ai": "test category"}
+        ),
+    )
 
     request_data = {"title": "Deep Work", "author": "Cal Newport"}
 
     response = client.post("/books/add-book", json=request_data)
 
     assert response.status_code == 201
+    await drain(TestingAsyncSessionLocal)
 
     db = TestingSessionLocal()
     book_model = db.query(Book).filter(Book.id == 2).first()
@@ -218,37 +306,30 @@ def test_add_new_book_webhook_without_output_key(monkeypatch, test_book):
 
 
 def test_add_new_book_db_failure(monkeypatch, test_book):
-    class FakeResp:
-        def __init__(self, payload):
-            self.content = json.dumps(payload).encode()
-
-        def raise_for_status(self):
-            pass
-
-    def fake_post(url, json=None, timeout=None):
-        return FakeResp(
-            {"output": {"summary_by_ai": "ai summary", "category_by_ai": "ai category"}}
-        )
-
-    monkeypatch.setattr("routers.books.requests.post", fake_post)
 
     class FakeDB:
         def add(self, obj):
             pass
 
+        async def flush(self):
+            pass
+
+        async def get(self, model, key):
+            return None
+
         # Raise an error on commit method
-        def commit(self):
+        async def commit(self):
             raise Exception("Simulated database error")
 
-        def close(self):
+        async def close(self):
             pass
 
-    def override_fake_db():
+    async def override_fake_db():
         db = FakeDB()
         try:
             yield db
         finally:
-            db.close()
+            await db.close()
 
     monkeypatch.setitem(app.dependency_overrides, get_db, override_fake_db)
 
@@ -260,57 +341,132 @@ def test_add_new_book_db_failure(monkeypatch, test_book):
     assert response.json() == {"detail": "Database storage failed."}
 
 
-def test_add_new_book_response_not_json(monkeypatch, test_book):
+@pytest.mark.asyncio
+async def test_add_new_book_response_not_json(monkeypatch, test_book):
 
-    class FakeResp:
-        def __init__(self, payload):
-            self.content = payload
+    mock_n8n(monkeypatch, lambda request: httpx.Response(200, content=b"Not JSON"))
 
-        def raise_for_status(self):
-            pass
+    request_data = {"author": "Cal Newport", "title": "So Good They Can't Ignore You"}
 
-    def fake_post(url, json=None, timeout=None):
-        return FakeResp("Not JSON")
+    response = client.post("/books/add-book", json=request_data)
 
-    monkeypatch.setattr("routers.books.requests.post", fake_post)
+    assert response.status_code == 201
+    await drain(TestingAsyncSessionLocal)
+
+    response = client.get("/books/enrichment-status/2")
+
+    assert response.json().get("enrichment_status") == "pending"
+    assert (
+        response.json().get("last_error")
+        == "Invalid response received from webhook service (malformed JSON)"
+    )
 
-    request_data = {"author": "Cal Newport", "title": "So Good They Can't Ignore You"}
+
+@pytest.mark.asyncio
+async def test_add_new_book_webhook_failed_response(monkeypatch, test_book):
+
+    def raise_connection_error(request):
+        raise httpx.ConnectError("Failed to connect to webhook serivce.")
+
+    mock_n8n(monkeypatch, raise_connection_error)
+
+    request_data = {"title": "Deep Work", "author": "Cal Newport"}
 
     response = client.post("/books/add-book", json=request_data)
 
-    assert response.status_code == 502
+    assert response.status_code == 201
+    await drain(TestingAsyncSessionLocal)
+
+    db = TestingSessionLocal()
+    job = db.query(EnrichmentJob).filter(EnrichmentJob.book_id == 2).first()
+
+    assert job.status == "pending"
+    assert job.attempts == 1
+    assert job.last_error == "Webhook service is unreachable or timedout."
+
+    book_model = db.query(Book).filter(Book.id == 2).first()
+    assert book_model.summary is None
+
+
+@pytest.mark.asyncio
+async def test_import_books_csv(monkeypatch, test_book):
+
+    mock_n8n(monkeypatch, n8n_output)
+    client.post(
+        "/books/add-book", json={"title": "Atomic Habits", "author": "James Clear"}
+    )
+    await drain(TestingAsyncSessionLocal)
+
+    body = (
+        "title,author\n"
+        "Deep Work,Cal Newport\n"
+        f"{'x' * 250},Someone\n"
+        "atomic habits,James Clear\n"
+    )
+
+    response = client.post(
+        "/books/import", content=body, headers={"content-type": "text/csv"}
+    )
+
+    assert response.status_code == 200
     assert response.json() == {
-        "detail": "Invalid response received from webhook service (malformed JSON)"
+        "created": 2,
+        "failed": 1,
+        "rows": [
+            {"row": 1, "status": "created", "id": 3, "enrichment_status": "pending"},
+            {
+                "row": 2,
+                "status": "invalid",
+                "errors": ["title: String should have at most 200 characters"],
+            },
+            {"row": 3, "status": "created", "id": 4, "enrichment_status": "done"},
+        ],
     }
 
+    db = TestingSessionLocal()
+    assert db.query(Book).filter(Book.id == 4).first().summary == "ai summary"
+    assert db.query(EnrichmentJob).filter(EnrichmentJob.book_id == 3).count() == 1
+    assert db.query(EnrichmentJob).filter(EnrichmentJob.book_id == 4).count() == 0
 
-def test_add_new_book_webhook_failed_response(monkeypatch, test_book):
 
-    def fake_post_raising_connection_error(url, json=None, timeout=None):
-        raise requests.exceptions.ConnectionError(
-            "Failed to connect to webhook serivce."
-        )
+def test_import_books_ndjson(test_book):
 
-    monkeypatch.setattr(
-        "routers.books.requests.post", fake_post_raising_connection_error
+    body = '{"title": "Deep Work", "author": "Cal Newport"}\n\n{"title": "Range"}\n'
+
+    response = client.post(
+        "/books/import?format=ndjson", content=body
     )
 
-    request_data = {"title": "Deep Work", "author": "Cal Newport"}
+    assert response.status_code == 200
+    assert response.json().get("created") == 1
+    assert response.json().get("failed") == 1
+    assert response.json().get("rows")[1] == {
+        "row": 2,
+        "status": "invalid",
+        "errors": ["author: Field required"],
+    }
 
-    response = client.post("/books/add-book", json=request_data)
 
-    assert response.status_code == 503
-    assert response.json() == {"detail": "Webhook service is unreachable or timedout."}
+def test_import_books_unsupported_format(test_book):
 
-    def fake_post_raising_timeout_error(url, json=None, timeout=None):
-        raise requests.exceptions.Timeout("Connection timed out.")
+    response = client.post(
+        "/books/import", content="{}", headers={"content-type": "application/json"}
+    )
 
-    monkeypatch.setattr("routers.books.requests.post", fake_post_raising_timeout_error)
+    assert response.status_code == 415
+    assert response.json() == {"detail": "Upload must be CSV or NDJSON."}
 
-    response = client.post("/books/add-book", json=request_data)
 
-    assert response.status_code == 503
-    assert response.json() == {"detail": "Webhook service is unreachable or timedout."}
+def test_import_books_bad_csv_header(test_book):
+
+    response = client.post(
+        "/books/import", content="name\nDeep Work\n", headers={"content-type": "text/csv"}
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {
+        "detail": "CSV header must contain 'title' and 'author' columns."
+    }
 
 
 def test_add_book_failed_length_validation_request(test_book):
@@ -325,3 +481,334 @@ def test_add_book_failed_length_validation_request(test_book):
         response.json().get("detail")[0].get("msg")
         == "String should have at most 200 characters"
     )
+
+
+def search_titles(q):
+    response = client.get("/books/search", params={"q": q})
+    return [item.get("title") for item in response.json().get("items")]
+
+
+def test_search_books_ranks_and_scopes_to_owner(test_book):
+    db = TestingSessionLocal()
+    db.add_all(
+        [
+            Book(title="Deep Work", author="Cal Newport", summary="Focus", owner_id=1),
+            Book(
+                title="Digital Minimalism",
+                author="Cal Newport",
+                summary="Deep focus in a noisy world",
+                owner_id=1,
+            ),
+            Book(title="Deep Work", author="Cal Newport", owner_id=2),
+        ]
+    )
+    db.commit()
+
+    response = client.get("/books/search", params={"q": "deep"})
+
+    assert response.status_code == 200
+    items = response.json().get("items")
+    assert [item.get("title") for item in items] == ["Deep Work", "Digital Minimalism"]
+    assert all(item.get("owner_id") == 1 for item in items)
+    assert items[0].get("rank") > items[1].get("rank")
+
+    # The last term matches as a prefix.
+    assert len(search_titles("cal newp")) == 2
+
+    response = client.get("/books/search", params={"q": "?!"})
+    assert response.json() == {"items": []}
+
+
+def test_search_index_follows_edits_and_deletes(test_book):
+
+    assert search_titles("test_title") == ["test_title"]
+
+    response = client.put(
+        "/books/edit-book/1",
+        json={
+            "title": "Renamed",
+            "author": "test_author",
+            "category": "test_category",
+            "summary": "test_summary",
+        },
+    )
+    assert response.status_code == 204
+    assert search_titles("test_title") == []
+    assert search_titles("renamed") == ["Renamed"]
+
+    client.delete("/books/delete-book/1")
+    assert search_titles("renamed") == []
+
+
+def test_search_books_unauthenticated(test_book):
+
+    app.dependency_overrides[get_current_user] = lambda: None
+
+    response = client.get("/books/search", params={"q": "deep"})
+
+    assert response.status_code == 401
+    app.dependency_overrides[get_current_user] = override_get_current_user
+
+
+def test_get_all_books_sparse_fields(test_book):
+
+    response = client.get("/books/my-books", params={"fields": "title,author"})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "items": [{"id": 1, "title": "test_title", "author": "test_author"}],
+        "next_cursor": None,
+    }
+
+
+def test_get_all_books_sparse_fields_paginate(test_book):
+    db = TestingSessionLocal()
+    db.add(Book(title="second", author="author", owner_id=1))
+    db.commit()
+
+    first = client.get("/books/my-books", params={"fields": "title", "limit": 1})
+    second = client.get(
+        "/books/my-books",
+        params={"fields": "title", "limit": 1, "cursor": first.json()["next_cursor"]},
+    )
+
+    assert first.json()["items"] == [{"id": 1, "title": "test_title"}]
+    assert second.json() == {"items": [{"id": 2, "title": "second"}], "next_cursor": None}
+
+
+def test_get_one_book_info_sparse_fields(test_book):
+
+    response = client.get("/books/book-info/1", params={"fields": "summary"})
+
+    assert response.status_code == 200
+    assert response.json() == {"id": 1, "summary": "test_summary"}
+
+    response = client.get("/books/book-info/999", params={"fields": "summary"})
+    assert response.status_code == 404
+
+
+def test_sparse_fields_unknown_field(test_book):
+
+    response = client.get("/books/my-books", params={"fields": "title,hashed_password"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unknown fields: hashed_password."}
+
+
+def test_library_stats_follow_adds_edits_and_deletes(test_book):
+    client.post("/books/add-book", json={"title": "Second", "author": "test_author"})
+    client.post("/books/add-book", json={"title": "Third", "author": "Other Author"})
+    client.put(
+        "/books/edit-book/3",
+        json={
+            "title": "Third",
+            "author": "Other Author",
+            "category": "test_category",
+            "summary": "summary",
+        },
+    )
+
+    response = client.get("/books/stats")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "book_count": 3,
+        "categories": [
+            {"category": "test_category", "book_count": 2},
+            {"category": None, "book_count": 1},
+        ],
+        "top_authors": [
+            {"author": "test_author", "book_count": 2},
+            {"author": "Other Author", "book_count": 1},
+        ],
+    }
+
+    client.delete("/books/delete-book/1")
+    client.delete("/books/delete-book/2")
+    assert client.get("/books/stats").json() == {
+        "book_count": 1,
+        "categories": [{"category": "test_category", "book_count": 1}],
+        "top_authors": [{"author": "Other Author", "book_count": 1}],
+    }
+
+
+def test_library_stats_without_books():
+
+    response = client.get("/books/stats")
+
+    assert response.json() == {"book_count": 0, "categories": [], "top_authors": []}
+
+
+def test_book_info_conditional_get(test_book):
+    first = client.get("/books/book-info/1")
+    etag = first.headers["etag"]
+
+    assert first.headers["cache-control"] == "private, no-cache"
+    repeat = client.get("/books/book-info/1", headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["etag"] == etag
+    assert client.get(
+        "/books/book-info/1", headers={"If-None-Match": f'"other", W/{etag}'}
+    ).status_code == 304
+
+    # Another representation of the same book gets its own tag.
+    sparse = client.get("/books/book-info/1", params={"fields": "title"})
+    assert sparse.headers["etag"] != etag
+
+    client.put(
+        "/books/edit-book/1",
+        json={
+            "title": "Renamed",
+            "author": "test_author",
+            "category": "test_category",
+            "summary": "test_summary",
+        },
+    )
+    changed = client.get("/books/book-info/1", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json().get("title") == "Renamed"
+    assert changed.headers["etag"] != etag
+
+
+def test_book_info_conditional_get_skips_the_row_query(monkeypatch, test_book):
+    etag = client.get("/books/book-info/1").headers["etag"]
+
+    def no_row_query(*args, **kwargs):
+        raise AssertionError("the book was read for a 304")
+
+    monkeypatch.setattr("queries.book_with_version", no_row_query)
+    response = client.get("/books/book-info/1", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+@pytest.mark.asyncio
+async def test_core_updates_bump_the_book_version(monkeypatch, test_book):
+    mock_n8n(monkeypatch, n8n_output)
+    client.post("/books/add-book", json={"title": "Deep Work", "author": "Cal Newport"})
+    etag = client.get("/books/book-info/2").headers["etag"]
+
+    await drain(TestingAsyncSessionLocal)
+
+    response = client.get("/books/book-info/2", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json().get("summary") == "ai summary"
+    db = TestingSessionLocal()
+    assert db.query(Book).filter(Book.id == 2).one().version == 2
+
+
+def test_my_books_conditional_get_skips_the_page_query(monkeypatch, test_book):
+    etag = client.get("/books/my-books").headers["etag"]
+
+    def no_page_query(*args, **kwargs):
+        raise AssertionError("the page was built for a 304")
+
+    monkeypatch.setattr("queries.books_page", no_page_query)
+    response = client.get("/books/my-books", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_my_books_etag_changes_with_the_collection(monkeypatch, test_book):
+    mock_n8n(monkeypatch, n8n_output)
+    tags = [client.get("/books/my-books").headers["etag"]]
+
+    client.post("/books/add-book", json={"title": "Second", "author": "author"})
+    tags.append(client.get("/books/my-books").headers["etag"])
+    client.delete("/books/delete-book/2")
+    tags.append(client.get("/books/my-books").headers["etag"])
+    tags.append(client.get("/books/my-books", params={"limit": 1}).headers["etag"])
+
+    assert len(set(tags)) == 4
+    assert (
+        client.get("/books/my-books", headers={"If-None-Match": tags[0]}).status_code
+        == 200
+    )
+    assert (
+        client.get("/books/my-books", headers={"If-None-Match": tags[2]}).status_code
+        == 304
+    )
+
+
+def test_edit_book(test_book):
+
+    response = client.put(
+        "/books/edit-book/1",
+        json={
+            "title": "New title",
+            "author": "New author",
+            "category": "New category",
+            "summary": "New summary",
+        },
+    )
+
+    assert response.status_code == 204
+    db = TestingSessionLocal()
+    model = db.query(Book).filter(Book.id == 1).first()
+    assert (model.title, model.author, model.category, model.summary) == (
+        "New title",
+        "New author",
+        "New category",
+        "New summary",
+    )
+
+
+def test_edit_book_not_found_or_not_owned(test_book):
+    db = TestingSessionLocal()
+    db.add(Book(title="theirs", author="author", owner_id=2))
+    db.commit()
+    request_data = {
+        "title": "Mine now",
+        "author": "author",
+        "category": "category",
+        "summary": "summary",
+    }
+
+    missing = client.put("/books/edit-book/99", json=request_data)
+    not_owned = client.put("/books/edit-book/2", json=request_data)
+
+    assert missing.status_code == 404
+    assert not_owned.status_code == 404
+    assert not_owned.json() == {"detail": "Book not found."}
+    db.expire_all()
+    assert db.query(Book).filter(Book.id == 2).one().title == "theirs"
+
+
+def test_delete_book(test_book):
+
+    response = client.delete("/books/delete-book/1")
+
+    assert response.status_code == 204
+    assert client.delete("/books/delete-book/1").status_code == 404
+
+
+def test_delete_book_not_owned(test_book):
+    db = TestingSessionLocal()
+    db.add(Book(title="theirs", author="author", owner_id=2))
+    db.commit()
+
+    response = client.delete("/books/delete-book/2")
+
+    assert response.status_code == 404
+    assert db.query(Book).filter(Book.id == 2).first() is not None
+
+
+def test_my_books_is_served_from_the_response_cache(monkeypatch, test_book):
+    first = client.get("/books/my-books")
+
+    def no_page_query(*args, **kwargs):
+        raise AssertionError("the page should come from the cache")
+
+    with monkeypatch.context() as patch:
+        patch.setattr("queries.books_page", no_page_query)
+        cached = client.get("/books/my-books")
+    assert cached.json() == first.json()
+    assert cached.headers["etag"] == first.headers["etag"]
+
+    # A write through the API invalidates the user's entries immediately.
+    client.post("/books/add-book", json={"title": "Second", "author": "author"})
+    titles = [book["title"] for book in client.get("/books/my-books").json()["items"]]
+    assert titles == ["test_title", "Second"]
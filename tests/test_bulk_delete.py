@@ -0,0 +1,47 @@
+import pytest
+from bulk_delete import count_books, delete_books
+import queries
+from .utils import TestingAsyncSessionLocal, TestingSessionLocal, test_book, Book
+
+
+def add_books(*books):
+    db = TestingSessionLocal()
+    db.add_all(books)
+    db.commit()
+
+
+def remaining_titles() -> list:
+    db = TestingSessionLocal()
+    return [book.title for book in db.query(Book).order_by(Book.id)]
+
+
+@pytest.mark.asyncio
+async def test_delete_books_commits_one_chunk_at_a_time(test_book):
+    add_books(*[Book(title=f"spam {i}", author="a", owner_id=2) for i in range(5)])
+    conditions = queries.book_conditions(owner_id=2)
+
+    async with TestingAsyncSessionLocal() as db:
+        result = await delete_books(db, conditions, chunk_size=2)
+
+    assert result == {"deleted": 5, "chunks": 3}
+    assert remaining_titles() == ["test_title"]
+
+
+@pytest.mark.asyncio
+async def test_count_books_matches_every_filter(test_book):
+    add_books(
+        Book(title="Spam one", author="a", category="junk", owner_id=2),
+        Book(title="Spam two", author="a", category="keep", owner_id=2),
+        Book(title="Ham", author="a", category="junk", owner_id=2),
+    )
+    conditions = queries.book_conditions(category="junk", title_pattern="Spam%")
+
+    async with TestingAsyncSessionLocal() as db:
+        assert await count_books(db, conditions) == 1
+        assert await delete_books(db, conditions) == {"deleted": 1, "chunks": 1}
+
+    assert remaining_titles() == ["test_title", "Spam two", "Ham"]
+
+
+def test_book_conditions_empty_without_filters():
+    assert queries.book_conditions() == []
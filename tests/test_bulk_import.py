@@ -0,0 +1,96 @@
+import pytest
+from bulk_import import (
+    ImportFormatError,
+    detect_format,
+    import_books,
+    iter_lines,
+    iter_rows,
+)
+from config import Config
+from routers.books import AddBookRequest
+from .utils import (
+    TestingSessionLocal,
+    TestingAsyncSessionLocal,
+    test_book,
+    Book,
+    EnrichmentJob,
+)
+
+
+async def chunked(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_detect_format():
+    assert detect_format("text/csv; charset=utf-8") == "csv"
+    assert detect_format("application/x-ndjson") == "ndjson"
+    assert detect_format("application/json") is None
+    assert detect_format("application/octet-stream", "ndjson") == "ndjson"
+    assert detect_format("text/csv", "xml") is None
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_handles_split_chunks():
+    text = "title,author\r\nÉtranger,Camus\nlast".encode()
+    chunks = [text[i : i + 3] for i in range(0, len(text), 3)]
+
+    lines = await collect(iter_lines(chunked(*chunks)))
+
+    assert lines == ["title,author", "Étranger,Camus", "last"]
+
+
+@pytest.mark.asyncio
+async def test_csv_rows_with_quoted_newlines():
+    body = b'Title,Author,Year\n"Multi\nline, title","An Author",2020\nDeep Work,Cal Newport,2016\n'
+
+    rows = await collect(iter_rows(chunked(body), "csv"))
+
+    assert rows == [
+        {"title": "Multi\nline, title", "author": "An Author", "year": "2020"},
+        {"title": "Deep Work", "author": "Cal Newport", "year": "2016"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_csv_without_required_header():
+    with pytest.raises(ImportFormatError):
+        await collect(iter_rows(chunked(b"name,writer\na,b\n"), "csv"))
+
+
+@pytest.mark.asyncio
+async def test_import_books_in_batches(monkeypatch, test_book):
+    monkeypatch.setattr(Config, "IMPORT_BATCH_SIZE", 2)
+    body = b"\n".join(
+        [b'{"title": "Book %d", "author": "Author"}' % i for i in range(5)]
+        + [b"not json", b'{"title": "No author"}']
+    )
+    batches = []
+
+    async with TestingAsyncSessionLocal() as async_db:
+        report = await import_books(
+            async_db,
+            1,
+            iter_rows(chunked(body), "ndjson"),
+            AddBookRequest,
+            on_batch=lambda: batches.append(1),
+        )
+
+    assert report.get("created") == 5
+    assert report.get("failed") == 2
+    assert [row.get("row") for row in report.get("rows")] == list(range(1, 8))
+    assert report.get("rows")[5] == {
+        "row": 6,
+        "status": "invalid",
+        "errors": ["Malformed row."],
+    }
+    assert report.get("rows")[6].get("errors") == ["author: Field required"]
+    assert len(batches) == 3
+
+    db = TestingSessionLocal()
+    assert db.query(Book).filter(Book.author == "Author").count() == 5
+    assert db.query(EnrichmentJob).count() == 5
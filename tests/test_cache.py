@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from cache import SingleFlight, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_and_set():
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats().get("hits") == 1
+    assert cache.stats().get("misses") == 1
+
+
+def test_entries_expire():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+
+    clock.now = 9.9
+    assert cache.get("a") == 1
+
+    clock.now = 10.0
+    assert cache.get("a") is None
+    assert cache.stats().get("expirations") == 1
+    assert len(cache) == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats().get("evictions") == 1
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    executions = 0
+
+    async def fetch():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+
+    assert results == ["result"] * 5
+    assert executions == 1
+    assert flight.stats() == {
+        "calls": 5,
+        "executions": 1,
+        "coalesced": 4,
+        "in_flight": 0,
+    }
+
+    # Once the call finished the next one goes upstream again.
+    await flight.do("key", fetch)
+    assert executions == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_exceptions():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    results = await asyncio.gather(
+        flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+    )
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert flight.executions == 1
+
+
+@pytest.mark.asyncio
+async def test_single_flight_keys_are_independent():
+    flight = SingleFlight()
+
+    async def echo(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    results = await asyncio.gather(
+        flight.do("a", lambda: echo("a")), flight.do("b", lambda: echo("b"))
+    )
+
+    assert results == ["a", "b"]
+    assert flight.coalesced == 0
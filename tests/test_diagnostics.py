@@ -0,0 +1,88 @@
+from .utils import (
+    app,
+    override_get_db,
+    override_get_current_user,
+    client,
+    test_book,
+    TestingSessionLocal,
+    engine,
+)
+from enrichment import enqueue_enrichment
+from routers.diagnostics import get_db, get_current_user
+from sqlite_maintenance import sqlite_maintenance
+
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_current_user] = override_get_current_user
+
+
+def test_db_pool_stats():
+
+    response = client.get("/diagnostics/db")
+
+    assert response.status_code == 200
+    for pool in ("async", "sync"):
+        assert "checkout_wait_p99" in response.json().get(pool)
+        assert "saturation" in response.json().get(pool)
+        assert "connections_opened" in response.json().get(pool)
+
+
+def test_db_pool_stats_not_admin_user(monkeypatch):
+
+    monkeypatch.setitem(
+        app.dependency_overrides,
+        get_current_user,
+        lambda: {"username": "testuser", "id": 1, "user_role": "regular"},
+    )
+
+    response = client.get("/diagnostics/db")
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Authentication failed."}
+
+
+def test_enrichment_stats(test_book):
+    db = TestingSessionLocal()
+    enqueue_enrichment(db, 1)
+    db.commit()
+
+    response = client.get("/diagnostics/enrichment")
+
+    assert response.status_code == 200
+    assert response.json().get("outbox") == {"pending": 1}
+    assert response.json().get("n8n").get("circuit_state") == "closed"
+    assert "coalesced" in response.json().get("single_flight")
+
+
+def test_sqlite_stats(monkeypatch):
+    monkeypatch.setattr(sqlite_maintenance, "engine", engine)
+
+    response = client.get("/diagnostics/sqlite")
+
+    assert response.status_code == 200
+    assert "journal_mode" in response.json().get("pragmas")
+    assert set(response.json().get("tasks")) == {
+        "optimize",
+        "analyze",
+        "incremental_vacuum",
+    }
+
+
+def test_response_cache_stats():
+
+    response = client.get("/diagnostics/cache")
+
+    assert response.status_code == 200
+    for counter in ("hits", "misses", "invalidations", "errors"):
+        assert counter in response.json()
+    assert response.json()["backend"]["backend"] == "memory"
+    assert "evictions" in response.json()["backend"]
+
+
+def test_password_hasher_stats():
+
+    response = client.get("/diagnostics/passwords")
+
+    assert response.status_code == 200
+    for counter in ("pending", "rejected", "queue_wait_p99", "duration_p99"):
+        assert counter in response.json()
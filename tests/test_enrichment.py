@@ -0,0 +1,303 @@
+import asyncio
+import time
+from datetime import timedelta
+import httpx
+import pytest
+from config import Config
+from enrichment import (
+    EnrichmentWorkerPool,
+    backoff_delay,
+    cache_key,
+    claim_next_job,
+    drain,
+    enqueue_enrichment,
+    enrichment_flight,
+    get_cached_enrichment,
+    memory_cache,
+    run_once,
+)
+from models import utcnow
+from .utils import (
+    TestingSessionLocal,
+    TestingAsyncSessionLocal,
+    test_book,
+    Book,
+    EnrichmentJob,
+    EnrichmentCacheEntry,
+    mock_n8n,
+    n8n_output,
+)
+
+
+def enqueue(book_id=1):
+    db = TestingSessionLocal()
+    job = enqueue_enrichment(db, book_id)
+    db.commit()
+    job_id = job.id
+    db.close()
+    return job_id
+
+
+def set_book_fields(book_id=1, **values):
+    db = TestingSessionLocal()
+    db.query(Book).filter(Book.id == book_id).update(values)
+    db.commit()
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_run_once_fills_book(monkeypatch, test_book):
+    mock_n8n(monkeypatch, n8n_output)
+    # As add-book leaves a book it could not fill from the cache.
+    set_book_fields(summary=None, category=None)
+    job_id = enqueue()
+
+    assert await run_once(TestingAsyncSessionLocal) is True
+    assert await run_once(TestingAsyncSessionLocal) is False
+
+    db = TestingSessionLocal()
+    book = db.query(Book).filter(Book.id == 1).first()
+    job = db.get(EnrichmentJob, job_id)
+
+    assert book.summary == "ai summary"
+    assert book.category == "ai category"
+    assert job.status == "done"
+
+
+@pytest.mark.asyncio
+async def test_fill_keeps_values_the_owner_saved_meanwhile(monkeypatch, test_book):
+    mock_n8n(monkeypatch, n8n_output)
+    set_book_fields(summary="my own summary", category=None)
+    enqueue()
+
+    assert await run_once(TestingAsyncSessionLocal) is True
+
+    book = TestingSessionLocal().query(Book).filter(Book.id == 1).one()
+    assert book.summary == "my own summary"
+    assert book.category == "ai category"
+
+
+@pytest.mark.asyncio
+async def test_result_is_cached_in_both_tiers(monkeypatch, test_book):
+    n8n_client = mock_n8n(monkeypatch, n8n_output)
+    enqueue()
+
+    await drain(TestingAsyncSessionLocal)
+
+    db = TestingSessionLocal()
+    key = cache_key("test_title", "test_author")
+    entry = db.get(EnrichmentCacheEntry, key)
+    assert entry.summary == "ai summary"
+    assert memory_cache.get(key) == {
+        "summary_by_ai": "ai summary",
+        "category_by_ai": "ai category",
+    }
+
+    # The persistent tier survives a restart (cleared memory tier).
+    memory_cache.clear()
+    async with TestingAsyncSessionLocal() as async_db:
+        cached = await get_cached_enrichment(async_db, " Test_Title ", "TEST author")
+    assert cached == {
+        "summary_by_ai": "ai summary",
+        "category_by_ai": "ai category",
+    }
+
+    enqueue()
+    await drain(TestingAsyncSessionLocal)
+    assert n8n_client.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_jobs_share_one_webhook_call(monkeypatch, test_book):
+    calls = 0
+    coalesced_before = enrichment_flight.coalesced
+
+    async def slow_output(request):
+        nonlocal calls
+        calls += 1
+        # Hold the call open until the other three jobs joined it; a fixed
+        # delay races against the workers' (SQLite-serialized) job claims.
+        for _ in range(500):
+            if enrichment_flight.coalesced - coalesced_before >= 3:
+                break
+            await asyncio.sleep(0.01)
+        return n8n_output(request)
+
+    mock_n8n(monkeypatch, slow_output)
+
+    db = TestingSessionLocal()
+    for _ in range(4):
+        db.add(Book(title="Trending", author="Someone", owner_id=1))
+    db.commit()
+    book_ids = [book_id for (book_id,) in db.query(Book.id).filter(Book.title == "Trending")]
+    for book_id in book_ids:
+        enqueue(book_id)
+
+    processed = await asyncio.gather(*(run_once(TestingAsyncSessionLocal) for _ in book_ids))
+
+    assert processed == [True] * 4
+    assert calls == 1
+    assert enrichment_flight.coalesced - coalesced_before == 3
+
+    summaries = db.query(Book.summary).filter(Book.title == "Trending").all()
+    assert summaries == [("ai summary",)] * 4
+
+
+def test_cache_key_is_normalized():
+    assert cache_key("Deep Work", "Cal Newport") == cache_key(
+        "  deep   WORK. ", "cal newport"
+    )
+    assert cache_key("Café Society", "Zoë Heller") == cache_key(
+        "cafe society", "ZOE HELLER"
+    )
+    assert cache_key("Deep Work", "Cal Newport") != cache_key(
+        "Deep Work", "Someone Else"
+    )
+
+
+@pytest.mark.asyncio
+async def test_claim_leases_job(test_book):
+    enqueue()
+
+    async with TestingAsyncSessionLocal() as db:
+        job = await claim_next_job(db)
+
+    assert job.status == "running"
+    assert job.attempts == 1
+    assert job.next_attempt_at > utcnow()
+
+    # Leased jobs are invisible to other workers until the lease expires.
+    async with TestingAsyncSessionLocal() as db:
+        assert await claim_next_job(db) is None
+
+    db = TestingSessionLocal()
+    leased = db.get(EnrichmentJob, job.id)
+    leased.next_attempt_at = utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    async with TestingAsyncSessionLocal() as db:
+        reclaimed = await claim_next_job(db)
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_then_given_up(monkeypatch, test_book):
+    def server_error(request):
+        return httpx.Response(500)
+
+    n8n_client = mock_n8n(monkeypatch, server_error)
+    n8n_client.breaker.failure_threshold = 1000
+    job_id = enqueue()
+
+    db = TestingSessionLocal()
+    for attempt in range(1, Config.ENRICHMENT_MAX_ATTEMPTS + 1):
+        assert await drain(TestingAsyncSessionLocal) == 1
+
+        job = db.get(EnrichmentJob, job_id)
+        db.refresh(job)
+        assert job.attempts == attempt
+
+        if attempt < Config.ENRICHMENT_MAX_ATTEMPTS:
+            assert job.status == "pending"
+            assert job.next_attempt_at > utcnow()
+            job.next_attempt_at = utcnow() - timedelta(seconds=1)
+            db.commit()
+
+    assert job.status == "failed"
+    assert job.last_error == "Webhook service is unreachable or timedout."
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_does_not_burn_attempts(monkeypatch, test_book):
+    n8n_client = mock_n8n(monkeypatch, n8n_output)
+    n8n_client.breaker.state = n8n_client.breaker.OPEN
+    n8n_client.breaker.opened_at = time.monotonic()
+    job_id = enqueue()
+
+    assert await drain(TestingAsyncSessionLocal) == 1
+
+    db = TestingSessionLocal()
+    job = db.get(EnrichmentJob, job_id)
+    assert job.status == "pending"
+    assert job.attempts == 0
+    assert job.next_attempt_at > utcnow() + timedelta(
+        seconds=n8n_client.breaker.reset_timeout - 5
+    )
+
+
+@pytest.mark.asyncio
+async def test_job_for_deleted_book_is_closed(monkeypatch, test_book):
+    mock_n8n(monkeypatch, n8n_output)
+    job_id = enqueue(book_id=999)
+
+    assert await drain(TestingAsyncSessionLocal) == 1
+
+    db = TestingSessionLocal()
+    job = db.get(EnrichmentJob, job_id)
+    assert job.status == "done"
+    assert job.last_error == "Book no longer exists."
+
+
+def test_backoff_delay_grows_and_is_capped():
+    assert backoff_delay(1) <= Config.ENRICHMENT_BACKOFF_BASE
+    assert backoff_delay(3) >= Config.ENRICHMENT_BACKOFF_BASE * 2
+    assert backoff_delay(100) <= Config.ENRICHMENT_BACKOFF_MAX
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_drains_outbox(monkeypatch, test_book):
+    mock_n8n(monkeypatch, n8n_output)
+    job_id = enqueue()
+
+    pool = EnrichmentWorkerPool(TestingAsyncSessionLocal, workers=2, poll_interval=0.05)
+    await pool.start()
+    pool.notify()
+
+    db = TestingSessionLocal()
+    for _ in range(100):
+        job = db.get(EnrichmentJob, job_id)
+        db.refresh(job)
+        if job.status == "done":
+            break
+        await asyncio.sleep(0.05)
+    await pool.stop()
+
+    assert job.status == "done"
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_is_retried_not_left_running(monkeypatch, test_book):
+    async def broken_enrich(title, author):
+        raise AttributeError("'list' object has no attribute 'get'")
+
+    n8n_client = mock_n8n(monkeypatch, n8n_output)
+    monkeypatch.setattr(n8n_client, "enrich", broken_enrich)
+    job_id = enqueue()
+
+    assert await drain(TestingAsyncSessionLocal) == 1
+
+    db = TestingSessionLocal()
+    job = db.get(EnrichmentJob, job_id)
+    assert job.status == "pending"
+    assert job.attempts == 1
+    assert job.next_attempt_at > utcnow()
+    assert "no attribute" in job.last_error
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_on_last_attempt_fails_the_job(test_book):
+    job_id = enqueue()
+    db = TestingSessionLocal()
+    job = db.get(EnrichmentJob, job_id)
+    job.status = "running"
+    job.attempts = Config.ENRICHMENT_MAX_ATTEMPTS
+    job.next_attempt_at = utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    async with TestingAsyncSessionLocal() as async_db:
+        assert await claim_next_job(async_db) is None
+
+    db.refresh(job)
+    assert job.status == "failed"
+    assert job.attempts == Config.ENRICHMENT_MAX_ATTEMPTS
@@ -0,0 +1,47 @@
+import gzip
+import json
+import pytest
+from export import FORMAT_CSV, stream_books
+import queries
+from .utils import TestingAsyncSessionLocal, TestingSessionLocal, test_book, Book
+
+
+async def collect(body):
+    return [chunk async for chunk in body]
+
+
+@pytest.mark.asyncio
+async def test_export_is_streamed_one_partition_at_a_time(test_book):
+    db = TestingSessionLocal()
+    db.add_all([Book(title=f"title {i}", author="author", owner_id=1) for i in range(4)])
+    db.commit()
+
+    chunks = await collect(
+        stream_books(TestingAsyncSessionLocal, queries.books_export(), chunk_size=2)
+    )
+
+    # 5 rows in partitions of 2.
+    assert [chunk.count(b"\n") for chunk in chunks] == [2, 2, 1]
+    rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    assert [row["title"] for row in rows] == ["test_title"] + [f"title {i}" for i in range(4)]
+
+
+@pytest.mark.asyncio
+async def test_export_filters_and_compresses(test_book):
+    db = TestingSessionLocal()
+    db.add(Book(title="other owner", author="author", owner_id=2))
+    db.commit()
+
+    chunks = await collect(
+        stream_books(
+            TestingAsyncSessionLocal,
+            queries.books_export(owner_id=2),
+            export_format=FORMAT_CSV,
+            compress=True,
+        )
+    )
+
+    assert gzip.decompress(b"".join(chunks)).decode().splitlines() == [
+        "id,title,author,summary,category,owner_id",
+        "2,other owner,author,,,2",
+    ]
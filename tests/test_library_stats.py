@@ -0,0 +1,100 @@
+from sqlalchemy import text
+import library_stats
+import queries
+from .utils import engine, test_book, TestingSessionLocal, Book
+
+
+def rollup(table: str) -> list:
+    with engine.connect() as connection:
+        return connection.execute(text(f"SELECT * FROM {table} ORDER BY 1, 2")).all()
+
+
+def test_enrichment_filling_the_category_moves_the_count(test_book):
+    db = TestingSessionLocal()
+    db.add(Book(title="t", author="a", owner_id=1))
+    db.commit()
+    # Uncategorized books are counted per owner only, never in one shared row.
+    assert (1, "", 1) in rollup("user_category_stats")
+    assert rollup("category_stats") == [("test_category", 1)]
+
+    db.query(Book).filter(Book.title == "t").update({"category": "filled", "summary": "s"})
+    db.commit()
+
+    assert rollup("category_stats") == [("filled", 1), ("test_category", 1)]
+    assert rollup("user_category_stats") == [(1, "filled", 1), (1, "test_category", 1)]
+
+
+def test_summary_only_update_leaves_counts(test_book):
+    db = TestingSessionLocal()
+    db.query(Book).update({"summary": "changed"})
+    db.commit()
+
+    assert rollup("user_stats") == [(1, 1)]
+    assert [row[1:] for row in rollup("title_stats")] == [("test_title", "test_author", 1)]
+
+
+def test_rebuild_repairs_drift(test_book):
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE user_stats SET book_count = 40"))
+        connection.execute(text("DELETE FROM user_author_stats"))
+        connection.execute(
+            text("INSERT INTO category_stats (category, book_count) VALUES ('gone', 3)")
+        )
+
+    counts = library_stats.rebuild(engine)
+
+    assert counts == {
+        "user_stats": 1,
+        "user_category_stats": 1,
+        "user_author_stats": 1,
+        "category_stats": 1,
+        "title_stats": 1,
+    }
+    assert rollup("user_stats") == [(1, 1)]
+    assert rollup("user_author_stats") == [(1, "test_author", 1)]
+    assert rollup("category_stats") == [("test_category", 1)]
+
+
+def test_books_without_owner_only_count_globally(test_book):
+    db = TestingSessionLocal()
+    db.add(Book(title="orphan", author="a", category="x"))
+    db.commit()
+
+    assert rollup("user_stats") == [(1, 1)]
+    assert ("orphan", "a", 1) in [row[1:] for row in rollup("title_stats")]
+    assert ("x", 1) in rollup("category_stats")
+
+
+def test_collection_version_grows_on_every_change(test_book):
+    def version():
+        return rollup("book_collections")
+
+    before = version()
+    db = TestingSessionLocal()
+    db.query(Book).update({"summary": "changed"})
+    db.commit()
+    after_update = version()
+    db.query(Book).delete()
+    db.commit()
+
+    assert before[0][1] < after_update[0][1] < version()[0][1]
+
+
+def test_title_variants_are_counted_together(test_book):
+    db = TestingSessionLocal()
+    db.add(Book(title="  TEST title", author="Test-Author", owner_id=1))
+    db.commit()
+
+    assert [row[1:] for row in rollup("title_stats")] == [("test_title", "test_author", 2)]
+
+    db.query(Book).filter(Book.id == 1).delete()
+    db.commit()
+    assert [row[3] for row in rollup("title_stats")] == [1]
+
+
+def test_editing_the_title_moves_the_title_count(test_book):
+    db = TestingSessionLocal()
+    db.execute(queries.update_owned_book(1, 1, {"title": "Renamed", "author": "test_author"}))
+    db.commit()
+
+    assert [row[1:] for row in rollup("title_stats")] == [("Renamed", "test_author", 1)]
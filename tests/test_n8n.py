@@ -0,0 +1,199 @@
+import asyncio
+import httpx
+import pytest
+from config import Config
+from n8n import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    N8NClient,
+    WebhookError,
+)
+from .utils import n8n_output
+
+
+def make_client(handler, **kwargs):
+    return N8NClient(
+        url="http://n8n.test/webhook", transport=httpx.MockTransport(handler), **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_enrich_returns_output():
+    n8n_client = make_client(n8n_output)
+
+    result = await n8n_client.enrich("Deep Work", "Cal Newport")
+
+    assert result == {"summary_by_ai": "ai summary", "category_by_ai": "ai category"}
+    assert n8n_client.stats().get("calls") == 1
+    await n8n_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_enrich_sends_title_and_author():
+    seen = []
+
+    def handler(request):
+        seen.append(request.read())
+        return n8n_output(request)
+
+    n8n_client = make_client(handler)
+    await n8n_client.enrich("Deep Work", "Cal Newport")
+
+    assert seen == [b'{"title":"Deep Work","author":"Cal Newport"}']
+    await n8n_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_enrich_malformed_json():
+    n8n_client = make_client(lambda request: httpx.Response(200, content=b"Not JSON"))
+
+    with pytest.raises(WebhookError) as excinfo:
+        await n8n_client.enrich("Deep Work", "Cal Newport")
+
+    assert str(excinfo.value) == (
+        "Invalid response received from webhook service (malformed JSON)"
+    )
+    # A bad payload counts against the breaker like an error status.
+    assert n8n_client.breaker.failures == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", [b"null", b"[1, 2]", b'"text"', b'{"output": null}'])
+async def test_enrich_rejects_non_object_payloads(body):
+    n8n_client = make_client(lambda request: httpx.Response(200, content=body))
+
+    with pytest.raises(WebhookError) as excinfo:
+        await n8n_client.enrich("Deep Work", "Cal Newport")
+
+    assert "not a JSON object" in str(excinfo.value)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped():
+    active = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return n8n_output(request)
+
+    n8n_client = make_client(handler, max_concurrency=3)
+    await asyncio.gather(
+        *(n8n_client.enrich(f"title {i}", "author") for i in range(12))
+    )
+
+    assert peak == 3
+    await n8n_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_and_fails_fast():
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        raise httpx.ConnectError("N8N is down")
+
+    n8n_client = make_client(handler)
+
+    for _ in range(Config.N8N_BREAKER_FAILURES):
+        with pytest.raises(WebhookError):
+            await n8n_client.enrich("Deep Work", "Cal Newport")
+
+    with pytest.raises(CircuitOpenError):
+        await n8n_client.enrich("Deep Work", "Cal Newport")
+
+    assert calls == Config.N8N_BREAKER_FAILURES
+    assert n8n_client.stats().get("circuit_state") == "open"
+
+
+@pytest.mark.asyncio
+async def test_malformed_payloads_open_the_circuit():
+    n8n_client = make_client(lambda request: httpx.Response(200, content=b"[]"))
+
+    for _ in range(Config.N8N_BREAKER_FAILURES):
+        with pytest.raises(WebhookError):
+            await n8n_client.enrich("Deep Work", "Cal Newport")
+
+    assert n8n_client.stats().get("circuit_state") == "open"
+    assert n8n_client.stats().get("failures") == Config.N8N_BREAKER_FAILURES
+
+
+@pytest.mark.asyncio
+async def test_malformed_payload_fails_the_half_open_trial():
+    n8n_client = make_client(lambda request: httpx.Response(200, content=b"oops"))
+    n8n_client.breaker.state = n8n_client.breaker.OPEN
+    n8n_client.breaker.opened_at = -n8n_client.breaker.reset_timeout
+
+    with pytest.raises(WebhookError):
+        await n8n_client.enrich("Deep Work", "Cal Newport")
+
+    assert n8n_client.breaker.state == n8n_client.breaker.OPEN
+
+
+def test_circuit_half_open_allows_one_trial():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+
+    now[0] = 11.0
+    breaker.before_call()
+    assert breaker.state == breaker.HALF_OPEN
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    breaker.before_call()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_does_not_block_the_breaker():
+    started = asyncio.Event()
+
+    async def hang(request):
+        started.set()
+        await asyncio.sleep(10)
+
+    n8n_client = make_client(hang)
+    n8n_client.breaker.state = n8n_client.breaker.OPEN
+    n8n_client.breaker.opened_at = -n8n_client.breaker.reset_timeout
+
+    trial = asyncio.ensure_future(n8n_client.enrich("Deep Work", "Cal Newport"))
+    await started.wait()
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+
+    assert n8n_client.breaker.state == n8n_client.breaker.HALF_OPEN
+    assert n8n_client.breaker.before_call() is True
+    await n8n_client.aclose()
+
+
+def test_timeout_follows_observed_latency():
+    tracker = LatencyTracker(window=100, min_samples=10)
+
+    assert tracker.timeout() == Config.N8N_TIMEOUT_DEFAULT
+
+    for _ in range(100):
+        tracker.record(4.0)
+
+    assert tracker.percentile(0.99) == 4.0
+    assert tracker.timeout() == max(
+        Config.N8N_TIMEOUT_MIN, min(Config.N8N_TIMEOUT_MAX, 4.0 * Config.N8N_TIMEOUT_MULTIPLIER)
+    )
+
+    for _ in range(100):
+        tracker.record(0.1)
+
+    assert tracker.timeout() == Config.N8N_TIMEOUT_MIN
@@ -0,0 +1,203 @@
+import json
+import httpx
+import pytest
+from config import Config
+from enrichment import drain
+from n8n import CircuitOpenError, WebhookError
+from n8n_stub import LatencyDistribution, create_app, recording_key
+from .utils import (
+    TestingSessionLocal,
+    TestingAsyncSessionLocal,
+    test_book,
+    Book,
+    EnrichmentJob,
+    client,
+    stub_n8n,
+)
+
+
+def stub_client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stub")
+
+
+@pytest.mark.asyncio
+async def test_stub_default_payload():
+    async with stub_client(create_app()) as stub:
+        response = await stub.post(
+            "/webhook/books", json={"title": "Deep Work", "author": "Cal Newport"}
+        )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "output": {
+            "summary_by_ai": "Deep Work by Cal Newport, summarized by the local N8N stand-in.",
+            "category_by_ai": "Stub",
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_stub_replays_recordings(tmp_path):
+    recordings = tmp_path / "recordings.json"
+    recordings.write_text(
+        json.dumps(
+            {
+                recording_key("Deep Work", "Cal Newport"): {
+                    "summary_by_ai": "recorded summary",
+                    "category_by_ai": "Productivity",
+                }
+            }
+        )
+    )
+
+    async with stub_client(create_app(recordings=str(recordings))) as stub:
+        response = await stub.post(
+            "/webhook/books", json={"title": "deep  work", "author": "Cal Newport"}
+        )
+        stats = (await stub.get("/__stub/stats")).json()
+
+    assert response.json().get("output").get("summary_by_ai") == "recorded summary"
+    assert stats.get("replayed") == 1
+
+
+@pytest.mark.asyncio
+async def test_stub_records_upstream_responses(tmp_path):
+    record = tmp_path / "recorded.json"
+    upstream = httpx.MockTransport(
+        lambda request: httpx.Response(
+            200, json={"output": {"summary_by_ai": "live", "category_by_ai": "Live"}}
+        )
+    )
+    app = create_app(
+        record=str(record), upstream="http://n8n.live/webhook", upstream_transport=upstream
+    )
+
+    async with stub_client(app) as stub:
+        await stub.post("/webhook/books", json={"title": "Range", "author": "David Epstein"})
+
+    assert json.loads(record.read_text()) == {
+        recording_key("Range", "David Epstein"): {
+            "summary_by_ai": "live",
+            "category_by_ai": "Live",
+        }
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "content",
+    [b"not json", b"[1, 2]", b'{"title": 1, "author": "x"}'],
+)
+async def test_stub_rejects_bad_request_bodies(content):
+    async with stub_client(create_app()) as stub:
+        response = await stub.post("/webhook/books", content=content)
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "upstream_response",
+    [
+        httpx.Response(500, json={"message": "down"}),
+        httpx.Response(200, content=b"not json"),
+        httpx.Response(200, json=[1, 2]),
+        httpx.Response(200, json={"output": None}),
+    ],
+)
+async def test_stub_passes_upstream_failures_through(tmp_path, upstream_response):
+    record = tmp_path / "recorded.json"
+    app = create_app(
+        record=str(record),
+        upstream="http://n8n.live/webhook",
+        upstream_transport=httpx.MockTransport(lambda request: upstream_response),
+    )
+
+    async with stub_client(app) as stub:
+        response = await stub.post(
+            "/webhook/books", json={"title": "Range", "author": "David Epstein"}
+        )
+        stats = (await stub.get("/__stub/stats")).json()
+
+    assert response.status_code == 502
+    assert stats.get("upstream_errors") == 1
+    assert not record.exists()
+
+
+@pytest.mark.asyncio
+async def test_stub_injects_latency():
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    app = create_app(latency="uniform:0.1,0.3", seed=7, sleep=fake_sleep)
+    async with stub_client(app) as stub:
+        for _ in range(20):
+            await stub.post("/webhook/books", json={"title": "t", "author": "a"})
+
+    assert len(slept) == 20
+    assert all(0.1 <= seconds <= 0.3 for seconds in slept)
+
+
+@pytest.mark.asyncio
+async def test_stub_runtime_config():
+    async with stub_client(create_app()) as stub:
+        response = await stub.put(
+            "/__stub/config", json={"latency": "fixed:0", "error_rate": 1}
+        )
+        assert response.status_code == 200
+
+        response = await stub.post("/webhook/books", json={"title": "t", "author": "a"})
+        assert response.status_code == 500
+
+        response = await stub.put("/__stub/config", json={"latency": "gamma:1"})
+        assert response.status_code == 422
+
+
+def test_latency_distributions():
+    assert LatencyDistribution("fixed:0.25").sample() == 0.25
+    assert LatencyDistribution("normal:-5,0.1").sample() == 0.0
+    assert LatencyDistribution("exponential:0.1").sample() >= 0
+
+    with pytest.raises(ValueError):
+        LatencyDistribution("uniform:1")
+
+
+@pytest.mark.asyncio
+async def test_enrichment_against_stub(monkeypatch, test_book):
+    stub_n8n(monkeypatch)
+
+    client.post("/books/add-book", json={"title": "Deep Work", "author": "Cal Newport"})
+    assert await drain(TestingAsyncSessionLocal) == 1
+
+    db = TestingSessionLocal()
+    book = db.query(Book).filter(Book.id == 2).first()
+    assert book.category == "Stub"
+
+
+@pytest.mark.asyncio
+async def test_failing_upstream_opens_circuit(monkeypatch, test_book):
+    n8n_client = stub_n8n(monkeypatch, error_rate=1.0)
+
+    for _ in range(Config.N8N_BREAKER_FAILURES):
+        with pytest.raises(WebhookError):
+            await n8n_client.enrich("Deep Work", "Cal Newport")
+
+    with pytest.raises(CircuitOpenError):
+        await n8n_client.enrich("Deep Work", "Cal Newport")
+
+
+@pytest.mark.asyncio
+async def test_malformed_upstream_is_retried(monkeypatch, test_book):
+    stub_n8n(monkeypatch, malformed_rate=1.0)
+
+    client.post("/books/add-book", json={"title": "Deep Work", "author": "Cal Newport"})
+    await drain(TestingAsyncSessionLocal)
+
+    db = TestingSessionLocal()
+    job = db.query(EnrichmentJob).filter(EnrichmentJob.book_id == 2).first()
+    assert job.status == "pending"
+    assert job.last_error == (
+        "Invalid response received from webhook service (malformed JSON)"
+    )
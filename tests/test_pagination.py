@@ -0,0 +1,27 @@
+import pytest
+from pagination import InvalidCursor, decode_cursor, encode_cursor, paginate
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+    assert decode_cursor(None) == 0
+    assert decode_cursor("") == 0
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    ["not-a-cursor", encode_cursor(-1), "eyJhZnRlciI6IngifQ", "eyJ4IjoxfQ", "e30"],
+)
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_paginate_uses_the_extra_row_only_as_a_signal():
+    page = paginate([{"id": 1}, {"id": 2}, {"id": 3}], 2)
+
+    assert page.get("items") == [{"id": 1}, {"id": 2}]
+    assert decode_cursor(page.get("next_cursor")) == 2
+
+    last_page = paginate([{"id": 3}], 2)
+    assert last_page.get("next_cursor") is None
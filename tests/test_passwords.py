@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import pytest
+from passwords import PasswordHasher, PasswordHasherBusy
+
+
+class FakeContext:
+    """Stands in for CryptContext; `hash` blocks until `release` is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.release.set()
+        self.threads = []
+
+    def hash(self, password):
+        self.threads.append(threading.current_thread().name)
+        self.release.wait()
+        return f"hashed:{password}"
+
+    def verify(self, password, hashed_password):
+        return hashed_password == f"hashed:{password}"
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_run_on_the_pool():
+    hasher = PasswordHasher(FakeContext(), workers=2, max_pending=4)
+
+    hashed = await hasher.hash("secret")
+
+    assert await hasher.verify("secret", hashed)
+    assert not await hasher.verify("wrong", hashed)
+    assert hasher.context.threads[0].startswith("password-hasher")
+    assert hasher.stats()["hashes"] == 1
+    assert hasher.stats()["verifications"] == 2
+    assert hasher.stats()["pending"] == 0
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_rejects_beyond_max_pending():
+    hasher = PasswordHasher(FakeContext(), workers=1, max_pending=2)
+    hasher.context.release.clear()
+
+    # One hash runs, one waits in the queue, the third is turned away.
+    first = asyncio.ensure_future(hasher.hash("a"))
+    second = asyncio.ensure_future(hasher.hash("b"))
+    await asyncio.sleep(0.05)
+    with pytest.raises(PasswordHasherBusy):
+        await hasher.hash("c")
+
+    hasher.context.release.set()
+    assert await asyncio.gather(first, second) == ["hashed:a", "hashed:b"]
+    assert hasher.stats()["rejected"] == 1
+    assert hasher.stats()["peak_pending"] == 2
+    assert hasher.stats()["pending"] == 0
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_keeps_its_slot_until_the_hash_finishes():
+    hasher = PasswordHasher(FakeContext(), workers=1, max_pending=1)
+    hasher.context.release.clear()
+
+    waiting = asyncio.ensure_future(hasher.hash("a"))
+    await asyncio.sleep(0.05)
+    waiting.cancel()
+    await asyncio.sleep(0)
+
+    with pytest.raises(PasswordHasherBusy):
+        await hasher.hash("b")
+
+    hasher.context.release.set()
+    await asyncio.sleep(0.05)
+    assert await hasher.hash("b") == "hashed:b"
+    hasher.shutdown()
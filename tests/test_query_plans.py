@@ -0,0 +1,214 @@
+import ast
+from pathlib import Path
+import pytest
+from sqlalchemy import create_engine, insert, select, text
+from database import Base
+from models import AccountDeletion, Book, EnrichmentJob, User
+import queries
+import search
+
+
+USERS = 50
+BOOKS = 5000
+
+# Every statement a router runs on a request path, with representative arguments.
+HOT_QUERIES = {
+    "books.my-books-page": queries.books_owned_by(7),
+    "books.my-books": queries.books_page(2000, 51, owner_id=7),
+    "books.my-books category": queries.books_page(
+        2000, 51, owner_id=7, category="Category 3"
+    ),
+    "admin.all-books": queries.books_page(2000, 51),
+    "admin.all-books owner": queries.books_page(2000, 51, owner_id=7),
+    "admin.all-books category": queries.books_page(2000, 51, category="Category 3"),
+    "admin.export owner": queries.books_export(owner_id=7),
+    "admin.export category": queries.books_export(category="Category 3"),
+    "books.book-info version": queries.book_version(42),
+    "books.book-info": queries.book_with_version(42),
+    "books.my-books version": queries.collection_version(7),
+    "books.edit-book-page": queries.owned_book(7, 42),
+    "books.edit-book": queries.update_owned_book(7, 42, {"title": "Renamed"}),
+    "books.enrichment-status job": queries.latest_enrichment_job(42),
+    "books.delete-book": queries.delete_owned_book(7, 42),
+    "admin.delete": queries.delete_book(42),
+    "auth.token": queries.user_by_username("user7"),
+    "users.get-user": queries.user_profile("user7"),
+    "users.delete-user": queries.deactivate_user(7),
+    "account_deletion user": queries.delete_user(7),
+    "account_deletion stragglers": queries.delete_books_owned_by(7),
+    "auth.register": queries.user_by_username_or_email("user7", "user7@email.com"),
+    "admin.bulk-delete count owner": queries.count_books(
+        queries.book_conditions(owner_id=7)
+    ),
+    "admin.bulk-delete chunk owner": queries.book_ids_page(
+        queries.book_conditions(owner_id=7, title_pattern="Title 1%"), 2000, 500
+    ),
+    "admin.bulk-delete chunk category": queries.book_ids_page(
+        queries.book_conditions(category="Category 3"), 2000, 500
+    ),
+    "admin.bulk-delete chunk ids": queries.book_ids_page(
+        queries.book_conditions(ids=[1, 2, 3]), 0, 500
+    ),
+    "admin.bulk-delete delete": queries.delete_books_by_id(
+        [42, 43], queries.book_conditions(owner_id=7)
+    ),
+    "users.delete-user count": queries.count_books_owned_by(7),
+    "users.deletion-status": queries.latest_account_deletion(7),
+    "account_deletion chunk": queries.book_ids_page(
+        queries.book_conditions(owner_id=7), 0, 500
+    ),
+    "books.stats count": queries.user_book_count(7),
+    "books.stats categories": queries.user_top_categories(7, 10),
+    "books.stats authors": queries.user_top_authors(7, 10),
+    "books.search": search.SQLITE_SEARCH.bindparams(
+        match=search.match_expression("title 12", "sqlite"), owner_id=7, limit=20
+    ),
+}
+
+# Whole-table top-N reads: an index scan is expected, a sort is not.
+TOP_N_QUERIES = {
+    "admin.stats categories": queries.top_categories(10),
+    "admin.stats titles": queries.most_added_books(10),
+}
+
+
+ROOT = Path(__file__).resolve().parent.parent
+# Modules that run statements from `queries` on behalf of a request.
+QUERY_CALLERS = ["routers/*.py", "account_deletion.py", "bulk_delete.py"]
+# `queries` helpers that do not build a statement of their own.
+NOT_STATEMENTS = {"records", "parse_book_fields", "book_conditions"}
+
+
+@pytest.fixture(scope="module")
+def seeded_engine(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [
+                {"username": f"user{i}", "email": f"user{i}@email.com", "role": "user"}
+                for i in range(1, USERS + 1)
+            ],
+        )
+        connection.execute(
+            insert(Book),
+            [
+                {
+                    "title": f"Title {i}",
+                    "author": f"Author {i % 300}",
+                    "category": f"Category {i % 20}",
+                    "owner_id": i % USERS + 1,
+                }
+                for i in range(BOOKS)
+            ],
+        )
+        connection.execute(
+            insert(EnrichmentJob),
+            [{"book_id": i, "status": "done"} for i in range(1, BOOKS + 1, 3)],
+        )
+        connection.execute(
+            insert(AccountDeletion),
+            [{"user_id": i, "status": "done"} for i in range(USERS + 1, USERS + 200)],
+        )
+        connection.execute(text("ANALYZE"))
+    yield engine
+    engine.dispose()
+
+
+def query_plan(engine, statement) -> list:
+    compiled = statement.compile(
+        dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+    )
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")
+            return [row.detail for row in rows]
+        rows = connection.exec_driver_sql(f"EXPLAIN {compiled}")
+        return [row[0] for row in rows]
+
+
+def full_scans(plan: list) -> list:
+    # A full-text MATCH shows up as a SCAN of the virtual table's own index.
+    return [
+        line
+        for line in plan
+        if (line.startswith("SCAN") and "VIRTUAL TABLE INDEX" not in line)
+        or "Seq Scan" in line
+    ]
+
+
+def queries_called(node) -> set:
+    return {
+        call.func.attr
+        for call in ast.walk(node)
+        if isinstance(call, ast.Call)
+        and isinstance(call.func, ast.Attribute)
+        and isinstance(call.func.value, ast.Name)
+        and call.func.value.id == "queries"
+    } - NOT_STATEMENTS
+
+
+def test_hot_queries_match_the_callers():
+    called = set()
+    for pattern in QUERY_CALLERS:
+        for path in ROOT.glob(pattern):
+            called |= queries_called(ast.parse(path.read_text()))
+    checked = set()
+    for node in ast.parse(Path(__file__).read_text()).body:
+        if isinstance(node, ast.Assign) and node.targets[0].id in (
+            "HOT_QUERIES",
+            "TOP_N_QUERIES",
+        ):
+            checked |= queries_called(node.value)
+
+    assert called - checked == set(), "add these to HOT_QUERIES"
+    assert checked - called == set(), "no longer called; drop from HOT_QUERIES"
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_does_not_scan_the_table(seeded_engine, name):
+    plan = query_plan(seeded_engine, HOT_QUERIES[name])
+
+    assert full_scans(plan) == [], f"{name} plan: {plan}"
+
+
+def test_owner_listing_is_served_in_index_order(seeded_engine):
+    plan = query_plan(seeded_engine, queries.books_owned_by(7))
+
+    assert any("ix_books_owner_id_id" in line for line in plan), plan
+    assert not any("TEMP B-TREE" in line for line in plan), plan
+
+
+def test_category_listing_index_ends_with_id():
+    # SQLite appends the rowid to every index, so its plan looks the same
+    # for (category) alone; Postgres needs id in the key to walk keyset pages.
+    index = next(i for i in Book.__table__.indexes if i.name == "ix_books_category_id")
+
+    assert [column.name for column in index.columns] == ["category", "id"]
+
+
+def test_full_scan_is_detected(seeded_engine):
+    plan = query_plan(seeded_engine, select(Book).filter(Book.title == "Title 7"))
+
+    assert full_scans(plan) != []
+
+
+def test_sparse_fieldset_selects_only_those_columns(seeded_engine):
+    statement = queries.books_page(
+        0, 51, owner_id=7, fields=queries.parse_book_fields("title,author")
+    )
+
+    compiled = str(statement.compile(dialect=seeded_engine.dialect))
+    selected = compiled.split("FROM")[0]
+    assert "summary" not in selected and "category" not in selected
+    assert full_scans(query_plan(seeded_engine, statement)) == []
+
+
+@pytest.mark.parametrize("name", TOP_N_QUERIES)
+def test_admin_stats_read_the_top_of_an_index(seeded_engine, name):
+    # A walk down the covering index stopped by LIMIT, not a sort of the rollup.
+    plan = query_plan(seeded_engine, TOP_N_QUERIES[name])
+
+    assert all("COVERING INDEX ix_" in line for line in plan), plan
+    assert not any("TEMP B-TREE" in line for line in plan), plan
@@ -0,0 +1,209 @@
+import asyncio
+import pytest
+from cache_backends import (
+    CacheBackendError,
+    MemoryBackend,
+    RedisBackend,
+    SQLiteBackend,
+    create_backend,
+)
+from redis_stub import RedisStub
+from response_cache import UserResponseCache
+
+
+class BrokenBackend(MemoryBackend):
+    async def counters(self, keys):
+        raise CacheBackendError("cache is down")
+
+
+@pytest.mark.asyncio
+async def test_loads_once_and_caches_none():
+    cache = UserResponseCache(MemoryBackend(maxsize=10, ttl=10))
+    loads = []
+
+    async def load():
+        loads.append(1)
+        return None
+
+    assert await cache.get_or_load(await cache.key(1, "profile"), load) is None
+    assert await cache.get_or_load(await cache.key(1, "profile"), load) is None
+
+    assert len(loads) == 1
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_invalidates_one_user():
+    cache = UserResponseCache(MemoryBackend(maxsize=10, ttl=10))
+    await cache.set(await cache.key(1, "books", 50), "user 1")
+    await cache.set(await cache.key(2, "books", 50), "user 2")
+
+    await cache.invalidate(1)
+
+    assert await cache.get(await cache.key(1, "books", 50)) is None
+    assert await cache.get(await cache.key(2, "books", 50)) == "user 2"
+    assert cache.stats()["invalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_drops_loads_that_raced_a_write():
+    cache = UserResponseCache(MemoryBackend(maxsize=10, ttl=10))
+    key = await cache.key(1, "books")  # taken before reading the database
+
+    await cache.invalidate(1)  # a write commits meanwhile
+    await cache.set(key, "read before the write")
+
+    assert await cache.get(await cache.key(1, "books")) is None
+
+
+@pytest.mark.asyncio
+async def test_clear_invalidates_everyone():
+    cache = UserResponseCache(MemoryBackend(maxsize=10, ttl=10))
+    await cache.set(await cache.key(1, "books"), "user 1")
+
+    await cache.clear()
+
+    assert await cache.get(await cache.key(1, "books")) is None
+
+
+@pytest.mark.asyncio
+async def test_backend_failure_falls_back_to_loading():
+    cache = UserResponseCache(BrokenBackend(maxsize=10, ttl=10))
+
+    async def load():
+        return "from the database"
+
+    assert await cache.get_or_load(await cache.key(1, "books"), load) == "from the database"
+    assert cache.stats()["errors"] == 1
+
+
+async def assert_shared_between_workers(make_backend):
+    """Two caches on one shared store behave like two uvicorn workers."""
+    first, second = UserResponseCache(make_backend()), UserResponseCache(make_backend())
+
+    await first.set(await first.key(1, "books", 50), {"items": [1, 2]})
+    assert await second.get(await second.key(1, "books", 50)) == {"items": [1, 2]}
+
+    # An invalidation in one worker is seen by the other straight away.
+    await second.invalidate(1)
+    assert await first.get(await first.key(1, "books", 50)) is None
+
+    await first.backend.close()
+    await second.backend.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    await assert_shared_between_workers(lambda: SQLiteBackend(path, maxsize=10, ttl=10))
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_evicts_oldest_beyond_maxsize(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), maxsize=3, ttl=10, evict_every=5)
+
+    for i in range(5):
+        await backend.set(f"key {i}", i)
+
+    assert await backend.get("key 0") is None
+    assert await backend.get("key 4") == 4
+    assert backend.stats()["evictions"] == 2
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_entries_expire(tmp_path):
+    clock = [1000.0]
+    backend = SQLiteBackend(
+        str(tmp_path / "cache.db"), maxsize=10, ttl=10, clock=lambda: clock[0]
+    )
+    await backend.set("key", "value")
+
+    clock[0] += 11
+
+    assert await backend.get("key") is None
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_is_shared_between_workers():
+    stub = await RedisStub().start()
+    url = f"redis://127.0.0.1:{stub.port}/0"
+    try:
+        await assert_shared_between_workers(lambda: RedisBackend(url, ttl=10))
+    finally:
+        await stub.stop()
+    assert stub.connections == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_reconnects_after_a_restart():
+    stub = await RedisStub().start()
+    backend = RedisBackend(f"redis://127.0.0.1:{stub.port}/0", ttl=10)
+    await backend.set("key", "value")
+    port = stub.port
+    await stub.stop()
+
+    with pytest.raises((ConnectionError, OSError)):
+        await backend.get("key")
+
+    stub = await RedisStub().start(port=port)
+    try:
+        assert await backend.get("key") is None  # a fresh, empty server
+        assert await backend.incr("gen:1") == 1
+        assert backend.stats()["reconnects"] == 2
+    finally:
+        await backend.close()
+        await stub.stop()
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_drops_the_connection_of_a_cancelled_command():
+    stub = await RedisStub().start()
+    backend = RedisBackend(f"redis://127.0.0.1:{stub.port}/0", ttl=10)
+    try:
+        await backend.set("user:A", {"owner": "A"})
+        stub.delay = 0.2
+        reading = asyncio.ensure_future(backend.get("user:A"))
+        await asyncio.sleep(0.05)
+        reading.cancel()
+        stub.delay = 0.0
+
+        # The late reply for user A must not be taken as the answer for B.
+        assert await backend.get("user:B") is None
+        assert await backend.get("user:A") == {"owner": "A"}
+    finally:
+        await backend.close()
+        await stub.stop()
+
+
+@pytest.mark.asyncio
+async def test_hung_redis_counts_as_a_miss():
+    stub = await RedisStub().start()
+    stub.delay = 1.0
+    cache = UserResponseCache(
+        RedisBackend(f"redis://127.0.0.1:{stub.port}/0", ttl=10, timeout=0.05)
+    )
+
+    async def load():
+        return "from the database"
+
+    try:
+        assert await cache.get_or_load(await cache.key(1, "books"), load) == "from the database"
+        assert cache.stats()["errors"] == 1
+        assert cache.stats()["backend"]["timeouts"] == 1
+    finally:
+        await cache.backend.close()
+        await stub.stop()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_backend("memcached", "", 10, 10)
+
+
+@pytest.mark.parametrize("name", ["sqlite", "redis"])
+def test_shared_backend_needs_a_url(name):
+    with pytest.raises(ValueError, match="RESPONSE_CACHE_URL"):
+        create_backend(name, "", 10, 10)
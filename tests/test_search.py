@@ -0,0 +1,18 @@
+from search import match_expression, search_terms
+
+
+def test_search_terms_drop_operators_and_punctuation():
+    assert search_terms('Deep "Work" OR title:* -x') == [
+        "deep",
+        "work",
+        "or",
+        "title",
+        "x",
+    ]
+    assert search_terms("  ...  ") == []
+
+
+def test_match_expression_prefixes_the_last_term():
+    assert match_expression("Deep Wor", "sqlite") == '"deep" "wor"*'
+    assert match_expression("Deep Wor", "postgresql") == "deep & wor:*"
+    assert match_expression("!!", "sqlite") is None
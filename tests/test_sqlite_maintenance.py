@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from database import apply_sqlite_pragmas, sqlite_pragmas
+from models import MaintenanceRun
+from sqlite_maintenance import MaintenanceTask, SQLiteMaintenance, read_pragmas
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime(2026, 1, 1)
+
+    def __call__(self):
+        return self.now
+
+
+def make_engine(tmp_path, production=True):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    if production:
+        apply_sqlite_pragmas(engine, sqlite_pragmas())
+    MaintenanceRun.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE notes (body TEXT)"))
+        connection.execute(
+            text("INSERT INTO notes VALUES (:body)"),
+            [{"body": "x" * 2000} for _ in range(500)],
+        )
+        connection.execute(text("DELETE FROM notes"))
+    return engine
+
+
+def test_production_pragmas_are_applied_on_connect(tmp_path):
+    engine = make_engine(tmp_path)
+
+    pragmas = read_pragmas(engine)
+
+    assert pragmas.get("journal_mode") == "wal"
+    assert pragmas.get("synchronous") == 1  # NORMAL
+    assert pragmas.get("busy_timeout") == 5000
+    assert pragmas.get("mmap_size") == 256 * 1024 * 1024
+    assert pragmas.get("cache_size") == -65536
+    assert pragmas.get("auto_vacuum") == 2  # INCREMENTAL
+    engine.dispose()
+
+
+def test_run_due_runs_each_task_on_its_interval(tmp_path):
+    engine = make_engine(tmp_path)
+    clock = FakeClock()
+    tasks = [
+        MaintenanceTask("optimize", "PRAGMA optimize;", 60),
+        MaintenanceTask("analyze", "ANALYZE;", 600),
+        MaintenanceTask(
+            "incremental_vacuum", "PRAGMA incremental_vacuum(100);", 60, needs_incremental=True
+        ),
+    ]
+    maintenance = SQLiteMaintenance(engine, tasks=tasks, clock=clock)
+    freelist_before = read_pragmas(engine).get("freelist_count")
+
+    assert maintenance.run_due() == ["optimize", "analyze", "incremental_vacuum"]
+    # A plain execute of the pragma would have freed a single page.
+    assert read_pragmas(engine).get("freelist_count") < freelist_before - 90
+    assert maintenance.run_due() == []
+
+    clock.now += timedelta(seconds=60)
+    assert maintenance.run_due() == ["optimize", "incremental_vacuum"]
+
+    status = maintenance.status()
+    assert status.get("running") is False
+    assert status.get("tasks").get("analyze").get("this_worker").get("runs") == 1
+    assert status.get("tasks").get("optimize").get("this_worker").get("runs") == 2
+    assert status.get("tasks").get("optimize").get("this_worker").get("last_error") is None
+    engine.dispose()
+
+
+def test_one_worker_runs_a_task_and_restarts_keep_its_schedule(tmp_path):
+    engine = make_engine(tmp_path)
+    clock = FakeClock()
+
+    def worker():
+        task = MaintenanceTask("analyze", "ANALYZE;", 600)
+        return SQLiteMaintenance(engine, tasks=[task], clock=clock)
+
+    first, second = worker(), worker()
+    assert first.run_due() == ["analyze"]
+    assert second.run_due() == []
+    # The worker that lost the claim still reports the shared last run.
+    analyze = second.status().get("tasks").get("analyze")
+    assert analyze.get("last_run_at") == clock.now.isoformat()
+    assert analyze.get("this_worker").get("runs") == 0
+
+    clock.now += timedelta(seconds=300)
+    assert worker().run_due() == []
+    clock.now += timedelta(seconds=300)
+    assert second.run_due() == ["analyze"]
+    assert first.run_due() == []
+    engine.dispose()
+
+
+def test_incremental_vacuum_is_skipped_without_auto_vacuum(tmp_path):
+    engine = make_engine(tmp_path, production=False)
+    task = MaintenanceTask(
+        "incremental_vacuum", "PRAGMA incremental_vacuum(100);", 60, needs_incremental=True
+    )
+    maintenance = SQLiteMaintenance(engine, tasks=[task], clock=FakeClock())
+
+    assert maintenance.run_due() == []
+    assert task.runs == 0
+    assert "VACUUM" in task.skipped
+    engine.dispose()
+
+
+def test_failed_task_is_reported(tmp_path):
+    engine = make_engine(tmp_path)
+    task = MaintenanceTask("broken", "NOT SQL;", 60)
+    maintenance = SQLiteMaintenance(engine, tasks=[task], clock=FakeClock())
+
+    assert maintenance.run_due() == []
+    assert task.runs == 1
+    assert "syntax error" in task.last_error
+    engine.dispose()
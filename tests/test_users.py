@@ -1,3 +1,5 @@
+import pytest
+import account_deletion
 from .utils import (
     app,
     override_get_db,
@@ -5,12 +7,15 @@ from .utils import (
     client,
     test_user,
     TestingSessionLocal,
+    TestingAsyncSessionLocal,
+    Book,
     User,
 )
-from routers.users import get_db, get_current_user
+from routers.users import get_db, get_read_db, get_current_user
 
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
 app.dependency_overrides[get_current_user] = override_get_current_user
 
 
@@ -18,6 +23,13 @@ def test_get_user(test_user):
 
     response = client.get("/users/")
     assert response.status_code == 200
+    assert response.json() == {
+        "id": 1,
+        "username": "testuser",
+        "email": "testuser@email.com",
+        "is_active": True,
+        "role": "admin",
+    }
 
     db = TestingSessionLocal()
     model = db.query(User).filter(User.id == 1).first()
@@ -25,15 +37,60 @@ def test_get_user(test_user):
     assert model.role == "admin"
 
 
-def test_delete_user(test_user):
-
+@pytest.mark.asyncio
+async def test_delete_user(test_user):
     db = TestingSessionLocal()
+    db.add_all([Book(title=f"title {i}", author="author", owner_id=1) for i in range(3)])
+    db.commit()
+
+    response = client.delete("/users/delete-user")
+
+    assert response.status_code == 202
+    assert response.json().get("status") == "pending"
+    assert response.json().get("books_total") == 3
+    db.expire_all()
+    assert db.query(User).filter(User.id == 1).one().is_active is False
+
+    assert await account_deletion.drain(TestingAsyncSessionLocal) == 1
+
+    db.expire_all()
+    assert db.query(User).filter(User.id == 1).first() is None
+    assert db.query(Book).filter(Book.owner_id == 1).count() == 0
+    status_response = client.get("/users/deletion-status")
+    assert status_response.json().get("status") == "done"
+    assert status_response.json().get("books_deleted") == 3
+
+
+def test_delete_user_twice_reuses_the_pending_deletion(test_user):
+
+    first = client.delete("/users/delete-user")
+    second = client.delete("/users/delete-user")
+
+    assert second.json().get("deletion_id") == first.json().get("deletion_id")
+
+
+def test_deletion_status_without_deletion(test_user):
+
+    response = client.get("/users/deletion-status")
+
+    assert response.status_code == 404
+
+
+def test_delete_user_not_found():
 
-    existing_user_model = db.query(User).filter(User.id == 1).first()
-    assert existing_user_model is not None
     response = client.delete("/users/delete-user")
 
-    assert response.status_code == 204
+    assert response.status_code == 404
+
+
+def test_get_user_is_cached_until_deletion(test_user):
+    db = TestingSessionLocal()
+    client.get("/users/")
+    db.query(User).filter(User.id == 1).update({"email": "changed@email.com"})
+    db.commit()
+
+    # Changed behind the API's back: served from the cache.
+    assert client.get("/users/").json().get("email") == "testuser@email.com"
 
-    deleted_user_mode = db.query(User).filter(User.id == 1).first()
-    assert deleted_user_mode is None
+    client.delete("/users/delete-user")
+    assert client.get("/users/").json().get("is_active") is False
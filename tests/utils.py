@@ -1,15 +1,32 @@
+import asyncio
+import atexit
+import os
+import shutil
+import tempfile
+import httpx
 import pytest
 from sqlalchemy import create_engine, text
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from fastapi.testclient import TestClient
 from database import Base
-from models import Book, User
-from routers.auth import bcrypt_context
+from models import AccountDeletion, Book, User, EnrichmentJob, EnrichmentCacheEntry
+from passwords import bcrypt_context
 from main import app
+from n8n import N8NClient
+from n8n_stub import create_app as create_n8n_stub
+from enrichment import memory_cache
+from response_cache import response_cache
 
 
-SQLALCHEMY_TEST_URL = "sqlite:///./testdb.db"
+# A throwaway database per test run, so the suite never writes to a file
+# under version control.
+TEST_DB_DIR = tempfile.mkdtemp(prefix="books-tests-")
+atexit.register(shutil.rmtree, TEST_DB_DIR, ignore_errors=True)
+TEST_DB_PATH = os.path.join(TEST_DB_DIR, "testdb.db")
+SQLALCHEMY_TEST_URL = f"sqlite:///{TEST_DB_PATH}"
+SQLALCHEMY_ASYNC_TEST_URL = f"sqlite+aiosqlite:///{TEST_DB_PATH}"
 
 
 engine = create_engine(
@@ -18,18 +35,49 @@ engine = create_engine(
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient and pytest-asyncio run on different event loops, so the async
+# engine must not share connections between them.
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_TEST_URL, poolclass=NullPool)
+
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 Base.metadata.create_all(bind=engine)
 
 
 client = TestClient(app)
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def mock_n8n(monkeypatch, handler):
+    """Route enrichment calls to `handler(request) -> httpx.Response`."""
+    n8n_client = N8NClient(
+        url="http://n8n.test/webhook", transport=httpx.MockTransport(handler)
+    )
+    monkeypatch.setattr("enrichment.n8n_client", n8n_client)
+    return n8n_client
+
+
+def stub_n8n(monkeypatch, **options):
+    """Route enrichment calls to the local N8N stand-in (see n8n_stub.py)."""
+    n8n_client = N8NClient(
+        url="http://n8n.test/webhook/books",
+        transport=httpx.ASGITransport(app=create_n8n_stub(**options)),
+    )
+    monkeypatch.setattr("enrichment.n8n_client", n8n_client)
+    return n8n_client
+
+
+def n8n_output(request):
+    return httpx.Response(
+        200,
+        json={"output": {"summary_by_ai": "ai summary", "category_by_ai": "ai category"}},
+    )
 
 
 def override_get_current_user():
@@ -52,8 +100,12 @@ def test_book():
     db.commit()
     yield book
     with engine.connect() as connection:
+        connection.execute(text("DELETE FROM enrichment_jobs;"))
+        connection.execute(text("DELETE FROM enrichment_cache;"))
         connection.execute(text("DELETE FROM books;"))
         connection.commit()
+    memory_cache.clear()
+    asyncio.run(response_cache.clear())
 
 
 @pytest.fixture
@@ -71,5 +123,7 @@ def test_user():
     db.commit()
     yield user
     with engine.connect() as connection:
+        connection.execute(text("DELETE FROM account_deletions;"))
         connection.execute(text("DELETE FROM users;"))
-        connection.commit()
\ No newline at end of file
+        connection.commit()
+    asyncio.run(response_cache.clear())
\ No newline at end of file